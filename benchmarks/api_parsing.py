@@ -0,0 +1,134 @@
+"""
+Decoding of PRC API responses: the standard library decoder with a record built
+per row and "Player" split twice, against the configured fast decoder
+(utils.fast_json) and the generated single-pass list parsers.
+
+    python -m benchmarks.api_parsing [iterations]
+"""
+
+import json
+import sys
+import time
+
+from benchmarks.records import legacy_command_log, legacy_player
+from utils.fast_json import JSON_DECODER, loads
+from utils.prc_api import CommandLog, JoinLeaveLog, KillLog, Player
+
+
+class LegacyLog:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+def legacy_kill_log(item):
+    return LegacyLog(
+        killer_username=item["Killer"].split(":")[0],
+        killer_user_id=item["Killer"].split(":")[1],
+        timestamp=item["Timestamp"],
+        killed_username=item["Killed"].split(":")[0],
+        killed_user_id=item["Killed"].split(":")[1],
+    )
+
+
+def legacy_join_log(item):
+    return LegacyLog(
+        username=item["Player"].split(":")[0],
+        user_id=item["Player"].split(":")[1],
+        timestamp=item["Timestamp"],
+        type="join" if item["Join"] is True else "leave",
+    )
+
+
+def players_payload(amount: int = 40) -> bytes:
+    return json.dumps(
+        [
+            {
+                "Player": f"Player{i}:{100000000 + i}",
+                "Permission": "Server Moderator" if i % 10 == 0 else "Normal",
+                "Callsign": f"1A-{i}" if i % 3 == 0 else None,
+                "Team": ["Civilian", "Police", "Sheriff", "Fire", "DOT"][i % 5],
+            }
+            for i in range(amount)
+        ]
+    ).encode()
+
+
+def command_logs_payload(amount: int = 1000) -> bytes:
+    return json.dumps(
+        [
+            {
+                "Player": "Remote Server" if i % 20 == 0 else f"Player{i % 40}:{100000000 + i % 40}",
+                "Timestamp": 1700000000 + i,
+                "Command": f":pm Player{i % 40} Please follow the server rules ({i})",
+            }
+            for i in range(amount)
+        ]
+    ).encode()
+
+
+def kill_logs_payload(amount: int = 1000) -> bytes:
+    return json.dumps(
+        [
+            {
+                "Killer": f"Player{i % 40}:{100000000 + i % 40}",
+                "Killed": f"Player{(i + 7) % 40}:{100000000 + (i + 7) % 40}",
+                "Timestamp": 1700000000 + i,
+            }
+            for i in range(amount)
+        ]
+    ).encode()
+
+
+def join_logs_payload(amount: int = 1000) -> bytes:
+    return json.dumps(
+        [
+            {
+                "Join": i % 3 != 0,
+                "Player": f"Player{i % 40}:{100000000 + i % 40}",
+                "Timestamp": 1700000000 + i,
+            }
+            for i in range(amount)
+        ]
+    ).encode()
+
+
+CASES = [
+    ("players (40)", players_payload(), legacy_player, Player.from_api_list),
+    ("command logs (1000)", command_logs_payload(), legacy_command_log, CommandLog.from_api_list),
+    ("kill logs (1000)", kill_logs_payload(), legacy_kill_log, KillLog.from_api_list),
+    ("join logs (1000)", join_logs_payload(), legacy_join_log, JoinLeaveLog.from_api_list),
+]
+
+
+def timed(parse, body: bytes, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        parse(body)
+    return (time.perf_counter() - started) / iterations
+
+
+def main(iterations: int):
+    print(f"fast decoder: {JSON_DECODER}, {iterations} iterations per payload\n")
+    print(
+        f"{'payload':<20} {'bytes':>8} {'legacy µs':>10} {'decode µs':>10}"
+        f" {'fast µs':>10} {'speedup':>8}"
+    )
+    for name, body, legacy, fast in CASES:
+        legacy_time = timed(
+            lambda data: [legacy(item) for item in json.loads(data)], body, iterations
+        )
+        # Only the decoder changed, records still built one at a time
+        decode_time = timed(
+            lambda data: [legacy(item) for item in loads(data)], body, iterations
+        )
+        fast_time = timed(lambda data: fast(loads(data)), body, iterations)
+        print(
+            f"{name:<20} {len(body):>8} {legacy_time * 1e6:>10.1f}"
+            f" {decode_time * 1e6:>10.1f} {fast_time * 1e6:>10.1f}"
+            f" {legacy_time / fast_time:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
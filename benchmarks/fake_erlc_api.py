@@ -0,0 +1,311 @@
+"""
+Local stand-in for the PRC (ER:LC) and Maple County server APIs, for exercising
+the ER:LC tasks at fleet scale without touching the real APIs.
+
+    python -m benchmarks.fake_erlc_api [--port 8085] [--players 40] [--logs 1000] ...
+
+PRCApiClient is pointed at http://host:port/prc and MCApiClient at
+http://host:port/mc. Every server key gets its own deterministic server with
+`--players` players and `--logs` entries in every log, refreshed every
+`--refresh` seconds so log processing always has something new to read.
+Requests are rate limited per server key the way PRC does it, with
+X-RateLimit-* headers and 429s carrying retry_after.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+
+from aiohttp import web
+
+TEAMS = ["Civilian", "Police", "Sheriff", "Fire", "DOT", "Jail"]
+VEHICLES = ["Falcon Stallion 350 2015", "Chevlon Camion 2008", "Bullhorn Prancer 1969"]
+PERMISSIONS = ["Normal"] * 8 + ["Server Moderator", "Server Administrator"]
+
+
+class RateLimit:
+    __slots__ = ("limit", "remaining", "reset_at")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at = 0.0
+
+
+class StandIn:
+    def __init__(
+        self,
+        players: int = 40,
+        logs: int = 1000,
+        latency_ms: float = 50,
+        jitter_ms: float = 25,
+        read_limit: int = 35,
+        command_limit: int = 1,
+        window: float = 1.0,
+        refresh: float = 60,
+        seed: int = 0,
+    ):
+        """
+        Params:
+         - players (int) : Players on every server
+         - logs (int) : Entries in every kill, join and command log
+         - latency_ms (float) : Base latency of every response
+         - jitter_ms (float) : Uniform random latency added on top
+         - read_limit (int) : GETs allowed per server key per window, 0 disables limits
+         - command_limit (int) : Commands allowed per server key per window
+         - window (float) : Rate limit window, in seconds
+         - refresh (float) : Seconds a generated payload is served before it is regenerated
+        """
+        self.players = players
+        self.logs = logs
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.read_limit = read_limit
+        self.command_limit = command_limit
+        self.window = window
+        self.refresh = refresh
+        self.seed = seed
+        self.random = random.Random(seed)
+        # (server key, bucket) -> RateLimit
+        self.limits: dict[tuple[str, str], RateLimit] = {}
+        # (server key, payload name) -> (generated at, body bytes)
+        self.payloads: dict[tuple[str, str], tuple[float, bytes]] = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.commands = 0
+
+    # <-- Synthetic data -->
+    def _rng(self, server_key: str, generation: int) -> random.Random:
+        return random.Random(zlib.crc32(f"{self.seed}:{server_key}:{generation}".encode()))
+
+    def _roster(self, server_key: str) -> list[tuple[str, int]]:
+        base = zlib.crc32(server_key.encode()) % 1_000_000 * 1000
+        return [(f"Player{base + i}", 100_000_000 + base + i) for i in range(self.players)]
+
+    def _generate(self, server_key: str, name: str, now: float):
+        roster = self._roster(server_key)
+        rng = self._rng(server_key, int(now // self.refresh) if self.refresh else 0)
+
+        def player(index: int) -> str:
+            username, user_id = roster[index % len(roster)]
+            return f"{username}:{user_id}"
+
+        if name == "status":
+            return {
+                "Name": f"Stand-in {server_key}",
+                "OwnerId": roster[0][1] if roster else 1,
+                "CoOwnerIds": [],
+                "CurrentPlayers": len(roster),
+                "MaxPlayers": 40,
+                "JoinKey": server_key[-6:],
+                "AccVerifiedReq": "Disabled",
+                "TeamBalance": True,
+            }
+        if name == "players":
+            return [
+                {
+                    "Player": player(i),
+                    "Permission": rng.choice(PERMISSIONS),
+                    "Callsign": f"{rng.randint(1, 99)}-{i}" if rng.random() < 0.3 else None,
+                    "Team": rng.choice(TEAMS),
+                }
+                for i in range(len(roster))
+            ]
+        if name == "queue":
+            return [100_000_000 + rng.randint(0, 10**6) for _ in range(rng.randint(0, 5))]
+        if name == "vehicles":
+            return [
+                {"Name": rng.choice(VEHICLES), "Owner": roster[i][0], "Texture": "Default"}
+                for i in range(0, len(roster), 2)
+            ]
+        if name == "staff":
+            return {"CoOwners": [], "Admins": {}, "Mods": {}}
+        if name == "bans":
+            return {}
+        if name == "modcalls":
+            return []
+        if not roster:
+            return []
+
+        # Logs, oldest first, spread over the refresh window up to now
+        step = (self.refresh or 60) / max(self.logs, 1)
+        timestamps = [int(now - (self.logs - i) * step) for i in range(self.logs)]
+        if name == "killlogs":
+            return [
+                {"Killer": player(rng.randrange(len(roster))), "Killed": player(rng.randrange(len(roster))), "Timestamp": ts}
+                for ts in timestamps
+            ]
+        if name == "joinlogs":
+            return [
+                {"Join": rng.random() < 0.6, "Player": player(rng.randrange(len(roster))), "Timestamp": ts}
+                for ts in timestamps
+            ]
+        if name == "commandlogs":
+            return [
+                {"Player": player(rng.randrange(len(roster))), "Timestamp": ts, "Command": f":h Stand-in hint {ts}"}
+                for ts in timestamps
+            ]
+        raise KeyError(name)
+
+    def payload(self, server_key: str, name: str) -> bytes:
+        now = time.time()
+        cached = self.payloads.get((server_key, name))
+        if cached is None or now - cached[0] >= self.refresh:
+            cached = self.payloads[(server_key, name)] = (
+                now,
+                json.dumps(self._generate(server_key, name, now)).encode(),
+            )
+        return cached[1]
+
+    # <-- Rate limits -->
+    def _take(self, server_key: str, bucket: str) -> tuple[RateLimit | None, bool]:
+        limit = self.read_limit if bucket == "read" else self.command_limit
+        if not limit:
+            return None, True
+        state = self.limits.get((server_key, bucket))
+        if state is None:
+            state = self.limits[(server_key, bucket)] = RateLimit(limit)
+        now = time.time()
+        if state.reset_at <= now:
+            state.remaining = state.limit
+            state.reset_at = now + self.window
+        if state.remaining <= 0:
+            return state, False
+        state.remaining -= 1
+        return state, True
+
+    # <-- HTTP -->
+    async def _respond(self, request: web.Request, server_key: str | None, name: str | None, bucket: str) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep((self.latency_ms + self.random.random() * self.jitter_ms) / 1000)
+        if not server_key:
+            return web.json_response({"message": "Missing server key"}, status=403)
+
+        state, allowed = self._take(server_key, bucket)
+        headers = {}
+        if state is not None:
+            headers = {
+                "X-RateLimit-Bucket": bucket,
+                "X-RateLimit-Limit": str(state.limit),
+                "X-RateLimit-Remaining": str(state.remaining),
+                "X-RateLimit-Reset": str(state.reset_at),
+            }
+        if not allowed:
+            self.rate_limited += 1
+            return web.json_response(
+                {"message": "You are being rate limited!", "retry_after": round(state.reset_at - time.time(), 3), "bucket": bucket},
+                status=429,
+                headers=headers,
+            )
+
+        if name is None:
+            self.commands += 1
+            return web.json_response({"message": "Success"}, headers=headers)
+        return web.Response(
+            body=self.payload(server_key, name), content_type="application/json", headers=headers
+        )
+
+    def prc_route(self, name: str | None, bucket: str = "read"):
+        async def handler(request: web.Request):
+            return await self._respond(request, request.headers.get("Server-Key"), name, bucket)
+
+        return handler
+
+    def mc_route(self, name: str | None, bucket: str = "read"):
+        async def handler(request: web.Request):
+            return await self._respond(request, request.headers.get("Authorization"), name, bucket)
+
+        return handler
+
+    async def mc_auth(self, request: web.Request):
+        self.requests += 1
+        data = await request.json()
+        return web.json_response({"token": f"mc-{data.get('GuildId', 0)}"})
+
+    async def stats(self, request: web.Request):
+        return web.json_response(self.stats_dict())
+
+    def stats_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "commands": self.commands,
+            "server_keys": len({key for key, _ in self.limits}),
+        }
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes(
+            [
+                # PRCApiClient
+                web.get("/prc/server", self.prc_route("status")),
+                web.get("/prc/server/players", self.prc_route("players")),
+                web.get("/prc/server/queue", self.prc_route("queue")),
+                web.get("/prc/server/vehicles", self.prc_route("vehicles")),
+                web.get("/prc/server/modcalls", self.prc_route("modcalls")),
+                web.get("/prc/server/staff", self.prc_route("staff")),
+                web.get("/prc/server/bans", self.prc_route("bans")),
+                web.get("/prc/server/killlogs", self.prc_route("killlogs")),
+                web.get("/prc/server/joinlogs", self.prc_route("joinlogs")),
+                web.get("/prc/server/commandlogs", self.prc_route("commandlogs")),
+                web.post("/prc/server/command", self.prc_route(None, "command")),
+                # MCApiClient
+                web.get("/mc/Server", self.mc_route("status")),
+                web.get("/mc/Server/Players", self.mc_route("players")),
+                web.get("/mc/Server/Commands", self.mc_route("commandlogs")),
+                web.get("/mc/Server/Bans", self.mc_route("bans")),
+                web.post("/mc/Server/Auth", self.mc_auth),
+                web.get("/stats", self.stats),
+            ]
+        )
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8085) -> web.AppRunner:
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--logs", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=25)
+    parser.add_argument("--read-limit", type=int, default=35, help="GETs per server key per window, 0 disables rate limits")
+    parser.add_argument("--command-limit", type=int, default=1)
+    parser.add_argument("--window", type=float, default=1.0)
+    parser.add_argument("--refresh", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(arguments: argparse.Namespace) -> StandIn:
+    return StandIn(
+        players=arguments.players,
+        logs=arguments.logs,
+        latency_ms=arguments.latency_ms,
+        jitter_ms=arguments.jitter_ms,
+        read_limit=arguments.read_limit,
+        command_limit=arguments.command_limit,
+        window=arguments.window,
+        refresh=arguments.refresh,
+        seed=arguments.seed,
+    )
+
+
+async def serve(stand_in: StandIn, host: str, port: int):
+    await stand_in.start(host, port)
+    print(f"PRC stand-in on http://{host}:{port}/prc, Maple County on http://{host}:{port}/mc")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    add_arguments(parser)
+    arguments = parser.parse_args()
+    asyncio.run(serve(from_arguments(arguments), arguments.host, arguments.port))
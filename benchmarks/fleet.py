@@ -0,0 +1,295 @@
+"""
+Fleet scale benchmark of the ER:LC log task. Seeds thousands of guilds with
+linked servers into a local mongod, serves their servers from the local API
+stand-in (benchmarks.fake_erlc_api) and runs the real iterate_prc_logs_global
+over them, reporting throughput and per-guild tail latency.
+
+    python -m benchmarks.fleet [--guilds 2000] [--rounds 3] [--mongo mongodb://localhost:27017]
+
+It needs a mongod to seed: start a throwaway one (e.g.
+`docker run --rm -p 27017:27017 mongo:7`) or point --mongo, or the
+BENCHMARK_MONGO_URL environment variable, at one. Without a reachable mongod the
+benchmark is skipped. The API stand-in is started on --port by the benchmark itself.
+
+Discord is replaced by guilds whose channels swallow messages; everything else
+(Mongo documents, PRC client, snapshots, log cursors, command queue) is the code
+the bot runs. The benchmark database (--database) is dropped before seeding.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import motor.motor_asyncio
+import pymongo.errors
+
+from benchmarks.fake_erlc_api import StandIn, add_arguments, from_arguments
+from datamodels.LogCursors import LogCursors
+from datamodels.MapleKeys import MapleKeys
+from datamodels.ProhibitedUseKeys import ProhibitedUseKeys
+from datamodels.SavedLogs import SavedLogs
+from datamodels.ServerKeys import ServerKeys
+from datamodels.Settings import Settings
+from datamodels.Whitelabel import Whitelabel
+from tasks import iterate_prc_logs
+from utils.circuit_breaker import CircuitBreakers
+from utils.log_tracker import LogTracker
+from utils.mc_api import MCApiClient
+from utils.mongo import ensure_registered_indexes
+from utils.mongo_metrics import query_metrics
+from utils.prc_api import PRCApiClient
+from utils.server_snapshot import SnapshotEngine
+
+FIRST_GUILD_ID = 100_000_000_000_000_000
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, counters: dict):
+        self.id = channel_id
+        self.counters = counters
+
+    async def send(self, *args, embeds=None, embed=None, **kwargs):
+        self.counters["messages"] += 1
+        self.counters["embeds"] += len(embeds or []) + (embed is not None)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, counters: dict):
+        self.id = guild_id
+        self.counters = counters
+        self.members = []
+        self.roles = []
+
+    def get_channel(self, channel_id: int) -> FakeChannel:
+        return FakeChannel(channel_id, self.counters)
+
+    async def fetch_channel(self, channel_id: int) -> FakeChannel:
+        return self.get_channel(channel_id)
+
+    def get_member(self, user_id: int):
+        return None
+
+
+class FleetBot:
+    """
+    The attributes of erm.Bot the ER:LC tasks use, wired to the benchmark database
+    and the API stand-in.
+    """
+
+    environment = "PRODUCTION"
+
+    def __init__(self, mongo_url: str, database: str, api_url: str):
+        self.external_http_sessions = []
+        self.mongo = motor.motor_asyncio.AsyncIOMotorClient(
+            mongo_url, event_listeners=[query_metrics]
+        )
+        self.db = self.mongo[database]
+        self.settings = Settings(self.db, "settings")
+        self.server_keys = ServerKeys(self.db, "server_keys")
+        self.mc_keys = MapleKeys(self.db, "mc_keys")
+        self.saved_logs = SavedLogs(self.db, "command_logs")
+        self.log_cursors = LogCursors(self.db, "log_cursors")
+        self.whitelabel = Whitelabel(self.db, "whitelabel")
+        self.breakers = CircuitBreakers(
+            ProhibitedUseKeys(self.db, "server_key_breakers")
+        )
+
+        # Synthetic logs cover the last minute, process them from the first round on
+        self.start_time = time.time() - 3600
+        self.log_tracker = LogTracker(self)
+        self.team_restrictions_infractions = {}
+        self.kicked_users = {}
+
+        self.prc_api = PRCApiClient(self, base_url=f"{api_url}/prc", api_key="benchmark")
+        self.mc_api = MCApiClient(self, base_url=f"{api_url}/mc", api_key="benchmark")
+        self.snapshots = SnapshotEngine(self)
+
+        self.counters = {"messages": 0, "embeds": 0}
+        self.guilds: dict[int, FakeGuild] = {}
+
+    def get_guild(self, guild_id: int) -> FakeGuild:
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = FakeGuild(guild_id, self.counters)
+        return guild
+
+    async def fetch_guild(self, guild_id: int) -> FakeGuild:
+        return self.get_guild(guild_id)
+
+    async def close(self):
+        await self.log_tracker.flush()
+        for session in self.external_http_sessions:
+            await session.close()
+        self.mongo.close()
+
+
+async def seed(bot: FleetBot, guilds: int, mc_guilds: int):
+    await bot.mongo.drop_database(bot.db.name)
+    await ensure_registered_indexes()
+
+    guild_ids = [FIRST_GUILD_ID + i for i in range(guilds)]
+    async with bot.settings.bulk(ordered=False) as bulk:
+        for index, guild_id in enumerate(guild_ids):
+            await bulk.insert(
+                {
+                    "_id": guild_id,
+                    "ERLC": {
+                        "kill_logs": FIRST_GUILD_ID + 2 * index,
+                        "player_logs": FIRST_GUILD_ID + 2 * index + 1,
+                        "welcome_message": "Welcome to the server!",
+                    },
+                }
+            )
+    async with bot.server_keys.bulk(ordered=False) as bulk:
+        for guild_id in guild_ids:
+            await bulk.insert({"_id": guild_id, "key": f"prc-{guild_id}"})
+    async with bot.mc_keys.bulk(ordered=False) as bulk:
+        for guild_id in guild_ids[:mc_guilds]:
+            await bulk.insert({"guildId": guild_id, "uniqueToken": f"mc-{guild_id}"})
+    await asyncio.gather(bot.server_keys.load(), bot.mc_keys.load())
+    return guild_ids
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=1000, method="inclusive")[
+        min(int(fraction * 1000), 999) - 1
+    ]
+
+
+def report(name: str, started: float, latencies: list[float], failures: int):
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{name:<16} {len(latencies):>7} guilds {elapsed:>8.2f}s"
+        f" {len(latencies) / elapsed if elapsed else 0:>8.1f}/s"
+        f"  p50 {percentile(latencies, 0.5) * 1000:>7.1f}ms"
+        f"  p95 {percentile(latencies, 0.95) * 1000:>7.1f}ms"
+        f"  p99 {percentile(latencies, 0.99) * 1000:>7.1f}ms"
+        f"  max {(latencies[-1] if latencies else 0) * 1000:>7.1f}ms"
+        f"  failed {failures}"
+    )
+
+
+async def run_prc_round(bot: FleetBot, round_number: int):
+    latencies = []
+    failures = 0
+    original = iterate_prc_logs.unprimitive_guild_process
+
+    async def timed(items, bot):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            return await original(items, bot)
+        except Exception:
+            failures += 1
+            raise
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    # process_guild looks the function up at call time, time every guild through it
+    iterate_prc_logs.unprimitive_guild_process = timed
+    try:
+        started = time.perf_counter()
+        await iterate_prc_logs.iterate_prc_logs_global(bot)
+    finally:
+        iterate_prc_logs.unprimitive_guild_process = original
+    report(f"ER:LC round {round_number}", started, latencies, failures)
+
+
+async def run_mc_round(bot: FleetBot, guild_ids: list[int], round_number: int, concurrency: int):
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def poll(guild_id: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await bot.mc_api.get_server_players(guild_id)
+                await bot.mc_api.fetch_server_logs(guild_id)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[poll(guild_id) for guild_id in guild_ids])
+    report(f"MC round {round_number}", started, latencies, failures)
+
+
+async def mongo_reachable(mongo_url: str) -> bool:
+    client = motor.motor_asyncio.AsyncIOMotorClient(
+        mongo_url, serverSelectionTimeoutMS=2000
+    )
+    try:
+        await client.admin.command("ping")
+        return True
+    except pymongo.errors.ServerSelectionTimeoutError:
+        print(f"Skipping the fleet benchmark, no mongod reachable at {mongo_url}")
+        return False
+    finally:
+        client.close()
+
+
+async def main(arguments: argparse.Namespace):
+    if not await mongo_reachable(arguments.mongo):
+        return
+    stand_in: StandIn = from_arguments(arguments)
+    runner = await stand_in.start("127.0.0.1", arguments.port)
+    bot = FleetBot(arguments.mongo, arguments.database, f"http://127.0.0.1:{arguments.port}")
+    try:
+        guild_ids = await seed(bot, arguments.guilds, arguments.mc_guilds)
+        print(
+            f"{arguments.guilds} guilds ({arguments.mc_guilds} Maple County), "
+            f"{arguments.players} players, {arguments.logs} log entries, "
+            f"{arguments.latency_ms}+{arguments.jitter_ms}ms API latency\n"
+        )
+        for round_number in range(1, arguments.rounds + 1):
+            # Rounds stand for task iterations minutes apart, nothing fetched is still fresh
+            bot.snapshots.snapshots.clear()
+            bot.prc_api.response_cache.clear()
+            await run_prc_round(bot, round_number)
+            if arguments.mc_guilds:
+                await run_mc_round(
+                    bot, guild_ids[: arguments.mc_guilds], round_number, arguments.mc_concurrency
+                )
+        # Let the command queues drain before reading the counters
+        for _ in range(300):
+            if not bot.prc_api.commands.queues:
+                break
+            await asyncio.sleep(0.1)
+
+        operations = sum(
+            stats["count"]
+            for collection in query_metrics.snapshot()["collections"].values()
+            for stats in collection.values()
+        )
+        print(f"\nAPI stand-in:   {stand_in.stats_dict()}")
+        print(f"PRC cache:      {bot.prc_api.cache_stats()}")
+        print(f"Snapshots:      {bot.snapshots.stats()}")
+        print(f"Command queue:  {bot.prc_api.commands.stats()}")
+        print(f"Discord:        {bot.counters}")
+        print(f"Mongo commands: {operations}")
+    finally:
+        await bot.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--mc-guilds", type=int, default=200)
+    parser.add_argument("--mc-concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--mongo",
+        default=os.environ.get("BENCHMARK_MONGO_URL", "mongodb://localhost:27017"),
+    )
+    parser.add_argument("--database", default="erm_benchmark")
+    parser.add_argument("--port", type=int, default=8085)
+    add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
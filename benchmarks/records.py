@@ -0,0 +1,185 @@
+"""
+Memory and throughput of the slotted records against the BaseDataClass
+pattern they replaced.
+
+    python -m benchmarks.records [instances]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+from datamodels.ShiftManagement import ShiftItem
+from datamodels.Warnings import WarningItem
+from utils.basedataclass import BaseDataClass
+from utils.prc_api import CommandLog, Player
+
+
+class LegacyPlayer(BaseDataClass):
+    pass
+
+
+class LegacyCommandLog(BaseDataClass):
+    pass
+
+
+class LegacyWarningItem(BaseDataClass):
+    pass
+
+
+class LegacyShiftItem(BaseDataClass):
+    pass
+
+
+def player_item(i):
+    return {
+        "Player": f"Player{i}:{1000000 + i}",
+        "Permission": "Normal",
+        "Callsign": None,
+        "Team": "Civilian",
+    }
+
+
+def command_log_item(i):
+    return {
+        "Player": f"Player{i}:{1000000 + i}",
+        "Timestamp": 1700000000 + i,
+        "Command": f":h Message {i}",
+    }
+
+
+def warning_document(i):
+    return {
+        "_id": ObjectId(),
+        "Snowflake": 1200000000000000000 + i,
+        "Username": f"Player{i}",
+        "UserID": 1000000 + i,
+        "Type": "Warning",
+        "Reason": "RDM",
+        "Moderator": "Moderator",
+        "ModeratorID": 42,
+        "Guild": 987654321,
+        "Epoch": 1700000000 + i,
+        "UntilEpoch": 0,
+    }
+
+
+def shift_document(i):
+    return {
+        "_id": ObjectId(),
+        "Username": f"Staff{i}",
+        "Nickname": f"Staff{i}",
+        "UserID": 1000000 + i,
+        "Type": "Default",
+        "StartEpoch": 1700000000 + i,
+        "Breaks": [],
+        "Guild": 987654321,
+        "Moderations": [],
+        "EndEpoch": 0,
+        "AddedTime": 0,
+        "RemovedTime": 0,
+    }
+
+
+def legacy_player(item):
+    return LegacyPlayer(
+        username=item["Player"].split(":")[0],
+        id=item["Player"].split(":")[1],
+        permission=item["Permission"],
+        callsign=item.get("Callsign"),
+        team=item["Team"],
+    )
+
+
+def legacy_command_log(item):
+    return LegacyCommandLog(
+        username=item["Player"].split(":")[0] if ":" in item["Player"] else item["Player"],
+        user_id=item["Player"].split(":")[1] if ":" in item["Player"] else 0,
+        timestamp=item["Timestamp"],
+        is_automated=item["Player"] == "Remote Server",
+        command=item["Command"],
+    )
+
+
+def legacy_warning(i):
+    return LegacyWarningItem(
+        id=i["_id"],
+        snowflake=i["Snowflake"],
+        username=i["Username"],
+        user_id=i["UserID"],
+        warning_type=i["Type"],
+        reason=i["Reason"],
+        moderator_name=i["Moderator"],
+        moderator_id=i["ModeratorID"],
+        guild_id=i["Guild"],
+        time_epoch=i["Epoch"],
+        until_epoch=None if i.get("UntilEpoch") == 0 else i["UntilEpoch"],
+    )
+
+
+def legacy_shift(shift):
+    return LegacyShiftItem(
+        id=shift["_id"],
+        username=shift["Username"],
+        nickname=shift["Nickname"],
+        user_id=shift["UserID"],
+        type=shift["Type"],
+        start_epoch=shift["StartEpoch"],
+        breaks=[],
+        guild=shift["Guild"],
+        moderations=shift["Moderations"],
+        end_epoch=shift["EndEpoch"],
+        added_time=shift["AddedTime"],
+        removed_time=shift["RemovedTime"],
+    )
+
+
+CASES = [
+    ("Player", player_item, legacy_player, Player.from_api),
+    ("CommandLog", command_log_item, legacy_command_log, CommandLog.from_api),
+    ("WarningItem", warning_document, legacy_warning, WarningItem.from_document),
+    ("ShiftItem", shift_document, legacy_shift, ShiftItem.from_document),
+]
+
+
+def measure(build, sources):
+    gc.collect()
+    started = time.perf_counter()
+    objects = [build(source) for source in sources]
+    elapsed = time.perf_counter() - started
+    del objects
+
+    # Timed separately, tracemalloc slows allocation down considerably
+    gc.collect()
+    tracemalloc.start()
+    objects = [build(source) for source in sources]
+    # Only the records are new allocations, the sources are shared by both runs
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return elapsed, allocated
+
+
+def main(instances: int):
+    print(f"{instances} instances per type\n")
+    print(
+        f"{'type':<12} {'legacy B/obj':>13} {'slotted B/obj':>14} {'saved':>7}"
+        f" {'legacy obj/s':>13} {'slotted obj/s':>14}"
+    )
+    for name, make_source, legacy, slotted in CASES:
+        sources = [make_source(i) for i in range(instances)]
+        legacy_time, legacy_memory = measure(legacy, sources)
+        slotted_time, slotted_memory = measure(slotted, sources)
+        print(
+            f"{name:<12} {legacy_memory / instances:>13.0f}"
+            f" {slotted_memory / instances:>14.0f}"
+            f" {1 - slotted_memory / legacy_memory:>7.0%}"
+            f" {instances / legacy_time:>13,.0f} {instances / slotted_time:>14,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -76,7 +76,7 @@ class ActivityMonitoring(commands.Cog):
             "role_quotas", []
         )
 
-        async for shift_document in self.bot.shift_management.shifts.db.find(
+        async for shift_document in self.bot.shift_management.shifts.analytics.find(
             {
                 "Guild": ctx.guild.id,
                 "StartEpoch": {"$gt": timestamp_pre},
@@ -166,7 +166,7 @@ class ActivityMonitoring(commands.Cog):
             embeds[-1].description += f"{item}\n"
 
         actual_loas = []
-        async for loa_item in self.bot.loas.db.find({"guild_id": ctx.guild.id}):
+        async for loa_item in self.bot.loas.analytics.find({"guild_id": ctx.guild.id}):
             starting_epoch = loa_item["_id"].split("_")[2]
             if int(starting_epoch) >= timestamp_pre and loa_item.get("accepted", True):
                 loa_item["start_epoch"] = int(starting_epoch)
@@ -17,7 +17,7 @@ from menus import (
     ActivityNoticeAdministration,
 )
 from utils.constants import BLANK_COLOR, GREEN_COLOR
-from utils.paginators import CustomPage, SelectPagination
+from utils.paginators import CustomPage, KeysetCursor, LazyPageSource, SelectPagination
 from utils.timestamp import td_format
 from utils.utils import (
     invis_embed,
@@ -28,6 +28,9 @@ from utils.utils import (
     log_command_usage,
 )
 
+# Activity notices shown per page of a staff member's notice history
+NOTICES_PER_PAGE = 5
+
 
 class ActivityCoreCommands:
     """
@@ -682,37 +685,13 @@ class ActivityCoreCommands:
 
         request_upper = request_type_object.upper()
 
-        all_requests = []
-        async for item in self.bot.loas.db.find(
-            {"guild_id": ctx.guild.id, "user_id": ctx.author.id, "type": request_upper}
-        ):
-            all_requests.append(item)
-
-        def setup_embed() -> discord.Embed:
-            embed = discord.Embed(title="Activity Notices", color=BLANK_COLOR)
-            embed.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon)
-            return embed
-
-        embeds = []
-        for item in all_requests:
-            if len(embeds) == 0:
-                embeds.append(setup_embed())
-            if len(embeds[-1].fields) > 4:
-                embeds.append(setup_embed())
-            embeds[-1].add_field(
-                name=f"{item['type']}",
-                value=(
-                    f"> **Reason:** {item['reason']}\n"
-                    f"> **Started At:** <t:{int(item.get('started_at', int(item['_id'].split('_')[2])))}>\n"
-                    f"> **Ended At:** <t:{int(item['expiry'])}>"
-                ),
-                inline=False,
-            )
-        pages = [
-            CustomPage(embeds=[embed], identifier=str(index + 1))
-            for index, embed in enumerate(embeds)
-        ]
-        if len(pages) == 0:
+        cursor = KeysetCursor(
+            self.bot.loas.db,
+            {"guild_id": ctx.guild.id, "user_id": ctx.author.id, "type": request_upper},
+            NOTICES_PER_PAGE,
+        )
+        total = await cursor.count()
+        if total == 0:
             return await ctx.send(
                 embed=discord.Embed(
                     title="No Activity Notices",
@@ -721,13 +700,31 @@ class ActivityCoreCommands:
                 )
             )
 
-        if len(pages) != 1:
-            paginator = SelectPagination(self.bot, ctx.author.id, pages=pages)
-            await ctx.channel.send(embed=embeds[0], view=paginator)
+        def render_notices(documents: list[dict], index: int) -> CustomPage:
+            embed = discord.Embed(title="Activity Notices", color=BLANK_COLOR)
+            embed.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon)
+            for item in documents:
+                embed.add_field(
+                    name=f"{item['type']}",
+                    value=(
+                        f"> **Reason:** {item['reason']}\n"
+                        f"> **Started At:** <t:{int(item.get('started_at', int(item['_id'].split('_')[2])))}>\n"
+                        f"> **Ended At:** <t:{int(item['expiry'])}>"
+                    ),
+                    inline=False,
+                )
+            return CustomPage(embeds=[embed])
+
+        source = LazyPageSource(cursor, render_notices, total)
+        first_page = await source.get_page(0)
+
+        if len(source) != 1:
+            paginator = SelectPagination(self.bot, ctx.author.id, pages=source)
+            await ctx.channel.send(embed=first_page.embeds[0], view=paginator)
 
         else:
             await ctx.channel.send(
-                embed=embeds[0],
+                embed=first_page.embeds[0],
             )
 
 
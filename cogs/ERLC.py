@@ -3,7 +3,6 @@ import datetime
 import json
 import re
 import discord
-import roblox
 from discord.ext import commands
 from utils.autocompletes import erlc_group_autocomplete, erlc_players_autocomplete
 from roblox.thumbnails import AvatarThumbnailType 
@@ -133,8 +132,6 @@ class ERLC(commands.Cog):
             guild_id = int(guild_id)
             status: ServerStatus = await self.bot.mc_api.get_server_status(guild_id)
             players: list[Player] = await self.bot.mc_api.get_server_players(guild_id)
-            client = roblox.Client()
-
             embed1 = discord.Embed(title=f"{status.name}", color=BLANK_COLOR)
             embed1.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon)
             embed1.add_field(
@@ -148,8 +145,8 @@ class ERLC(commands.Cog):
             embed1.add_field(
                 name="Server Ownership",
                 value=(
-                    f"> **Owner:** [{(await client.get_user(status.owner_id)).name}](https://roblox.com/users/{status.owner_id}/profile)\n"
-                    f"> **Co-Owners:** {f', '.join([f'[{user.name}](https://roblox.com/users/{user.id}/profile)' for user in await client.get_users(status.co_owner_ids, expand=False)])}"
+                    f"> **Owner:** [{(await self.bot.identity.get_partial_user(status.owner_id)).name}](https://roblox.com/users/{status.owner_id}/profile)\n"
+                    f"> **Co-Owners:** {f', '.join([f'[{user.name}](https://roblox.com/users/{user.id}/profile)' for user in await self.bot.identity.get_partial_users(status.co_owner_ids)])}"
                 ),
                 inline=False,
             )
@@ -374,11 +371,9 @@ class ERLC(commands.Cog):
             )
         target = target.get("username", target.get("name", ""))
     
-        client = roblox.Client()
-        roblox_player = await client.get_user_by_username(target)
-
-        thumbnails = await client.thumbnails.get_user_avatar_thumbnails(
-            [roblox_player], type=AvatarThumbnailType.full_body, size="720x720"
+        roblox_player = await self.bot.identity.get_user_by_username(target)
+        thumbnail_url = await self.bot.identity.get_avatar_url(
+            roblox_player.id, type=AvatarThumbnailType.full_body, size="720x720"
         )
 
         server_staff = await self.bot.prc_api.get_server_staff(ctx.guild.id)
@@ -740,7 +735,7 @@ class ERLC(commands.Cog):
 
             section = discord.ui.Section(
                 accessory=discord.ui.Thumbnail(
-                    media=thumbnails[0].image_url if thumbnails else None
+                    media=thumbnail_url
              )
             ).add_item(f"## {roblox_player.name}\n### User Information\n> **Username:** `{roblox_player.name}`\n> **User ID:** `{roblox_player.id}`\n> **Permission:** {player_permission}\n{'> **Team:** {}{}{}'.format(erlc_player.team, newline, '> **Callsign:** `{}`'.format(erlc_player.callsign) if erlc_player.callsign else '') if erlc_player else ''}")
 
@@ -1022,6 +1017,8 @@ class ERLC(commands.Cog):
             )
         else:
             await self.bot.server_keys.upsert({"_id": ctx.guild.id, "key": key})
+            # Don't serve a snapshot, or a cached failure, of the previous key
+            self.bot.snapshots.forget(ctx.guild.id)
 
             await (
                 ctx.send
@@ -1044,7 +1041,8 @@ class ERLC(commands.Cog):
     @is_server_linked()
     async def server_unlink(self, ctx: commands.Context):
         await log_command_usage(self.bot, ctx.guild, ctx.author, f"ER:LC Unlink")
-        await self.bot.server_keys.delete_one({"_id": ctx.guild.id})
+        await self.bot.server_keys.delete_by_id(ctx.guild.id)
+        self.bot.snapshots.forget(ctx.guild.id)
         await ctx.send(
             embed=discord.Embed(
                 title=f"{self.bot.emoji_controller.get_emoji('success')} Successfully Unlinked",
@@ -1151,8 +1149,6 @@ class ERLC(commands.Cog):
             queue: int = await self.bot.prc_api.get_server_queue(
                 guild_id, minimal=True
             )  # this only returns the count
-            client = roblox.Client()
-
             embed1 = discord.Embed(title=f"{status.name}", color=BLANK_COLOR)
             embed1.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon)
             embed1.add_field(
@@ -1167,8 +1163,8 @@ class ERLC(commands.Cog):
             embed1.add_field(
                 name="Server Ownership",
                 value=(
-                    f"> **Owner:** [{(await client.get_user(status.owner_id)).name}](https://roblox.com/users/{status.owner_id}/profile)\n"
-                    f"> **Co-Owners:** {f', '.join([f'[{user.name}](https://roblox.com/users/{user.id}/profile)' for user in await client.get_users(status.co_owner_ids, expand=False)])}"
+                    f"> **Owner:** [{(await self.bot.identity.get_partial_user(status.owner_id)).name}](https://roblox.com/users/{status.owner_id}/profile)\n"
+                    f"> **Co-Owners:** {f', '.join([f'[{user.name}](https://roblox.com/users/{user.id}/profile)' for user in await self.bot.identity.get_partial_users(status.co_owner_ids)])}"
                 ),
                 inline=False,
             )
@@ -1664,10 +1660,15 @@ class ERLC(commands.Cog):
             )
 
 
-        players_to_members = {}
-        for player in players:
-            member = await self.bot.accounts.roblox_to_discord(ctx.guild, player.username, roblox_user_id=player.id)
-            players_to_members[player] = member
+        # Resolve every player's linked accounts in one query, the lookups below hit the cache
+        await self.bot.oauth2_users.get_discord_ids([player.id for player in players])
+        members = await asyncio.gather(
+            *[
+                self.bot.accounts.roblox_to_discord(ctx.guild, player.username, roblox_user_id=player.id)
+                for player in players
+            ]
+        )
+        players_to_members = dict(zip(players, members))
 
         view = discord.ui.LayoutView()
 
@@ -1743,12 +1744,8 @@ class ERLC(commands.Cog):
                 )
             )
 
-        client = roblox.Client()
-        roblox_player = await client.get_user_by_username(username)
-        thumbnails = await client.thumbnails.get_user_avatar_thumbnails(
-            [roblox_player], type=AvatarThumbnailType.headshot
-        )
-        thumbnail_url = thumbnails[0].image_url
+        roblox_player = await self.bot.identity.get_user_by_username(username)
+        thumbnail_url = await self.bot.identity.get_avatar_url(roblox_player.id)
 
         embed = discord.Embed(
             title="Confirm Refresh",
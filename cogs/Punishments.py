@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import json
 import typing
@@ -6,7 +7,6 @@ import aiohttp
 import discord
 import pytz
 import reactionmenu
-import roblox
 from decouple import config
 from discord import app_commands
 from discord.ext import commands
@@ -42,7 +42,7 @@ from menus import (
 from utils.AI import AI
 from utils.autocompletes import punishment_autocomplete, user_autocomplete
 from utils.constants import BLANK_COLOR, GREEN_COLOR
-from utils.paginators import SelectPagination, CustomPage
+from utils.paginators import SelectPagination, CustomPage, KeysetCursor, LazyPageSource
 from utils.utils import (
     admin_check,
     failure_embed,
@@ -55,6 +55,9 @@ from utils.utils import (
 )
 from utils.timestamp import td_format
 
+# BOLOs shown per page of the active BOLO list
+BOLOS_PER_PAGE = 4
+
 
 class Punishments(commands.Cog):
     def __init__(self, bot):
@@ -125,7 +128,6 @@ class Punishments(commands.Cog):
             )
 
         roblox_user = await get_roblox_by_username(user, self.bot, ctx)
-        roblox_client = roblox.Client()
         if not roblox_user or roblox_user.get("errors") is not None:
             return await ctx.send(
                 embed=discord.Embed(
@@ -135,11 +137,10 @@ class Punishments(commands.Cog):
                 )
             )
 
-        roblox_player = await roblox_client.get_user(roblox_user["id"])
-        thumbnails = await roblox_client.thumbnails.get_user_avatar_thumbnails(
-            [roblox_player], type=roblox.thumbnails.AvatarThumbnailType.headshot
+        roblox_player, thumbnail = await asyncio.gather(
+            self.bot.identity.get_partial_user(roblox_user["id"]),
+            self.bot.identity.get_avatar_url(roblox_user["id"]),
         )
-        thumbnail = thumbnails[0].image_url
 
         # Get and verify punishment type
         punishment_types = await self.bot.punishment_types.get_punishment_types(
@@ -674,106 +675,11 @@ class Punishments(commands.Cog):
 
         bot = self.bot
         if user is None:
-            bolos = await bot.punishments.get_guild_bolos(ctx.guild.id)
-            msg = None
-            if len(bolos) == 0:
-                return await ctx.reply(
-                    embed=discord.Embed(
-                        title="No Entries",
-                        description="There are no active BOLOs in this server.",
-                        color=BLANK_COLOR,
-                    )
-                )
-            embeds = []
-
-            embed = discord.Embed(
-                title="Active Ban BOLOs",
-                color=BLANK_COLOR,
-            )
-
-            embed.set_author(
-                name=ctx.guild.name,
-                icon_url=ctx.guild.icon,
-            )
-
-            embed.set_footer(
-                text="Click 'Mark as Complete' or 'Deny BOLO' and enter the BOLO ID."
-            )
-
-            embeds.append(embed)
-
-            for entry in bolos:
-                if len(embeds[-1].fields) == 4:
-                    new_embed = discord.Embed(
-                        title="Active Ban BOLOs",
-                        color=BLANK_COLOR,
-                    )
-
-                    new_embed.set_author(
-                        name=ctx.guild.name,
-                        icon_url=ctx.guild.icon,
-                    )
-
-                    embeds.append(new_embed)
-
-                warning: WarningItem = await bot.punishments.fetch_warning(entry["_id"])
-
-                embeds[-1].add_field(
-                    name=f"{warning.username} ({warning.user_id})",
-                    inline=False,
-                    value=(
-                        f"> **Moderator:** <@{warning.moderator_id}>\n"
-                        f"> **Reason:** {warning.reason}\n"
-                        f"> **At:** <t:{int(warning.time_epoch)}>\n"
-                        f"> **ID:** `{warning.snowflake}`"
-                    ),
-                )
-
-            for embed in embeds:
-                embed.title += " [{}]".format(len(bolos))
-
-            view = discord.ui.View()
-            view.add_item(
-                CustomExecutionButton(
-                    ctx.author.id,
-                    "Mark as Complete",
-                    discord.ButtonStyle.secondary,
-                    func=task,
-                )
-            )
-            view.add_item(
-                CustomExecutionButton(
-                    ctx.author.id,
-                    "Deny BOLO",
-                    discord.ButtonStyle.danger,
-                    func=deny_task,
-                )
-            )
-
-            paginator = SelectPagination(
-                self.bot,
-                ctx.author.id,
-                [
-                    CustomPage(embeds=[embed], view=view, identifier=str(index + 1))
-                    for index, embed in enumerate(embeds)
-                ],
-            )
-            current_page = paginator.get_current_view()
-
-            msg = await ctx.reply(embed=embeds[0], view=current_page)
-
+            query = {"Guild": ctx.guild.id, "Type": {"$in": ["BOLO", "Bolo"]}}
+            empty_description = "There are no active BOLOs in this server."
         else:
             roblox_user = await get_roblox_by_username(user, bot, ctx)
-            if roblox_user is None:
-                return await ctx.send(
-                    embed=discord.Embed(
-                        title="Could not find player",
-                        description="I could not find a Roblox player with that username.",
-                        color=BLANK_COLOR,
-                    )
-                )
-
-            if roblox_user.get("errors") is not None:
+            if roblox_user is None or roblox_user.get("errors") is not None:
                 return await ctx.send(
                     embed=discord.Embed(
                         title="Could not find player",
@@ -782,67 +688,58 @@ class Punishments(commands.Cog):
                     )
                 )
 
-            user = [
-                i
-                async for i in bot.punishments.find_warnings_by_spec(
-                    ctx.guild.id, user_id=roblox_user["id"], bolo=True
-                )
-            ]
-            bolos = user
-
-            if user is None:
-                return await ctx.reply(
-                    embed=discord.Embed(
-                        title="No Entries",
-                        description="There are no active BOLOs for this user in this server.",
-                        color=BLANK_COLOR,
-                    )
-                )
+            query = {
+                "Guild": ctx.guild.id,
+                "UserID": roblox_user["id"],
+                "Type": {"$regex": "bolo", "$options": "i"},
+            }
+            empty_description = "There are no active BOLOs for this user in this server."
 
-            if len(bolos) == 0:
-                return await ctx.reply(
-                    embed=discord.Embed(
-                        title="No Entries",
-                        description="There are no active BOLOs for this user in this server.",
-                        color=BLANK_COLOR,
-                    )
+        cursor = KeysetCursor(bot.punishments.db, query, BOLOS_PER_PAGE)
+        total = await cursor.count()
+        if total == 0:
+            return await ctx.reply(
+                embed=discord.Embed(
+                    title="No Entries",
+                    description=empty_description,
+                    color=BLANK_COLOR,
                 )
+            )
 
-            embeds = []
+        view = discord.ui.View()
+        view.add_item(
+            CustomExecutionButton(
+                ctx.author.id,
+                "Mark as Complete",
+                discord.ButtonStyle.secondary,
+                func=task,
+            )
+        )
+        view.add_item(
+            CustomExecutionButton(
+                ctx.author.id,
+                "Deny BOLO",
+                discord.ButtonStyle.danger,
+                func=deny_task,
+            )
+        )
 
+        def render_bolos(documents: list[dict], index: int) -> CustomPage:
             embed = discord.Embed(
-                title="Active Ban BOLOs",
+                title="Active Ban BOLOs [{}]".format(total),
                 color=BLANK_COLOR,
             )
-
             embed.set_author(
                 name=ctx.guild.name,
                 icon_url=ctx.guild.icon,
             )
+            if index == 0:
+                embed.set_footer(
+                    text="Click 'Mark as Complete' or 'Deny BOLO' and enter the BOLO ID."
+                )
 
-            embed.set_footer(
-                text="Click 'Mark as Complete' or 'Deny BOLO' and enter the BOLO ID."
-            )
-
-            embeds.append(embed)
-
-            for entry in bolos:
-                if len(embeds[-1].fields) == 4:
-                    new_embed = discord.Embed(
-                        title="Active Ban BOLOs",
-                        color=BLANK_COLOR,
-                    )
-
-                    new_embed.set_author(
-                        name=ctx.guild.name,
-                        icon_url=ctx.guild.icon,
-                    )
-
-                    embeds.append(new_embed)
-
-                warning: WarningItem = await bot.punishments.fetch_warning(entry["_id"])
-
-                embeds[-1].add_field(
+            for warning in map(WarningItem.from_document, documents):
+                embed.add_field(
                     name=f"{warning.username} ({warning.user_id})",
                     inline=False,
                     value=(
@@ -852,39 +749,15 @@ class Punishments(commands.Cog):
                         f"> **ID:** `{warning.snowflake}`"
                     ),
                 )
+            return CustomPage(embeds=[embed], view=view)
 
-            for embed in embeds:
-                embed.title += " [{}]".format(len(bolos))
-
-            view = discord.ui.View()
-            view.add_item(
-                CustomExecutionButton(
-                    ctx.author.id,
-                    "Mark as Complete",
-                    discord.ButtonStyle.secondary,
-                    func=task,
-                )
-            )
-            view.add_item(
-                CustomExecutionButton(
-                    ctx.author.id,
-                    "Deny BOLO",
-                    discord.ButtonStyle.danger,
-                    func=deny_task,
-                )
-            )
+        source = LazyPageSource(cursor, render_bolos, total)
+        first_page = await source.get_page(0)
 
-            paginator = SelectPagination(
-                self.bot,
-                ctx.author.id,
-                [
-                    CustomPage(embeds=[embed], view=view, identifier=str(index + 1))
-                    for index, embed in enumerate(embeds)
-                ],
-            )
-            current_page = paginator.get_current_view()
+        paginator = SelectPagination(self.bot, ctx.author.id, source)
+        current_page = paginator.get_current_view()
 
-            msg = await ctx.reply(embed=embeds[0], view=current_page)
+        msg = await ctx.reply(embed=first_page.embeds[0], view=current_page)
 
 
     @punishments.command(
@@ -934,7 +807,7 @@ class Punishments(commands.Cog):
             }
         ]
 
-        results = [i async for i in self.bot.punishments.db.aggregate(pipeline)]
+        results = [i async for i in self.bot.punishments.analytics.aggregate(pipeline)]
         sorted_results = sorted(
             results, key=lambda x: x["ModerationCount"], reverse=True
         )
@@ -1007,7 +880,6 @@ class Punishments(commands.Cog):
             )
 
         roblox_user = await get_roblox_by_username(user, self.bot, ctx)
-        roblox_client = roblox.Client()
         if not roblox_user or roblox_user.get("errors") is not None:
             return await ctx.send(
                 embed=discord.Embed(
@@ -1017,11 +889,10 @@ class Punishments(commands.Cog):
                 )
             )
 
-        roblox_player = await roblox_client.get_user(roblox_user["id"])
-        thumbnails = await roblox_client.thumbnails.get_user_avatar_thumbnails(
-            [roblox_player], type=roblox.thumbnails.AvatarThumbnailType.headshot
+        roblox_player, thumbnail = await asyncio.gather(
+            self.bot.identity.get_partial_user(roblox_user["id"]),
+            self.bot.identity.get_avatar_url(roblox_user["id"]),
         )
-        thumbnail = thumbnails[0].image_url
 
         oid = await self.bot.punishments.insert_warning(
             ctx.author.id,
@@ -8,8 +8,6 @@ from discord import app_commands
 from discord.ext import commands
 from reactionmenu import ViewButton, ViewMenu, Page
 from reactionmenu.abc import _PageController
-from roblox import client as roblox
-import roblox as rbx_api
 
 from datamodels.StaffConnections import StaffConnection
 from datamodels.Warnings import WarningItem
@@ -23,9 +21,28 @@ from utils.utils import (
     get_roblox_by_username,
     require_settings,
 )
-from utils.paginators import SelectPagination, CustomPage
+from utils.paginators import SelectPagination, CustomPage, KeysetCursor, LazyPageSource
 
-client = roblox.Client()
+
+# Punishments shown per page of the punishment history
+WARNINGS_PER_PAGE = 3
+
+
+def punishment_summary(counts: dict[str, int], total_label: str) -> str:
+    """
+    Formats the per-type counts from Warnings.count_warnings_by_type.
+    """
+    other = sum(
+        v for k, v in counts.items() if k.upper() not in ["WARNING", "KICK", "BAN", "BOLO"]
+    )
+    return (
+        f"> **{total_label}:** {sum(counts.values())}\n"
+        f"> **Warnings:** {counts.get('Warning', 0)}\n"
+        f"> **Kicks:** {counts.get('Kick', 0)}\n"
+        f"> **Bans:** {counts.get('Ban', 0)}\n"
+        f"> **BOLOs:** {sum(v for k, v in counts.items() if k.upper() == 'BOLO')}\n"
+        f"> **Other:** {other}"
+    )
 
 
 class Search(commands.Cog):
@@ -67,22 +84,17 @@ class Search(commands.Cog):
             )
         roblox_user = roblox_user["robloxID"]
 
-        client = roblox.Client()
-        roblox_player = await client.get_user(roblox_user)
+        roblox_player = await bot.identity.get_user(roblox_user)
 
-        warnings: list[WarningItem] = (
-            await bot.punishments.get_warnings(roblox_player.id, guild_id) or []
+        counts = await bot.punishments.count_warnings_by_type(
+            guild_id, user_id=roblox_player.id
         )
 
         player_information_embed = discord.Embed(
             title=f"{roblox_player.name}",
             color=BLANK_COLOR,
         )
-        punishments_embed = discord.Embed(
-            title=player_information_embed.title,
-            color=BLANK_COLOR,
-        )
-        embed_list = [player_information_embed, punishments_embed]
+        embed_list = [player_information_embed]
 
         magic_flags = {
             "ERM Team": 1001972346661384302,
@@ -150,14 +162,7 @@ class Search(commands.Cog):
         if ctx.author == user:
             embed_list[0].add_field(
                 name="Punishments",
-                value=(
-                    f"> **Total Punishments:** {len(warnings)}\n"
-                    f"> **Warnings:** {len(list(filter(lambda x: x.warning_type == 'Warning', warnings)))}\n"
-                    f"> **Kicks:** {len(list(filter(lambda x: x.warning_type == 'Kick', warnings)))}\n"
-                    f"> **Bans:** {len(list(filter(lambda x: x.warning_type == 'Ban', warnings)))}\n"
-                    f"> **BOLOs:** {len(list(filter(lambda x: x.warning_type.upper() == 'BOLO', warnings)))}\n"
-                    f"> **Other:** {len(list(filter(lambda x: x.warning_type.upper() not in ['WARNING', 'KICK', 'BAN', 'BOLO'], warnings)))}"
-                ),
+                value=punishment_summary(counts, "Total Punishments"),
                 inline=False,
             )
 
@@ -168,28 +173,13 @@ class Search(commands.Cog):
 
             moderator_id = user.id if user else ctx.author.id
 
-            moderations = list(
-                filter(
-                    lambda x: x is not None,
-                    [
-                        await bot.punishments.fetch_warning(i["_id"])
-                        async for i in bot.punishments.db.find(
-                            {"ModeratorID": moderator_id, "Guild": guild_id}
-                        )
-                    ],
-                )
+            moderations = await bot.punishments.count_warnings_by_type(
+                guild_id, moderator_id=moderator_id
             )
 
             embed_list[0].add_field(
                 name="Staff Information",
-                value=(
-                    f"> **Total Moderations:** {len(moderations)}\n"
-                    f"> **Warnings:** {len(list(filter(lambda x: x.warning_type == 'Warning', moderations)))}\n"
-                    f"> **Kicks:** {len(list(filter(lambda x: x.warning_type == 'Kick', moderations)))}\n"
-                    f"> **Bans:** {len(list(filter(lambda x: x.warning_type == 'Ban', moderations)))}\n"
-                    f"> **BOLOs:** {len(list(filter(lambda x: x.warning_type.upper() == 'BOLO', moderations)))}\n"
-                    f"> **Other:** {len(list(filter(lambda x: x.warning_type.upper() not in ['WARNING', 'KICK', 'BAN', 'BOLO'], moderations)))}"
-                ),
+                value=punishment_summary(moderations, "Total Moderations"),
                 inline=False,
             )
         else:
@@ -202,62 +192,57 @@ class Search(commands.Cog):
                     )
                 )
 
-        def add_warning_field(warning):
-            new_line = "\n"
-            embed_list[-1].add_field(
-                name=f"{warning['Type']}",
-                inline=False,
-                value=(
-                    f"> **Reason:** {warning.reason}\n"
-                    f"> **At:** <t:{int(warning.time_epoch)}>\n"
-                    f'{"> **Until:** <t:{}>{}".format(int(warning.until_epoch), new_line) if warning.until_epoch is not None else ""}'
-                    f"> **ID:** `{warning.snowflake}`"
-                ),
-            )
+        thumbnail_url = await bot.identity.get_avatar_url(roblox_player.id)
 
-        for warning in warnings:
-            if ctx.author != user:
-                break
-            if len(embed_list[-1].fields) <= 2:
-                add_warning_field(warning)
-            else:
-                new_embed = discord.Embed(title=embed_list[0].title, color=BLANK_COLOR)
-                embed_list.append(new_embed)
-                add_warning_field(warning)
-
-        thumbnails = await client.thumbnails.get_user_avatar_thumbnails(
-            [roblox_player], type=rbx_api.thumbnails.AvatarThumbnailType.headshot
-        )
-        thumbnail_url = thumbnails[0].image_url
-        for embed in embed_list:
-            if len(embed.fields or []) == 0:
-                embed_list.remove(embed)
+        def setup_embed(embed: discord.Embed) -> discord.Embed:
             embed.set_thumbnail(url=thumbnail_url)
             embed.set_author(
                 name=ctx.author.name, icon_url=ctx.author.display_avatar.url
             )
+            return embed
 
-        pages = [
-            (
+        def render_warnings(documents: list[dict], index: int) -> CustomPage:
+            new_line = "\n"
+            embed = setup_embed(
+                discord.Embed(title=embed_list[0].title, color=BLANK_COLOR)
+            )
+            for warning in map(WarningItem.from_document, documents):
+                embed.add_field(
+                    name=f"{warning['Type']}",
+                    inline=False,
+                    value=(
+                        f"> **Reason:** {warning.reason}\n"
+                        f"> **At:** <t:{int(warning.time_epoch)}>\n"
+                        f'{"> **Until:** <t:{}>{}".format(int(warning.until_epoch), new_line) if warning.until_epoch is not None else ""}'
+                        f"> **ID:** `{warning.snowflake}`"
+                    ),
+                )
+            return CustomPage(embeds=[embed])
+
+        source = LazyPageSource(
+            KeysetCursor(
+                bot.punishments.db,
+                {"Guild": guild_id, "UserID": roblox_player.id},
+                WARNINGS_PER_PAGE,
+                sort_field="Epoch",
+            ),
+            render_warnings,
+            # Punishments are only listed to the user themselves
+            sum(counts.values()) if ctx.author == user else 0,
+            leading_pages=[
                 CustomPage(
-                    embeds=[embed],
-                    identifier=str(index + 1) if index != 0 else "Player Information",
+                    embeds=[setup_embed(embed_list[0])],
+                    identifier="Player Information",
                 )
-                if len(embed.fields) > 0
-                else None
-            )
-            for index, embed in enumerate(embed_list)
-        ]
-        paginator = SelectPagination(
-            self.bot, ctx.author.id, list(filter(lambda x: x is not None, pages))
+            ],
         )
+        first_page = await source.get_page(0)
 
-        # # print(embed_list)
-        # [# print(obj) for obj in [embed.to_dict() for embed in embed_list]]
-        if len(embed_list) == 1:
-            return await ctx.send(embeds=pages[0].embeds)
+        if len(source) == 1:
+            return await ctx.send(embeds=first_page.embeds)
 
-        paginator.message = await ctx.send(embeds=pages[0].embeds, view=paginator)
+        paginator = SelectPagination(self.bot, ctx.author.id, source)
+        paginator.message = await ctx.send(embeds=first_page.embeds, view=paginator)
 
     @commands.guild_only()
     @commands.hybrid_command(
@@ -302,22 +287,17 @@ class Search(commands.Cog):
                 )
             )
 
-        client = roblox.Client()
-        roblox_player = await client.get_user_by_username(roblox_user["name"])
+        roblox_player = await bot.identity.get_user_by_username(roblox_user["name"])
 
-        warnings: list[WarningItem] = (
-            await bot.punishments.get_warnings(roblox_player.id, ctx.guild.id) or []
+        counts = await bot.punishments.count_warnings_by_type(
+            ctx.guild.id, user_id=roblox_player.id
         )
 
         player_information_embed = discord.Embed(
             title=f"{roblox_player.name}",
             color=BLANK_COLOR,
         )
-        punishments_embed = discord.Embed(
-            title=player_information_embed.title,
-            color=BLANK_COLOR,
-        )
-        embed_list = [player_information_embed, punishments_embed]
+        embed_list = [player_information_embed]
 
         alert_maps = {
             "IsBanned": roblox_player.is_banned,
@@ -327,7 +307,7 @@ class Search(commands.Cog):
             < 100,
             "NotManyFriends": (await roblox_player.get_friend_count()) < 30,
             # "NotManyGroups": len(await roblox_player.get_group_roles()) < 5, - This flag has been removed for ratelimiting purposes
-            "HasBOLO": "BOLO" in [warning.warning_type.upper() for warning in warnings],
+            "HasBOLO": "BOLO" in [warning_type.upper() for warning_type in counts],
         }
         triggered_alerts = [
             item[0] for item in list(filter(lambda x: x[1] is True, alert_maps.items()))
@@ -400,14 +380,7 @@ class Search(commands.Cog):
 
         embed_list[0].add_field(
             name="Punishments",
-            value=(
-                f"> **Total Punishments:** {len(warnings)}\n"
-                f"> **Warnings:** {len(list(filter(lambda x: x.warning_type == 'Warning', warnings)))}\n"
-                f"> **Kicks:** {len(list(filter(lambda x: x.warning_type == 'Kick', warnings)))}\n"
-                f"> **Bans:** {len(list(filter(lambda x: x.warning_type == 'Ban', warnings)))}\n"
-                f"> **BOLOs:** {len(list(filter(lambda x: x.warning_type.upper() == 'BOLO', warnings)))}\n"
-                f"> **Other:** {len(list(filter(lambda x: x.warning_type.upper() not in ['WARNING', 'KICK', 'BAN', 'BOLO'], warnings)))}"
-            ),
+            value=punishment_summary(counts, "Total Punishments"),
             inline=False,
         )
 
@@ -419,58 +392,54 @@ class Search(commands.Cog):
             inline=False,
         )
 
-        def add_warning_field(warning):
-            new_line = "\n"
-            embed_list[-1].add_field(
-                name=f"{warning['Type']}",
-                inline=False,
-                value=(
-                    f"> **Moderator:** <@{warning.moderator_id}>\n"
-                    f"> **Reason:** {warning.reason}\n"
-                    f"> **At:** <t:{int(warning.time_epoch)}>\n"
-                    f'{"> **Until:** <t:{}>{}".format(int(warning.until_epoch), new_line) if warning.until_epoch is not None else ""}'
-                    f"> **ID:** `{warning.snowflake}`"
-                ),
-            )
-
-        for warning in warnings:
-            if len(embed_list[-1].fields) <= 2:
-                add_warning_field(warning)
-            else:
-                new_embed = discord.Embed(title=embed_list[0].title, color=BLANK_COLOR)
-                embed_list.append(new_embed)
-                add_warning_field(warning)
+        thumbnail_url = await bot.identity.get_avatar_url(roblox_player.id)
 
-        thumbnails = await client.thumbnails.get_user_avatar_thumbnails(
-            [roblox_player], type=rbx_api.thumbnails.AvatarThumbnailType.headshot
-        )
-        thumbnail_url = thumbnails[0].image_url
-        for embed in embed_list:
-            if len(embed.fields or []) == 0:
-                embed_list.remove(embed)
+        def setup_embed(embed: discord.Embed) -> discord.Embed:
             embed.set_thumbnail(url=thumbnail_url)
             embed.set_author(
                 name=ctx.author.name, icon_url=ctx.author.display_avatar.url
             )
+            return embed
 
-        pages = [
-            (
-                CustomPage(embeds=[embed], identifier=str(index + 1))
-                if len(embed.fields) > 0
-                else None
+        def render_warnings(documents: list[dict], index: int) -> CustomPage:
+            new_line = "\n"
+            embed = setup_embed(
+                discord.Embed(title=embed_list[0].title, color=BLANK_COLOR)
             )
-            for index, embed in enumerate(embed_list)
-        ]
-        paginator = SelectPagination(
-            self.bot, ctx.author.id, list(filter(lambda x: x is not None, pages))
+            for warning in map(WarningItem.from_document, documents):
+                embed.add_field(
+                    name=f"{warning['Type']}",
+                    inline=False,
+                    value=(
+                        f"> **Moderator:** <@{warning.moderator_id}>\n"
+                        f"> **Reason:** {warning.reason}\n"
+                        f"> **At:** <t:{int(warning.time_epoch)}>\n"
+                        f'{"> **Until:** <t:{}>{}".format(int(warning.until_epoch), new_line) if warning.until_epoch is not None else ""}'
+                        f"> **ID:** `{warning.snowflake}`"
+                    ),
+                )
+            return CustomPage(embeds=[embed])
+
+        source = LazyPageSource(
+            KeysetCursor(
+                bot.punishments.db,
+                {"Guild": ctx.guild.id, "UserID": roblox_player.id},
+                WARNINGS_PER_PAGE,
+                sort_field="Epoch",
+            ),
+            render_warnings,
+            sum(counts.values()),
+            leading_pages=[
+                CustomPage(embeds=[setup_embed(embed_list[0])], identifier="1")
+            ],
         )
+        first_page = await source.get_page(0)
 
-        # # print(embed_list)
-        # [# print(obj) for obj in [embed.to_dict() for embed in embed_list]]
-        if len(embed_list) == 1:
-            return await ctx.send(embeds=pages[0].embeds)
+        if len(source) == 1:
+            return await ctx.send(embeds=first_page.embeds)
 
-        paginator.message = await ctx.send(embeds=pages[0].embeds, view=paginator)
+        paginator = SelectPagination(self.bot, ctx.author.id, source)
+        paginator.message = await ctx.send(embeds=first_page.embeds, view=paginator)
 
     @commands.hybrid_command(
         name="userid",
@@ -499,12 +468,8 @@ class Search(commands.Cog):
                 )
             )
 
-        client = roblox.Client()
-        roblox_player = await client.get_user_by_username(roblox_user["name"])
-        thumbnails = await client.thumbnails.get_user_avatar_thumbnails(
-            [roblox_player], type=rbx_api.thumbnails.AvatarThumbnailType.headshot
-        )
-        thumbnail = thumbnails[0].image_url
+        roblox_player = await bot.identity.get_user_by_username(roblox_user["name"])
+        thumbnail = await bot.identity.get_avatar_url(roblox_player.id)
         embed = discord.Embed(title=roblox_player.name, color=BLANK_COLOR)
 
         embed.set_author(name=ctx.author.name, icon_url=ctx.author.display_avatar.url)
@@ -27,7 +27,7 @@ from menus import (
 )
 from utils.autocompletes import shift_type_autocomplete, all_shift_type_autocomplete
 from utils.constants import BLANK_COLOR, GREEN_COLOR, ORANGE_COLOR, RED_COLOR
-from utils.paginators import SelectPagination, CustomPage
+from utils.paginators import SelectPagination, CustomPage, KeysetCursor, LazyPageSource
 from utils.timestamp import td_format
 from utils.utils import (
     get_elapsed_time,
@@ -950,7 +950,7 @@ class ShiftLogging(commands.Cog):
             pipeline[0]["$match"]["Type"] = shift_type["name"]
 
         all_staff = {}
-        async for doc in bot.shift_management.shifts.db.aggregate(pipeline):
+        async for doc in bot.shift_management.shifts.analytics.aggregate(pipeline):
             total_seconds = doc["total_seconds"]
 
             # Calculate total break time for the shift
@@ -1405,11 +1405,14 @@ class ShiftLogging(commands.Cog):
                     )
                 )
 
-        shift_cursor = self.bot.shift_management.shifts.db.find(
-            {"UserID": user.id, "Guild": ctx.guild.id, "Type": shift_type_item["name"]}
+        cursor = KeysetCursor(
+            self.bot.shift_management.shifts.db,
+            {"UserID": user.id, "Guild": ctx.guild.id, "Type": shift_type_item["name"]},
+            1,
+            sort_field="StartEpoch",
         )
-        shifts = await shift_cursor.to_list(length=None)
-        if not shifts:
+        total = await cursor.count()
+        if total == 0:
             return await ctx.send(
                 embed=discord.Embed(
                     title="No Shifts",
@@ -1418,9 +1421,13 @@ class ShiftLogging(commands.Cog):
                 )
             )
 
-        embeds = []
-        for shift in shifts:
+        def render_shift(documents: list[dict], index: int) -> CustomPage:
             embed = discord.Embed(title=f"{user.name}'s Shifts", color=BLANK_COLOR)
+            if not documents:
+                # Deleted since the history was opened
+                embed.description = "This shift no longer exists."
+                return CustomPage(embeds=[embed])
+            shift = documents[0]
             embed.add_field(
                 name="Shift Information",
                 value=(
@@ -1439,17 +1446,13 @@ class ShiftLogging(commands.Cog):
             ).set_thumbnail(
                 url=user.display_avatar.url
             )
-            embeds.append(embed)
+            return CustomPage(embeds=[embed])
 
-        paginator = SelectPagination(
-            self.bot,
-            ctx.author.id,
-            [
-                CustomPage(embeds=[embed], identifier=str(index + 1))
-                for index, embed in enumerate(embeds)
-            ],
-        )
-        await ctx.reply(embed=embeds[0], view=paginator.get_current_view())
+        source = LazyPageSource(cursor, render_shift, total)
+        first_page = await source.get_page(0)
+
+        paginator = SelectPagination(self.bot, ctx.author.id, source)
+        await ctx.reply(embed=first_page.embeds[0], view=paginator.get_current_view())
 
 
 async def setup(bot):
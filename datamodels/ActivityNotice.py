@@ -1,7 +1,15 @@
 from discord.ext import commands
 import discord
+from pymongo import ASCENDING, IndexModel
 from utils.mongo import Document
 
 
 class ActivityNotices(Document):
-    pass
+    indexes = [
+        IndexModel([("expired", ASCENDING), ("expiry", ASCENDING)]),
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("type", ASCENDING)]),
+    ]
+    query_shapes = [
+        {"expired": False, "expiry": {"$lt": 0}},
+        {"guild_id": 0, "user_id": 0, "type": "LOA"},
+    ]
@@ -1,7 +1,54 @@
 from discord.ext import commands
 import discord
+from datamodels.OAuth2Users import LINKED_ACCOUNTS_CACHE_SIZE, LINKED_ACCOUNTS_CACHE_TTL
+from utils.cache import MISSING, TTLCache
 from utils.mongo import Document
 
 
 class Consent(Document):
-    pass
+    def __init__(self, connection, document_name):
+        super().__init__(connection, document_name)
+        self.cache = TTLCache(
+            ttl=LINKED_ACCOUNTS_CACHE_TTL, max_size=LINKED_ACCOUNTS_CACHE_SIZE
+        )
+
+    async def get_consents(self, user_ids) -> dict[int, dict]:
+        """
+        User ID -> their consent document ({} if they never changed a setting),
+        with one $in query for the users that aren't cached.
+        """
+        result, missing = {}, []
+        for user_id in {int(i) for i in user_ids}:
+            document = self.cache.get(user_id)
+            if document is MISSING:
+                missing.append(user_id)
+            else:
+                result[user_id] = document
+        if missing:
+            found = {
+                document["_id"]: document
+                async for document in self.db.find({"_id": {"$in": missing}})
+            }
+            for user_id in missing:
+                result[user_id] = found.get(user_id, {})
+                self.cache.set(user_id, result[user_id])
+        return result
+
+    # <-- Writes invalidate the cached document -->
+    async def insert(self, dict):
+        await super().insert(dict)
+        self.cache.invalidate(dict["_id"])
+
+    async def upsert(self, dict, return_document: bool = False):
+        result = await super().upsert(dict, return_document)
+        self.cache.invalidate(dict["_id"])
+        return result
+
+    async def update_by_id(self, dict, return_document: bool = False):
+        result = await super().update_by_id(dict, return_document)
+        self.cache.invalidate(dict["_id"])
+        return result
+
+    async def delete_by_id(self, id):
+        await super().delete_by_id(id)
+        self.cache.invalidate(id)
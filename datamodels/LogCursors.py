@@ -0,0 +1,32 @@
+from utils.mongo import Document
+
+
+class LogCursors(Document):
+    """
+    Where log processing stopped for every guild. One small document per guild,
+    keyed by guild id, holding the last processed timestamp of every log type:
+    {"_id": guild_id, "kill_logs": 1700000000, "player_logs": 1700000000, ...}
+    """
+
+    async def load(self, guild_id: int) -> dict[str, int]:
+        """
+        Returns the persisted cursors of a guild, keyed by log type.
+        """
+        document = await self.db.find_one({"_id": guild_id})
+        if not document:
+            return {}
+        return {key: value for key, value in document.items() if key != "_id"}
+
+    async def save(self, cursors: dict[int, dict[str, int]]):
+        """
+        Writes the cursors of several guilds in one bulk write. Cursors only ever
+        move forward, so processes writing the same guild can't undo each other.
+        Params:
+         - cursors (dict) : guild id -> {log type: timestamp}
+        """
+        async with self.bulk(ordered=False) as bulk:
+            for guild_id, timestamps in cursors.items():
+                if timestamps:
+                    await bulk.update_one(
+                        {"_id": guild_id}, {"$max": timestamps}, upsert=True
+                    )
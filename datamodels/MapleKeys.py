@@ -1,12 +1,9 @@
 from discord.ext import commands
 import discord
-from utils.mongo import Document
-from datamodels.ServerKeys import ServerKey
+from datamodels.ServerKeys import KeyDirectory
 
 
-class MapleKeys(Document):
-    async def get_server_key(self, guild_id: int):
-        doc = await self.db.find_one({"guildId": guild_id})
-        if not doc:
-            return None
-        return ServerKey(guild_id=doc["guildId"], key=doc["uniqueToken"])
+class MapleKeys(KeyDirectory):
+    # Keys are written by the Maple County integration, under their own _id
+    guild_field = "guildId"
+    key_field = "uniqueToken"
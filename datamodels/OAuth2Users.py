@@ -1,7 +1,80 @@
+from decouple import config
 from discord.ext import commands
 import discord
+from pymongo import ASCENDING, IndexModel
+from utils.cache import MISSING, TTLCache
 from utils.mongo import Document
 
+# Seconds a resolved link (or the absence of one) is reused. Links are created by
+# the OAuth2 flow outside of the bot, so this bounds how long a new link goes unseen.
+LINKED_ACCOUNTS_CACHE_TTL = int(config("LINKED_ACCOUNTS_CACHE_TTL", default=60))
+LINKED_ACCOUNTS_CACHE_SIZE = int(config("LINKED_ACCOUNTS_CACHE_SIZE", default=20000))
+
 
 class OAuth2Users(Document):
-    pass
+    """
+    Roblox accounts linked to Discord accounts. Lookups take many IDs at once and
+    are answered with one $in query for the IDs that aren't cached.
+    """
+
+    indexes = [
+        IndexModel([("roblox_id", ASCENDING)]),
+        IndexModel([("discord_id", ASCENDING)]),
+    ]
+    query_shapes = [{"roblox_id": 0}, {"discord_id": 0}]
+
+    def __init__(self, connection, document_name):
+        super().__init__(connection, document_name)
+        self.cache = TTLCache(
+            ttl=LINKED_ACCOUNTS_CACHE_TTL, max_size=LINKED_ACCOUNTS_CACHE_SIZE
+        )
+
+    async def _resolve(self, field: str, ids, collect) -> dict:
+        result, missing = {}, []
+        for id in {int(i) for i in ids}:
+            value = self.cache.get((field, id))
+            if value is MISSING:
+                missing.append(id)
+            else:
+                result[id] = value
+        if missing:
+            documents = {id: [] for id in missing}
+            async for document in self.db.find(
+                {field: {"$in": missing}}, {"roblox_id": 1, "discord_id": 1}
+            ):
+                documents[document[field]].append(document)
+            for id, linked in documents.items():
+                result[id] = collect(linked)
+                self.cache.set((field, id), result[id])
+        return result
+
+    async def get_discord_ids(self, roblox_ids) -> dict[int, tuple[int, ...]]:
+        """
+        Roblox ID -> the Discord IDs linked to it (empty if none).
+        """
+        return await self._resolve(
+            "roblox_id",
+            roblox_ids,
+            lambda linked: tuple(
+                document["discord_id"] for document in linked if document.get("discord_id")
+            ),
+        )
+
+    async def get_roblox_ids(self, discord_ids) -> dict[int, int | None]:
+        """
+        Discord ID -> the Roblox ID linked to it, or None.
+        """
+        return await self._resolve(
+            "discord_id",
+            discord_ids,
+            lambda linked: linked[0]["roblox_id"] if linked else None,
+        )
+
+    async def get_roblox_id(self, discord_id: int) -> int | None:
+        return (await self.get_roblox_ids([discord_id]))[int(discord_id)]
+
+    def invalidate(self, roblox_id: int | None = None, discord_id: int | None = None):
+        if roblox_id is not None:
+            self.cache.invalidate(("roblox_id", int(roblox_id)))
+        if discord_id is not None:
+            self.cache.invalidate(("discord_id", int(discord_id)))
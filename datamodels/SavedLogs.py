@@ -1,14 +1,132 @@
+import datetime
+
+import pymongo.errors
 from discord.ext import commands
 import discord
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from utils.mongo import Document
 from utils.basedataclass import BaseDataClass
 
+# Command logs are only kept for 3 hours
+LOG_RETENTION = 10800
+
 
 class SavedLog(BaseDataClass):
     guild_id: int
-    timestamp: int
-    logs: list[dict]
+    timestamp: datetime.datetime
+    username: str
+    user_id: int
+    is_automated: bool
+    command: str
 
 
 class SavedLogs(Document):
-    pass
+    """
+    Append-only storage for PRC command logs. Every log line is its own
+    entry in a time-series collection keyed by guild and timestamp, and the
+    server expires entries once they are older than LOG_RETENTION.
+    """
+
+    indexes = [IndexModel([("guild_id", ASCENDING), ("timestamp", DESCENDING)])]
+
+    def __init__(self, connection, document_name):
+        super().__init__(connection, document_name)
+        self._last_timestamps: dict[int, int] = {}
+
+    async def ensure_indexes(self):
+        try:
+            await self.db.database.create_collection(
+                self.db.name,
+                timeseries={
+                    "timeField": "timestamp",
+                    "metaField": "guild_id",
+                    "granularity": "minutes",
+                },
+                expireAfterSeconds=LOG_RETENTION,
+            )
+        except pymongo.errors.CollectionInvalid:
+            # Already exists; a plain collection still needs its TTL index
+            if "timeseries" not in await self.db.options():
+                await self.db.create_index(
+                    "timestamp", expireAfterSeconds=LOG_RETENTION
+                )
+        except pymongo.errors.OperationFailure:
+            # Time-series collections need MongoDB 5.0+, fall back to a TTL index
+            await self.db.create_index("timestamp", expireAfterSeconds=LOG_RETENTION)
+        await super().ensure_indexes()
+
+    async def get_last_timestamp(self, guild_id: int) -> int:
+        """
+        Timestamp of the newest log stored for a guild. Only the first call
+        per guild hits the database, later ones are tracked in memory.
+        """
+        if guild_id not in self._last_timestamps:
+            document = await self.db.find_one(
+                {"guild_id": guild_id},
+                {"timestamp": 1},
+                sort=[("timestamp", DESCENDING)],
+            )
+            self._last_timestamps[guild_id] = (
+                int(
+                    document["timestamp"]
+                    .replace(tzinfo=datetime.timezone.utc)
+                    .timestamp()
+                )
+                if document
+                else 0
+            )
+        return self._last_timestamps[guild_id]
+
+    async def insert_logs(self, guild_id: int, command_logs: list) -> int:
+        """
+        Inserts the command logs newer than the last stored one in a single
+        bulk insert. Returns the amount of entries inserted.
+        """
+        last_timestamp = await self.get_last_timestamp(guild_id)
+        new_logs = [
+            {
+                "guild_id": guild_id,
+                "timestamp": datetime.datetime.fromtimestamp(
+                    log.timestamp, tz=datetime.timezone.utc
+                ),
+                "username": log.username,
+                "user_id": log.user_id,
+                "is_automated": log.is_automated,
+                "command": log.command,
+            }
+            for log in command_logs
+            if log.timestamp > last_timestamp
+        ]
+        if not new_logs:
+            return 0
+
+        await self.db.insert_many(new_logs, ordered=False)
+        self._last_timestamps[guild_id] = max(
+            int(log.timestamp) for log in command_logs
+        )
+        return len(new_logs)
+
+    async def get_logs(self, guild_id: int, since: int = 0) -> list[SavedLog]:
+        """
+        Gets the stored command logs of a guild, oldest first.
+        """
+        return [
+            SavedLog(
+                guild_id=document["guild_id"],
+                timestamp=document["timestamp"],
+                username=document["username"],
+                user_id=document["user_id"],
+                is_automated=document["is_automated"],
+                command=document["command"],
+            )
+            async for document in self.db.find(
+                {
+                    "guild_id": guild_id,
+                    "timestamp": {
+                        "$gt": datetime.datetime.fromtimestamp(
+                            since, tz=datetime.timezone.utc
+                        )
+                    },
+                }
+            ).sort("timestamp", ASCENDING)
+        ]
@@ -1,25 +1,158 @@
+import asyncio
+
+import pymongo.errors
+from decouple import config
 from discord.ext import commands
 import discord
 from utils.mongo import Document
+from utils.basedataclass import Record
 
-
-class BaseDataClass:
-    def __init__(self, *args, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+# Seconds between full reloads of a key directory when change streams are not available
+KEY_DIRECTORY_RELOAD = int(config("KEY_DIRECTORY_RELOAD", default=300))
 
 
-class ServerKey(BaseDataClass):
+class ServerKey(Record):
     guild_id: int
     key: str
 
+    document_fields = {"guild_id": "_id", "key": "key"}
+
+
+class KeyDirectory(Document):
+    """
+    A collection of linked server keys, mirrored in memory as guild id -> ServerKey.
+    The mirror is loaded on startup and follows the collection's change stream
+    (or is reloaded every KEY_DIRECTORY_RELOAD seconds without one), so looking a
+    key up or checking whether a guild is linked never touches the database.
+    """
+
+    guild_field = "_id"
+    key_field = "key"
+
+    def __init__(self, connection, document_name):
+        super().__init__(connection, document_name)
+        self.keys: dict[int, ServerKey] = {}
+        # document _id -> guild id, to resolve deletes
+        self._guilds: dict = {}
+        self.loaded = False
+        self.change_stream_active = False
+        self._watch_task: asyncio.Task | None = None
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _add(self, document: dict):
+        guild_id = document.get(self.guild_field)
+        key = document.get(self.key_field)
+        self._remove(document["_id"])
+        if guild_id is None or not key:
+            return
+        self.keys[guild_id] = ServerKey(guild_id=guild_id, key=key)
+        self._guilds[document["_id"]] = guild_id
 
-class ServerKeys(Document):
-    async def get_server_key(self, guild_id: int):
-        doc = await self.find_by_id(guild_id)
-        if not doc:
+    def _remove(self, document_id):
+        guild_id = self._guilds.pop(document_id, None)
+        if guild_id is not None:
+            self.keys.pop(guild_id, None)
+
+    async def load(self):
+        """
+        Reads every key into memory, replacing what was there.
+        """
+        keys, guilds = {}, {}
+        async for document in self.db.find(
+            {}, {self.guild_field: 1, self.key_field: 1}
+        ):
+            guild_id = document.get(self.guild_field)
+            if guild_id is not None and document.get(self.key_field):
+                keys[guild_id] = ServerKey(guild_id=guild_id, key=document[self.key_field])
+                guilds[document["_id"]] = guild_id
+        self.keys, self._guilds = keys, guilds
+        self.loaded = True
+        self.logger.info(f"Loaded {len(keys)} server keys from {self.db.name}.")
+
+    async def get_server_key(self, guild_id: int) -> ServerKey | None:
+        if self.loaded:
+            return self.keys.get(guild_id)
+        document = await self.db.find_one({self.guild_field: guild_id})
+        if not document:
             return None
-        return ServerKey(guild_id=doc["_id"], key=doc["key"])
+        return ServerKey(guild_id=guild_id, key=document[self.key_field])
+
+    # <-- Change stream -->
+    def start_watching(self):
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self.watch())
+        return self._watch_task
+
+    def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
 
+    async def watch(self):
+        """
+        Applies links and unlinks from any process to the in-memory directory.
+        If the deployment does not support change streams, the directory is
+        reloaded every KEY_DIRECTORY_RELOAD seconds instead.
+        """
+        while True:
+            try:
+                async with self.db.watch(full_document="updateLookup") as stream:
+                    # Anything that changed before the stream opened is picked up by the reload
+                    await self.load()
+                    self.change_stream_active = True
+                    async for change in stream:
+                        operation = change["operationType"]
+                        if operation in ("insert", "update", "replace"):
+                            if change.get("fullDocument") is not None:
+                                self._add(change["fullDocument"])
+                            else:
+                                # Deleted again before the lookup
+                                self._remove(change["documentKey"]["_id"])
+                        elif operation == "delete":
+                            self._remove(change["documentKey"]["_id"])
+                        else:
+                            # drop, rename or invalidate events
+                            await self.load()
+            except asyncio.CancelledError:
+                self.change_stream_active = False
+                raise
+            except pymongo.errors.OperationFailure as e:
+                self.change_stream_active = False
+                # 40573: "The $changeStream stage is only supported on replica sets"
+                if e.code == 40573:
+                    self.logger.warning(
+                        f"Change streams are not available, reloading {self.db.name} keys every {KEY_DIRECTORY_RELOAD}s."
+                    )
+                    while True:
+                        await asyncio.sleep(KEY_DIRECTORY_RELOAD)
+                        try:
+                            await self.load()
+                        except pymongo.errors.PyMongoError as e:
+                            self.logger.error(f"Failed to reload {self.db.name} keys: {e}")
+                self.logger.error(f"Server key change stream failed: {e}")
+                await asyncio.sleep(30)
+            except pymongo.errors.PyMongoError as e:
+                self.change_stream_active = False
+                self.logger.error(f"Server key change stream disconnected: {e}")
+                await asyncio.sleep(5)
+
+
+class ServerKeys(KeyDirectory):
     async def insert_server_key(self, guild_id: int, key: str):
         await self.upsert({"_id": guild_id, "key": key})
+
+    # <-- Writes update the local directory immediately; other processes rely on the change stream -->
+    async def upsert(self, dict, return_document: bool = False):
+        result = await super().upsert(dict, return_document)
+        if dict.get("key"):
+            self._add(dict)
+        return result
+
+    async def delete_by_id(self, id):
+        await super().delete_by_id(id)
+        self._remove(id)
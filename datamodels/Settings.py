@@ -1,6 +1,56 @@
+import asyncio
+import copy
+
+import pymongo.errors
+from decouple import config
 from discord.ext import commands
 import discord
 from utils.mongo import Document
+from utils.cache import TTLCache, MISSING
+from utils.permissions import StaffRoles
+
+# Named projections for hot paths that only need a small slice of the settings.
+PREFIX_PROJECTION = {"customisation.prefix": 1}
+STAFF_ROLES_PROJECTION = {
+    "staff_management.role": 1,
+    "staff_management.admin_role": 1,
+    "staff_management.management_role": 1,
+}
+VEHICLE_RESTRICTIONS_PROJECTION = {"ERLC.vehicle_restrictions": 1}
+STATISTICS_PROJECTION = {"ERLC.statistics": 1}
+DISCORD_CHECKS_PROJECTION = {"ERLC.discord_checks": 1}
+MC_DISCORD_CHECKS_PROJECTION = {"MC.discord_checks": 1}
+ID_PROJECTION = {"_id": 1}
+
+
+def _projection_key(projection: dict | None):
+    return None if projection is None else tuple(sorted(projection.items()))
+
+
+def apply_projection(document: dict | None, projection: dict) -> dict | None:
+    """
+    Applies an inclusion projection (dotted paths set to 1) to an
+    in-memory document, the same way the server would for embedded documents.
+    """
+    if document is None:
+        return None
+    result = {}
+    if projection.get("_id", 1) and "_id" in document:
+        result["_id"] = document["_id"]
+    for path, include in projection.items():
+        if path == "_id" or not include:
+            continue
+        source, target = document, result
+        *parents, field = path.split(".")
+        for part in parents:
+            source = source.get(part) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if field in source:
+                target[field] = source[field]
+    return result
 
 
 class PunishmentType:
@@ -15,10 +65,176 @@ class PunishmentType:
 
 
 class Settings(Document):
+    """
+    Read-through cache over the settings collection. Documents are kept
+    decoded in memory and invalidated by a change stream on the collection,
+    falling back to a short TTL when change streams are not available
+    (e.g. a standalone mongod).
+    """
+
+    def __init__(self, connection, document_name):
+        super().__init__(connection, document_name)
+        # With a change stream the TTL is only a safety net against missed events.
+        self.stream_ttl = int(config("SETTINGS_CACHE_TTL", default=3600))
+        self.fallback_ttl = int(config("SETTINGS_CACHE_FALLBACK_TTL", default=30))
+        self.cache = TTLCache(
+            ttl=self.fallback_ttl,
+            max_size=int(config("SETTINGS_CACHE_SIZE", default=50000)),
+        )
+        self.change_stream_active = False
+        self._invalidation_epoch = 0
+        # guild id -> cache keys (one per projection) held for it
+        self._cached_keys: dict = {}
+        self._watch_task: asyncio.Task | None = None
+
+    async def find_by_id(self, id, projection: dict | None = None):
+        """
+        Returns the settings for `id`, served from the cache when possible.
+        A copy is returned, so callers are free to mutate it before writing back.
+        Projected lookups are answered from a cached full document if there is one,
+        otherwise only the projected fields are fetched and cached.
+        """
+        if projection is not None and (id, None) in self.cache:
+            return copy.deepcopy(
+                apply_projection(self.cache.get((id, None)), projection)
+            )
+
+        key = (id, _projection_key(projection))
+        document = self.cache.get(key)
+        if document is MISSING:
+            epoch = self._invalidation_epoch
+            document = await self.db.find_one({"_id": id}, projection)
+            # Don't store a document that was invalidated while we were fetching it.
+            if epoch == self._invalidation_epoch:
+                self.cache.set(
+                    key,
+                    document,
+                    ttl=self.stream_ttl
+                    if self.change_stream_active
+                    else self.fallback_ttl,
+                )
+                self._cached_keys.setdefault(id, set()).add(key)
+        return copy.deepcopy(document)
+
+    async def get_staff_roles(self, id) -> StaffRoles:
+        """
+        The guild's staff, admin and management roles compiled for permission checks,
+        cached and invalidated together with its settings.
+        """
+        key = (id, "staff_roles")
+        roles = self.cache.get(key)
+        if roles is MISSING:
+            epoch = self._invalidation_epoch
+            roles = StaffRoles.compile(await self.find_by_id(id, STAFF_ROLES_PROJECTION))
+            if epoch == self._invalidation_epoch:
+                self.cache.set(
+                    key,
+                    roles,
+                    ttl=self.stream_ttl
+                    if self.change_stream_active
+                    else self.fallback_ttl,
+                )
+                self._cached_keys.setdefault(id, set()).add(key)
+        return roles
+
     async def get_settings(self, guild_id: int) -> dict:
         """
         Gets the settings for a guild.
         """
-        return await self.db.find_one({"_id": guild_id})
+        return await self.find_by_id(guild_id)
+
+    def invalidate(self, id):
+        self._invalidation_epoch += 1
+        for key in self._cached_keys.pop(id, ()):
+            self.cache.invalidate(key)
+
+    def invalidate_all(self):
+        self._invalidation_epoch += 1
+        self._cached_keys.clear()
+        self.cache.clear()
+
+    def cache_stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "change_stream_active": self.change_stream_active,
+        }
+
+    # <-- Writes invalidate the local entry immediately; other processes rely on the change stream -->
+    async def insert(self, dict):
+        await super().insert(dict)
+        self.invalidate(dict["_id"])
+
+    async def upsert(self, dict, return_document: bool = False):
+        result = await super().upsert(dict, return_document)
+        self.invalidate(dict["_id"])
+        return result
+
+    async def update_by_id(self, dict, return_document: bool = False):
+        result = await super().update_by_id(dict, return_document)
+        self.invalidate(dict["_id"])
+        return result
 
-    pass
+    async def unset(self, dict, return_document: bool = False):
+        result = await super().unset(dict, return_document)
+        self.invalidate(dict["_id"])
+        return result
+
+    async def increment(self, id, amount, field, return_document: bool = False):
+        result = await super().increment(id, amount, field, return_document)
+        self.invalidate(id)
+        return result
+
+    async def delete_by_id(self, id):
+        await super().delete_by_id(id)
+        self.invalidate(id)
+
+    # <-- Change stream -->
+    def start_watching(self):
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self.watch())
+        return self._watch_task
+
+    def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def watch(self):
+        """
+        Follows the change stream of the settings collection and drops
+        cache entries as they change. If the deployment does not support
+        change streams, the cache stays on the fallback TTL.
+        """
+        while True:
+            try:
+                async with self.db.watch() as stream:
+                    # Anything cached before the stream opened could already be stale.
+                    self.invalidate_all()
+                    self.change_stream_active = True
+                    self.logger.info("Settings cache is following the change stream.")
+                    async for change in stream:
+                        if "documentKey" in change:
+                            self.invalidate(change["documentKey"]["_id"])
+                        else:
+                            # drop, rename or invalidate events
+                            self.invalidate_all()
+            except asyncio.CancelledError:
+                self.change_stream_active = False
+                raise
+            except pymongo.errors.OperationFailure as e:
+                self.change_stream_active = False
+                self.invalidate_all()
+                # 40573: "The $changeStream stage is only supported on replica sets"
+                if e.code == 40573:
+                    self.logger.warning(
+                        "Change streams are not available, settings cache is using a %ss TTL.",
+                        self.fallback_ttl,
+                    )
+                    return
+                self.logger.error(f"Settings change stream failed: {e}")
+                await asyncio.sleep(30)
+            except pymongo.errors.PyMongoError as e:
+                self.change_stream_active = False
+                self.invalidate_all()
+                self.logger.error(f"Settings change stream disconnected: {e}")
+                await asyncio.sleep(5)
@@ -1,24 +1,25 @@
 import datetime
-import asyncio
 import logging
 from typing import Optional
 
-import aiohttp
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, ReturnDocument
 from discord.ext import commands
 import discord
 from utils.mongo import Document
-from decouple import config
+from datamodels.SyncOutbox import SyncOutbox
 
-from utils.basedataclass import BaseDataClass
+from utils.basedataclass import Record, field
 
 
-class BreakItem(BaseDataClass):
+class BreakItem(Record):
     start_epoch: int
     end_epoch: int
 
+    document_fields = {"start_epoch": "StartEpoch", "end_epoch": "EndEpoch"}
 
-class ShiftItem:
+
+class ShiftItem(Record):
     id: str
     username: str
     nickname: str
@@ -32,37 +33,47 @@ class ShiftItem:
     added_time: int
     removed_time: int
 
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+    document_fields = {
+        "id": "_id",
+        "username": "Username",
+        "nickname": "Nickname",
+        "user_id": "UserID",
+        "type": "Type",
+        "start_epoch": "StartEpoch",
+        "breaks": field(
+            "Breaks", lambda breaks: [BreakItem.from_document(i) for i in breaks]
+        ),
+        "guild": "Guild",
+        "moderations": "Moderations",
+        "end_epoch": "EndEpoch",
+        "added_time": "AddedTime",
+        "removed_time": "RemovedTime",
+    }
+
+
+class Shifts(Document):
+    indexes = [
+        IndexModel([("Guild", ASCENDING), ("EndEpoch", ASCENDING)]),
+        # StartEpoch is last so a user's shift history can be paginated in order
+        IndexModel([("Guild", ASCENDING), ("UserID", ASCENDING), ("StartEpoch", ASCENDING)]),
+    ]
+    query_shapes = [
+        {"Guild": 0, "EndEpoch": 0},
+        {"Guild": 0, "UserID": 0, "EndEpoch": 0},
+    ]
 
 
 class ShiftManagement:
-    def __init__(self, connection, current_shifts):
-        self.shifts = Document(connection, current_shifts)
+    def __init__(self, connection, current_shifts, outbox: SyncOutbox):
+        self.shifts = Shifts(connection, current_shifts)
+        self.outbox = outbox
         self.logger = logging.getLogger(__name__)
 
     async def fetch_shift(self, object_id: ObjectId) -> Optional[ShiftItem]:
         shift = await self.shifts.find_by_id(object_id)
         if not shift:
             return None
-        return ShiftItem(
-            id=shift["_id"],
-            username=shift["Username"],
-            nickname=shift["Nickname"],
-            user_id=shift["UserID"],
-            type=shift["Type"],
-            start_epoch=shift["StartEpoch"],
-            breaks=[
-                BreakItem(start_epoch=item["StartEpoch"], end_epoch=item["EndEpoch"])
-                for item in shift["Breaks"]
-            ],
-            guild=shift["Guild"],
-            moderations=shift["Moderations"],
-            end_epoch=shift["EndEpoch"],
-            added_time=shift["AddedTime"],
-            removed_time=shift["RemovedTime"],
-        )
+        return ShiftItem.from_document(shift)
 
     async def add_shift_by_user(
         self,
@@ -73,7 +84,7 @@ class ShiftManagement:
         timestamp: int = 0,
     ) -> ObjectId:
         """
-        Adds a shift for the specified user to the database and syncs with external APIs.
+        Adds a shift for the specified user to the database and queues its sync with external APIs.
 
         Args:
             member: Discord member starting the shift
@@ -84,9 +95,6 @@ class ShiftManagement:
 
         Returns:
             ObjectId of the created shift document
-
-        Raises:
-            aiohttp.ClientError: If API sync fails
         """
         data = {
             "_id": ObjectId(),
@@ -109,43 +117,24 @@ class ShiftManagement:
 
         await self.shifts.db.insert_one(data)
 
-        url_var = config("BASE_API_URL")
-        panel_url_var = config("PANEL_API_URL")
-
-        async def sync_with_apis():
-            async with aiohttp.ClientSession() as session:
-                tasks = []
-
-                if url_var not in ["", None]:
-                    tasks.append(
-                        session.get(
-                            f"{url_var}/Internal/SyncStartShift/{data['_id']}",
-                            headers={"Authorization": config("INTERNAL_API_AUTH")},
-                            raise_for_status=True,
-                        )
-                    )
-
-                if panel_url_var not in ["", None]:
-                    tasks.append(
-                        session.post(
-                            f"{panel_url_var}/{guild}/SyncStartShift?ID={data['_id']}",
-                            headers={"X-Static-Token": config("PANEL_STATIC_AUTH")},
-                            raise_for_status=True,
-                        )
-                    )
-
-                if tasks:
-                    responses = await asyncio.gather(*tasks, return_exceptions=True)
-                    for response in responses:
-                        if isinstance(response, Exception):
-                            self.logger.error(f"API sync failed: {str(response)}")
-
         try:
-            await sync_with_apis()
-        except aiohttp.ClientError as e:
-            self.logger.error(f"Failed to sync shift start with APIs: {str(e)}")
+            # Sent before the end of the shift, see events/on_shift_end.py
+            await self.outbox.append(
+                "internal",
+                "GET",
+                f"/Internal/SyncStartShift/{data['_id']}",
+                auth="internal",
+                order=f"shift:{data['_id']}:internal",
+            )
+            await self.outbox.append(
+                "panel",
+                "POST",
+                f"/{guild}/SyncStartShift?ID={data['_id']}",
+                auth="panel",
+                order=f"shift:{data['_id']}:panel",
+            )
         except Exception as e:
-            self.logger.error(f"Unexpected error during API sync: {str(e)}")
+            self.logger.error(f"Failed to queue shift start sync: {str(e)}")
 
         return data["_id"]
 
@@ -153,19 +142,21 @@ class ShiftManagement:
         """
         Adds time to the specified user's shift.
         """
-        document = await self.shifts.db.find_one({"_id": ObjectId(identifier)})
-        document["AddedTime"] += int(seconds)
-        await self.shifts.update_by_id(document)
-        return document
+        return await self.shifts.db.find_one_and_update(
+            {"_id": ObjectId(identifier)},
+            {"$inc": {"AddedTime": int(seconds)}},
+            return_document=ReturnDocument.AFTER,
+        )
 
     async def remove_time_from_shift(self, identifier: str, seconds: int):
         """
         Removes time from the specified user's shift.
         """
-        document = await self.shifts.db.find_one({"_id": ObjectId(identifier)})
-        document["RemovedTime"] += int(seconds)
-        await self.shifts.update_by_id(document)
-        return document
+        return await self.shifts.db.find_one_and_update(
+            {"_id": ObjectId(identifier)},
+            {"$inc": {"RemovedTime": int(seconds)}},
+            return_document=ReturnDocument.AFTER,
+        )
 
     async def end_shift(
         self, identifier: str, guild_id: int | None = None, timestamp: int | None = None
@@ -184,26 +175,47 @@ class ShiftManagement:
         Raises:
             ValueError: If shift not found or guild mismatch
         """
-        document = await self.shifts.db.find_one({"_id": ObjectId(identifier)})
-        if not document:
-            raise ValueError("Shift not found.")
-
-        guild_id = guild_id if guild_id else document["Guild"]
-
-        if document["Guild"] != guild_id:
-            raise ValueError("Shift not found.")
-
         current_time = (
             datetime.datetime.now().timestamp() if timestamp in [None, 0] else timestamp
         )
-        document["EndEpoch"] = current_time
 
-        # Close any open breaks
-        for breaks in document["Breaks"]:
-            if breaks["EndEpoch"] == 0:
-                breaks["EndEpoch"] = int(current_time)
+        query = {"_id": ObjectId(identifier)}
+        if guild_id:
+            query["Guild"] = guild_id
+
+        # Ends the shift and closes any open breaks in one atomic round trip.
+        document = await self.shifts.db.find_one_and_update(
+            query,
+            [
+                {
+                    "$set": {
+                        "EndEpoch": current_time,
+                        "Breaks": {
+                            "$map": {
+                                "input": "$Breaks",
+                                "as": "break",
+                                "in": {
+                                    "$cond": [
+                                        {"$eq": ["$$break.EndEpoch", 0]},
+                                        {
+                                            "$mergeObjects": [
+                                                "$$break",
+                                                {"EndEpoch": int(current_time)},
+                                            ]
+                                        },
+                                        "$$break",
+                                    ]
+                                },
+                            }
+                        },
+                    }
+                }
+            ],
+            return_document=ReturnDocument.AFTER,
+        )
+        if not document:
+            raise ValueError("Shift not found.")
 
-        await self.shifts.update_by_id(document)
         return document
 
     async def get_current_shift(self, member: discord.Member, guild_id: int):
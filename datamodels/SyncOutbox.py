@@ -0,0 +1,205 @@
+import asyncio
+import datetime
+import typing
+import uuid
+
+from decouple import config
+from pymongo import ASCENDING, IndexModel
+
+from utils.mongo import Document
+
+# Attempts before a sync call is given up on and kept as dead for inspection
+OUTBOX_MAX_ATTEMPTS = int(config("OUTBOX_MAX_ATTEMPTS", default=8))
+# Seconds dead calls are kept before Mongo expires them
+OUTBOX_DEAD_TTL = int(config("OUTBOX_DEAD_TTL", default=604800))
+# Seconds a claimed call is reserved for the process that claimed it
+OUTBOX_LEASE = int(config("OUTBOX_LEASE", default=60))
+
+
+class SyncOutbox(Document):
+    """
+    Sync calls to the internal API and the panel, waiting to be sent by the
+    dispatcher in utils.sync_dispatcher. Commands and events append to it instead
+    of calling the APIs inline, so a slow or failing API never holds them up and
+    no call is lost to a restart.
+
+    Every call has a `key`; appending a call whose key is already waiting
+    replaces the waiting one instead of adding another, e.g. two permission
+    changes for the same member only send the latest.
+
+    Calls may also share an ordering `order` key, e.g. the start and end of one
+    shift. Those are sent one at a time, oldest first: a call waits until the ones
+    appended before it were sent or gave up.
+    """
+
+    indexes = [
+        # Dead calls are kept for inspection, a new call may reuse their key
+        IndexModel(
+            [("key", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"dead": False},
+        ),
+        IndexModel([("dead", ASCENDING), ("due_at", ASCENDING)]),
+        IndexModel([("order", ASCENDING), ("created_at", ASCENDING)], sparse=True),
+        IndexModel(
+            [("due_at", ASCENDING)],
+            expireAfterSeconds=OUTBOX_DEAD_TTL,
+            partialFilterExpression={"dead": True},
+        ),
+    ]
+    query_shapes = [{"dead": False, "due_at": 0}]
+
+    def __init__(self, connection, document_name):
+        super().__init__(connection, document_name)
+        # Set when a call is appended, wakes the dispatcher of this process
+        self.appended = asyncio.Event()
+        self.claimant = uuid.uuid4().hex
+
+    async def append(
+        self,
+        target: typing.Literal["internal", "panel"],
+        method: typing.Literal["GET", "POST", "DELETE"],
+        path: str,
+        auth: typing.Literal["internal", "panel"] | None = None,
+        key: str | None = None,
+        order: str | None = None,
+    ):
+        """
+        Queues a sync call. Nothing is queued if the target API isn't configured.
+        Params:
+         - target (str) : "internal" (BASE_API_URL) or "panel" (PANEL_API_URL)
+         - method (str) : HTTP method of the call
+         - path (str) : appended to the target's base URL
+         - auth (str) : which credentials to send, resolved when the call is sent
+         - key (str) : dedupe key, defaults to the call itself
+         - order (str) : calls with the same ordering key are sent in the order they were appended
+        """
+        base_url = config("BASE_API_URL" if target == "internal" else "PANEL_API_URL", default="")
+        if base_url in ["", None]:
+            return
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        await self.db.update_one(
+            {"key": key or f"{method} {target}{path}", "dead": False},
+            {
+                "$set": {
+                    "target": target,
+                    "method": method,
+                    "path": path,
+                    "auth": auth,
+                    "due_at": now,
+                    "attempts": 0,
+                    **({"order": order} if order else {}),
+                },
+                "$inc": {"version": 1},
+                "$setOnInsert": {"created_at": now, "dead": False},
+            },
+            upsert=True,
+        )
+        self.appended.set()
+
+    async def cancel(self, key: str) -> bool:
+        """
+        Drops the call waiting under `key` if it was never attempted. Returns whether
+        one was dropped; a call that is in flight or was tried already is kept.
+        """
+        result = await self.db.delete_one(
+            {"key": key, "dead": False, "attempts": 0, "claimant": {"$exists": False}}
+        )
+        return result.deleted_count > 0
+
+    async def sync_permission_level(self, guild_id: int, user_id: int, level: int):
+        """
+        Queues the update of a member's cached permission level (0 none, 1 staff,
+        2 management). Only the latest level of a member is sent.
+        """
+        if config("BASE_API_URL", default="") in ["", None] or config(
+            "PANEL_API_URL", default=""
+        ) in ["", None]:
+            return
+        await self.append(
+            "internal",
+            "GET",
+            f"/Auth/UpdatePermissionCache/{user_id}/{guild_id}/{level}",
+            auth="internal",
+            key=f"permissions:{guild_id}:{user_id}:internal",
+        )
+        await self.append(
+            "panel",
+            "POST",
+            f"/Internal/UpdatePermissionsCache/{guild_id}/{user_id}/{level}",
+            key=f"permissions:{guild_id}:{user_id}:panel",
+        )
+
+    async def claim(self, limit: int) -> list[dict]:
+        """
+        Reserves up to `limit` due calls for this process and returns them.
+        """
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        lease = now + datetime.timedelta(seconds=OUTBOX_LEASE)
+        due = await self.db.find(
+            {"dead": False, "due_at": {"$lte": now}}, {"_id": 1, "order": 1}
+        ).sort("due_at", ASCENDING).limit(limit).to_list(length=limit)
+        orders = list({item["order"] for item in due if item.get("order")})
+        if orders:
+            # Only the oldest waiting call of an ordering key may be sent
+            heads = {}
+            for item in await self.db.find(
+                {"dead": False, "order": {"$in": orders}}, {"_id": 1, "order": 1}
+            ).sort([("created_at", ASCENDING), ("_id", ASCENDING)]).to_list(length=None):
+                heads.setdefault(item["order"], item["_id"])
+            due = [
+                item for item in due
+                if not item.get("order") or heads.get(item["order"]) == item["_id"]
+            ]
+        if not due:
+            return []
+        # Another process may claim some of the same calls, only ours are returned
+        await self.db.update_many(
+            {"_id": {"$in": [item["_id"] for item in due]}, "due_at": {"$lte": now}},
+            {"$set": {"due_at": lease, "claimant": self.claimant}},
+        )
+        return await self.db.find(
+            {"claimant": self.claimant, "due_at": lease}
+        ).to_list(length=limit)
+
+    async def complete(self, results: list[tuple[dict, str | None, bool]], backoff: typing.Callable[[int], float]):
+        """
+        Records the outcome of sent calls in one bulk write.
+        Params:
+         - results (list) : (call, error or None, retryable)
+         - backoff (callable) : attempts -> seconds until the next attempt
+        """
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        async with self.bulk(ordered=False) as bulk:
+            for call, error, retryable in results:
+                # A newer version appended while this one was in flight is left to be sent
+                current = {"_id": call["_id"], "version": call["version"]}
+                if error is None:
+                    await bulk.delete_one(current)
+                    if call.get("order"):
+                        # The next call of its ordering key is due now
+                        self.appended.set()
+                    continue
+                attempts = call["attempts"] + 1
+                dead = not retryable or attempts >= OUTBOX_MAX_ATTEMPTS
+                await bulk.update_one(
+                    current,
+                    {
+                        "$set": {
+                            "attempts": attempts,
+                            "last_error": error,
+                            "dead": dead,
+                            # A dead call expires OUTBOX_DEAD_TTL after it died
+                            "due_at": now if dead else now + datetime.timedelta(seconds=backoff(attempts)),
+                        },
+                        "$unset": {"claimant": ""},
+                    },
+                )
+
+    async def stats(self) -> dict:
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        return {
+            "waiting": await self.db.count_documents({"dead": False}),
+            "due": await self.db.count_documents({"dead": False, "due_at": {"$lte": now}}),
+            "dead": await self.db.count_documents({"dead": True}),
+        }
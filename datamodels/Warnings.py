@@ -1,18 +1,18 @@
 import typing
 from copy import copy
 
-import aiohttp
 import pymongo.operations
 from bson import ObjectId
-from decouple import config
+from pymongo import ASCENDING, IndexModel
 from discord.ext import commands
 import discord
 
 from utils.utils import generator
 from utils.mongo import Document
+from utils.basedataclass import Record, field
 
 
-class WarningItem:
+class WarningItem(Record):
     id: str
     username: str
     user_id: int
@@ -25,9 +25,20 @@ class WarningItem:
     until_epoch: typing.Optional[int]
     snowflake: int
 
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+    document_fields = {
+        "id": "_id",
+        "snowflake": "Snowflake",
+        "username": "Username",
+        "user_id": "UserID",
+        "warning_type": "Type",
+        "reason": "Reason",
+        "moderator_name": "Moderator",
+        "moderator_id": "ModeratorID",
+        "guild_id": "Guild",
+        "time_epoch": "Epoch",
+        # 0 is stored for warnings that don't expire
+        "until_epoch": field("UntilEpoch", lambda epoch: epoch or None),
+    }
 
     def __getitem__(self, item):
         legacy_correspondents = {
@@ -50,29 +61,51 @@ class Warnings(Document):
     Also known as the punishment module, this is used for intermediary methods for the Warnings database <-> ERM.
     """
 
+    indexes = [
+        # Epoch is last so paginated views can seek through a user's warnings in order
+        IndexModel([("Guild", ASCENDING), ("UserID", ASCENDING), ("Epoch", ASCENDING)]),
+        IndexModel([("Guild", ASCENDING), ("ModeratorID", ASCENDING)]),
+        IndexModel([("Snowflake", ASCENDING)]),
+    ]
+    query_shapes = [
+        {"Guild": 0, "UserID": 0},
+        {"Guild": 0, "ModeratorID": 0},
+        {"Snowflake": 0},
+    ]
+
     def __init__(self, bot):
         self.bot = bot
         super().__init__(bot.db, "punishments")
         self.recovery = Document(bot.db, "recovery")
 
+    async def sync_punishment(
+        self, action: str, identifier: ObjectId, guild_id: int, panel_id
+    ):
+        """
+        Queues the sync of a created or deleted punishment with the internal API and the panel.
+        A deletion of a punishment whose creation was never sent drops both.
+        """
+        calls = [
+            ("internal", f"/Internal/Sync{action}Punishment/{identifier}"),
+            ("panel", f"/{guild_id}/Sync{action}Punishment?ID={panel_id}"),
+        ]
+        try:
+            for target, path in calls:
+                key = f"punishment:{identifier}:{target}"
+                if action == "Delete" and await self.bot.outbox.cancel(key):
+                    continue
+                await self.bot.outbox.append(
+                    target, "GET", path, auth="internal", key=key
+                )
+        except Exception as e:
+            self.logger.error(f"Failed to queue punishment sync: {str(e)}")
+
     async def get_warnings(self, user: int, guild: int) -> list[WarningItem]:
         """
         Gets the warnings for a user in a guild.
         """
         return [
-            WarningItem(
-                id=i["_id"],
-                snowflake=i["Snowflake"],
-                username=i["Username"],
-                user_id=i["UserID"],
-                warning_type=i["Type"],
-                reason=i["Reason"],
-                moderator_name=i["Moderator"],
-                moderator_id=i["ModeratorID"],
-                guild_id=i["Guild"],
-                time_epoch=i["Epoch"],
-                until_epoch=None if i.get("UntilEpoch") == 0 else i["UntilEpoch"],
-            )
+            WarningItem.from_document(i)
             async for i in self.db.find({"Guild": guild, "UserID": user})
         ]
 
@@ -83,19 +116,28 @@ class Warnings(Document):
         i = await self.db.find_one({"_id": ObjectId(warning_id)})
         if i is None:
             return None
-        return WarningItem(
-            id=i["_id"],
-            snowflake=i["Snowflake"],
-            username=i["Username"],
-            user_id=i["UserID"],
-            warning_type=i["Type"],
-            reason=i["Reason"],
-            moderator_name=i["Moderator"],
-            moderator_id=i["ModeratorID"],
-            guild_id=i["Guild"],
-            time_epoch=i["Epoch"],
-            until_epoch=None if i.get("UntilEpoch") == 0 else i["UntilEpoch"],
-        )
+        return WarningItem.from_document(i)
+
+    async def count_warnings_by_type(
+        self,
+        guild_id: int,
+        user_id: int | None = None,
+        moderator_id: int | None = None,
+    ) -> dict[str, int]:
+        """
+        Counts the warnings of a user, or handed out by a moderator, per punishment type.
+        """
+        query = {"Guild": guild_id}
+        if user_id is not None:
+            query["UserID"] = user_id
+        if moderator_id is not None:
+            query["ModeratorID"] = moderator_id
+        return {
+            i["_id"]: i["count"]
+            async for i in self.db.aggregate(
+                [{"$match": query}, {"$group": {"_id": "$Type", "count": {"$sum": 1}}}]
+            )
+        }
 
     async def get_warning(self, warning_id: str) -> dict:
         """
@@ -194,25 +236,7 @@ class Warnings(Document):
             }
         )
 
-        try:
-            url_var = config("BASE_API_URL")
-            panel_url_var = config("PANEL_API_URL")
-            if url_var not in ["", None]:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                        f"{url_var}/Internal/SyncCreatePunishment/{identifier}",
-                        headers={"Authorization": config("INTERNAL_API_AUTH")},
-                    ):
-                        pass
-            if panel_url_var not in ["", None]:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                        f"{panel_url_var}/{guild_id}/SyncCreatePunishment?ID={identifier}",
-                        headers={"Authorization": config("INTERNAL_API_AUTH")},
-                    ):
-                        pass
-        except:
-            pass
+        await self.sync_punishment("Create", identifier, guild_id, identifier)
 
         return identifier
 
@@ -406,25 +430,9 @@ class Warnings(Document):
 
         selected_item = await self.db.find_one({"Snowflake": identifier})
         if selected_item["Guild"] == (guild_id or selected_item["Guild"]):
-            try:
-                url_var = config("BASE_API_URL")
-                panel_url_var = config("PANEL_API_URL")
-                if url_var not in ["", None]:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(
-                            f"{url_var}/Internal/SyncDeletePunishment/{selected_item['_id']}",
-                            headers={"Authorization": config("INTERNAL_API_AUTH")},
-                        ):
-                            pass
-                if panel_url_var not in ["", None]:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(
-                            f"{panel_url_var}/{guild_id}/SyncDeletePunishment?ID={identifier}",
-                            headers={"Authorization": config("INTERNAL_API_AUTH")},
-                        ):
-                            pass
-            except ValueError:
-                pass
+            await self.sync_punishment(
+                "Delete", selected_item["_id"], selected_item["Guild"], identifier
+            )
             return await self.db.delete_one({"Snowflake": identifier})
         else:
             return ValueError("Warning does not exist.")
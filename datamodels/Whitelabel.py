@@ -1,7 +1,9 @@
 from discord.ext import commands
 import discord
+from pymongo import ASCENDING, IndexModel
 from utils.mongo import Document
 
 
 class Whitelabel(Document):
-    pass
+    indexes = [IndexModel([("GuildID", ASCENDING)])]
+    query_shapes = [{"GuildID": "0"}]
@@ -16,7 +16,6 @@ from tasks.check_reminders import check_reminders
 from tasks.check_infractions import check_infractions
 from tasks.iterate_prc_logs import iterate_prc_logs
 from tasks.tempban_checks import tempban_checks
-from tasks.process_scheduled_pms import process_scheduled_pms
 from tasks.statistics_check import statistics_check
 from tasks.change_status import change_status
 from tasks.check_whitelisted_car import check_whitelisted_car
@@ -28,8 +27,14 @@ from utils.accounts import Accounts
 from utils.emojis import EmojiController
 
 from utils.log_tracker import LogTracker
+from utils.member_index import MemberIndex
+from utils.permissions import Permission, resolve_permissions
+from utils.roblox_identity import RobloxIdentity
+from utils.sync_dispatcher import SyncDispatcher
+from utils.circuit_breaker import CircuitBreakers, user_request
 from utils.mc_api import MCApiClient
-from utils.mongo import Document
+from utils.mongo import Document, ensure_registered_indexes, log_index_task
+from utils.mongo_metrics import query_metrics
 
 import aiohttp
 import decouple
@@ -48,6 +53,7 @@ from sentry_sdk.integrations.pymongo import PyMongoIntegration
 from datamodels.CustomFlags import CustomFlags
 from datamodels.ServerKeys import ServerKeys
 from datamodels.ShiftManagement import ShiftManagement
+from datamodels.SyncOutbox import SyncOutbox
 from datamodels.ActivityNotice import ActivityNotices
 from datamodels.Analytics import Analytics
 from datamodels.Consent import Consent
@@ -68,10 +74,12 @@ from datamodels.PendingOAuth2 import PendingOAuth2
 from datamodels.OAuth2Users import OAuth2Users
 from datamodels.IntegrationCommandStorage import IntegrationCommandStorage
 from datamodels.SavedLogs import SavedLogs
+from datamodels.LogCursors import LogCursors
 from menus import CompleteReminder, LOAMenu, RDMActions
 from utils.viewstatemanger import ViewStateManager
 from utils.bloxlink import Bloxlink
 from utils.prc_api import PRCApiClient
+from utils.server_snapshot import SnapshotEngine
 from utils.prc_api import ResponseFailure
 from utils.utils import *
 from utils.constants import *
@@ -132,6 +140,16 @@ class Bot(commands.AutoShardedBot):
         self._cache_timeout = 300
 
     async def close(self):
+        if hasattr(self, "settings"):
+            self.settings.stop_watching()
+        if hasattr(self, "mc_keys"):
+            self.server_keys.stop_watching()
+            self.mc_keys.stop_watching()
+        if hasattr(self, "log_tracker"):
+            await self.log_tracker.flush()
+        if hasattr(self, "sync_dispatcher"):
+            # Calls still queued are sent by the next start
+            await self.sync_dispatcher.stop()
         for session in self.external_http_sessions:
             if session is not None and session.closed is False:
                 await session.close()
@@ -162,7 +180,9 @@ class Bot(commands.AutoShardedBot):
                     self.user.name
                 )
             )
-            self.mongo = motor.motor_asyncio.AsyncIOMotorClient(str(mongo_url))
+            self.mongo = motor.motor_asyncio.AsyncIOMotorClient(
+                str(mongo_url), event_listeners=[query_metrics]
+            )
             if environment == "DEVELOPMENT":
                 self.db = self.mongo["erm"]
             elif environment == "PRODUCTION":
@@ -182,14 +202,19 @@ class Bot(commands.AutoShardedBot):
 
             self.start_time = time.time()
 
+            self.log_cursors = LogCursors(self.db, "log_cursors")
             self.log_tracker = LogTracker(self)
-            self.scheduled_pm_queue = asyncio.Queue()
             self.pm_counter = {}
             self.team_restrictions_infractions = (
                 {}
             )  # Guild ID => [ { Username: Count } ]
 
-            self.shift_management = ShiftManagement(self.db, "shift_management")
+            self.outbox = SyncOutbox(self.db, "sync_outbox")
+            self.sync_dispatcher = SyncDispatcher(self)
+            self.sync_dispatcher.start()
+            self.shift_management = ShiftManagement(
+                self.db, "shift_management", self.outbox
+            )
             self.errors = Errors(self.db, "errors")
             self.loas = ActivityNotices(self.db, "leave_of_absences")
             self.reminders = Reminders(self.db, "reminders")
@@ -204,22 +229,37 @@ class Bot(commands.AutoShardedBot):
             self.consent = Consent(self.db, "consent")
             self.punishments = Warnings(self)
             self.settings = Settings(self.db, "settings")
+            self.settings.start_watching()
             self.server_keys = ServerKeys(self.db, "server_keys")
 
             self.maple_county = self.mongo["MapleCounty"]
             self.mc_keys = MapleKeys(self.maple_county, "Auth")
+            # Every PRC / MC request looks its key up in these, keep them in memory
+            await asyncio.gather(self.server_keys.load(), self.mc_keys.load())
+            self.server_keys.start_watching()
+            self.mc_keys.start_watching()
 
             self.staff_connections = StaffConnections(self.db, "staff_connections")
             self.ics = IntegrationCommandStorage(self.db, "logged_command_data")
             self.actions = Actions(self.db, "actions")
             self.prohibited = ProhibitedUseKeys(self.db, "prohibited_keys")
-            self.saved_logs = SavedLogs(self.db, "saved_logs")
+            # Breakers get their own collection, prohibited_keys holds the older key bans
+            self.breakers = CircuitBreakers(
+                ProhibitedUseKeys(self.db, "server_key_breakers")
+            )
+            await self.breakers.load()
+            self.saved_logs = SavedLogs(self.db, "command_logs")
             self.whitelabel = Whitelabel(self.mongo["ERMProcessing"], "Instances")
 
             self.pending_oauth2 = PendingOAuth2(self.db, "pending_oauth2")
             self.oauth2_users = OAuth2Users(self.db, "oauth2")
 
             self.accounts = Accounts(self)
+            self.member_index = MemberIndex(self)
+
+            # Idempotent, so it can run in the background on every start.
+            self.index_task = asyncio.create_task(ensure_registered_indexes())
+            self.index_task.add_done_callback(log_index_task)
 
             if environment == "CUSTOM":
                 doc = await self.whitelabel.db.find_one({"GuildID": config("CUSTOM_GUILD_ID", default="0")})
@@ -229,6 +269,7 @@ class Bot(commands.AutoShardedBot):
                     )
 
             self.roblox = roblox.Client()
+            self.identity = RobloxIdentity(self)
             self.prc_api = PRCApiClient(
                 self,
                 base_url=config(
@@ -239,6 +280,7 @@ class Bot(commands.AutoShardedBot):
             self.mc_api = MCApiClient(
                 self, base_url=config("MC_API_URL"), api_key=config("MC_API_KEY")
             )
+            self.snapshots = SnapshotEngine(self)
             self.bloxlink = Bloxlink(self, config("BLOXLINK_API_KEY"))
 
             Extensions = [m.name for m in iter_modules(["cogs"], prefix="cogs.")]
@@ -336,9 +378,6 @@ class Bot(commands.AutoShardedBot):
             change_status.start(bot)
         logging.info("Starting the Change Status task...")
         await asyncio.sleep(30)
-        process_scheduled_pms.start(bot)
-        logging.info("Starting the Process Scheduled PMs task...")
-        await asyncio.sleep(30)
         sync_weather.start(bot)
         logging.info("Starting the Sync Weather task...")
         await asyncio.sleep(30)
@@ -421,6 +460,8 @@ async def AutoDefer(ctx: commands.Context):
         raise Exception("Whitelabel bot already in use")
 
     internal_command_storage[ctx] = datetime.datetime.now(tz=pytz.UTC).timestamp()
+    # Server keys with an open breaker are still tried for commands
+    user_request.set(True)
     if ctx.command:
         if ctx.command.extras.get("ephemeral") is True:
             if ctx.interaction:
@@ -490,83 +531,15 @@ client = roblox.Client()
 
 
 async def staff_check(bot_obj, guild, member):
-    guild_settings = await bot_obj.settings.find_by_id(guild.id)
-    if guild_settings:
-        if "role" in guild_settings["staff_management"].keys():
-            if guild_settings["staff_management"]["role"] != "":
-                if isinstance(guild_settings["staff_management"]["role"], list):
-                    for role in guild_settings["staff_management"]["role"]:
-                        if role in [role.id for role in member.roles]:
-                            return True
-                elif isinstance(guild_settings["staff_management"]["role"], int):
-                    if guild_settings["staff_management"]["role"] in [
-                        role.id for role in member.roles
-                    ]:
-                        return True
-                    
-    if await admin_check(bot_obj, guild, member):
-        return True
-    
-    if member.guild_permissions.manage_messages:
-        return True
-    return False
+    return Permission.STAFF in await resolve_permissions(bot_obj, guild, member)
 
 
 async def management_check(bot_obj, guild, member):
-    guild_settings = await bot_obj.settings.find_by_id(guild.id)
-    if guild_settings:
-        if "management_role" in guild_settings["staff_management"].keys():
-            if guild_settings["staff_management"]["management_role"] != "":
-                if isinstance(
-                    guild_settings["staff_management"]["management_role"], list
-                ):
-                    for role in guild_settings["staff_management"]["management_role"]:
-                        if role in [role.id for role in member.roles]:
-                            return True
-                elif isinstance(
-                    guild_settings["staff_management"]["management_role"], int
-                ):
-                    if guild_settings["staff_management"]["management_role"] in [
-                        role.id for role in member.roles
-                    ]:
-                        return True
-    if member.guild_permissions.manage_guild:
-        return True
-    return False
+    return Permission.MANAGEMENT in await resolve_permissions(bot_obj, guild, member)
 
 
 async def admin_check(bot_obj, guild, member):
-    guild_settings = await bot_obj.settings.find_by_id(guild.id)
-    if guild_settings:
-        if "admin_role" in guild_settings["staff_management"].keys():
-            if guild_settings["staff_management"]["admin_role"] != "":
-                if isinstance(guild_settings["staff_management"]["admin_role"], list):
-                    for role in guild_settings["staff_management"]["admin_role"]:
-                        if role in [role.id for role in member.roles]:
-                            return True
-                elif isinstance(guild_settings["staff_management"]["admin_role"], int):
-                    if guild_settings["staff_management"]["admin_role"] in [
-                        role.id for role in member.roles
-                    ]:
-                        return True
-        if "management_role" in guild_settings["staff_management"].keys():
-            if guild_settings["staff_management"]["management_role"] != "":
-                if isinstance(
-                    guild_settings["staff_management"]["management_role"], list
-                ):
-                    for role in guild_settings["staff_management"]["management_role"]:
-                        if role in [role.id for role in member.roles]:
-                            return True
-                elif isinstance(
-                    guild_settings["staff_management"]["management_role"], int
-                ):
-                    if guild_settings["staff_management"]["management_role"] in [
-                        role.id for role in member.roles
-                    ]:
-                        return True
-    if member.guild_permissions.administrator:
-        return True
-    return False
+    return Permission.ADMIN in await resolve_permissions(bot_obj, guild, member)
 
 
 async def staff_predicate(ctx):
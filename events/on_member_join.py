@@ -0,0 +1,15 @@
+import discord
+from discord.ext import commands
+
+
+class OnMemberJoin(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.Cog.listener("on_member_join")
+    async def on_member_join(self, member: discord.Member):
+        self.bot.member_index.add(member)
+
+
+async def setup(bot):
+    await bot.add_cog(OnMemberJoin(bot))
@@ -6,7 +6,7 @@ import string
 import aiohttp
 import discord
 import num2words
-import roblox
+from roblox.thumbnails import AvatarThumbnailType
 from decouple import config
 from discord.ext import commands
 from reactionmenu import Page, ViewButton, ViewMenu, ViewSelect
@@ -169,16 +169,16 @@ class OnMessage(commands.Cog):
                                                         0
                                                     ].replace("[", "")
 
-                                                    roblox_client = roblox.Client()
-                                                    roblox_player = await roblox_client.get_user_by_username(
+                                                    roblox_player = await self.bot.identity.get_user_by_username(
                                                         roblox_user
                                                     )
                                                     if not roblox_player:
                                                         return
-                                                    thumbnails = await roblox_client.thumbnails.get_user_avatar_thumbnails(
-                                                        [roblox_player], size=(420, 420)
+                                                    thumbnail = await self.bot.identity.get_avatar_url(
+                                                        roblox_player.id,
+                                                        type=AvatarThumbnailType.full_body,
+                                                        size=(420, 420),
                                                     )
-                                                    thumbnail = thumbnails[0].image_url
 
                                                     embed = (
                                                         discord.Embed(
@@ -22,12 +22,12 @@ class OnStaffRequestSend(commands.Cog):
         guild_id = doc["guild_id"]
         reason = doc["reason"]
 
-        settings = await self.bot.settings.db.find_one({"_id": guild_id})
+        settings = await self.bot.settings.find_by_id(guild_id)
         staff_requests = settings.get("game_logging", {}).get("staff_requests", {})
         if staff_requests == {}:
             return
 
-        is_erlc = bool(await self.bot.server_keys.db.count_documents({"_id": guild_id}))
+        is_erlc = guild_id in self.bot.server_keys
         players_ingame = -1
         staff_ingame = -1
         if is_erlc:
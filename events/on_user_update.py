@@ -0,0 +1,16 @@
+import discord
+from discord.ext import commands
+
+
+class OnUserUpdate(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.Cog.listener("on_user_update")
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        if before.name != after.name or before.global_name != after.global_name:
+            self.bot.member_index.update_user(after)
+
+
+async def setup(bot):
+    await bot.add_cog(OnUserUpdate(bot))
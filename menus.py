@@ -12260,6 +12260,7 @@ class AccountLinkingMenu(discord.ui.View):
             await self.bot.oauth2_users.db.insert_one(
                 {"roblox_id": new_user.id, "discord_id": interaction.user.id}
             )
+            self.bot.oauth2_users.invalidate(new_user.id, interaction.user.id)
 
             self.mode = "Code"
             self.username = new_user.name
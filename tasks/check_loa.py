@@ -41,81 +41,84 @@ async def check_loa(bot):
         ):
             guild_loas[loaObject["guild_id"]].append(loaObject)
 
-        for guild_id, loas in guild_loas.items():
-            try:
-                guild = bot.get_guild(guild_id)
-                if not guild:
-                    continue
-
-                settings = await bot.settings.find_by_id(guild.id)
-                if not settings:
-                    continue
-
-                roles = [None]
-                if "loa_role" in settings.get("staff_management", {}):
-                    try:
-                        loa_role_config = settings["staff_management"]["loa_role"]
-                        if isinstance(loa_role_config, int):
-                            role = guild.get_role(loa_role_config)
-                            roles = [role] if role else [None]
-                        elif isinstance(loa_role_config, list):
-                            roles = [
-                                guild.get_role(role_id) for role_id in loa_role_config
-                            ]
-                            roles = [r for r in roles if r is not None]
-                    except KeyError:
-                        pass
-
-                batch_size = 5
-                for i in range(0, len(loas), batch_size):
-                    batch = loas[i : i + batch_size]
-                    await asyncio.gather(
-                        *[
-                            process_loa(bot, guild, loa, settings, roles)
-                            for loa in batch
-                        ],
-                        return_exceptions=True,
-                    )
-
-                    if i + batch_size < len(loas):
-                        await asyncio.sleep(1)
-
-            except Exception as e:
-                print(f"Error processing guild {guild_id}: {e}")
+        # Expiry flags are buffered and written in bulk at the end of the sweep.
+        async with bot.loas.bulk(ordered=False) as bulk:
+            for guild_id, loas in guild_loas.items():
+                try:
+                    guild = bot.get_guild(guild_id)
+                    if not guild:
+                        continue
+
+                    settings = await bot.settings.find_by_id(guild.id)
+                    if not settings:
+                        continue
+
+                    roles = [None]
+                    if "loa_role" in settings.get("staff_management", {}):
+                        try:
+                            loa_role_config = settings["staff_management"]["loa_role"]
+                            if isinstance(loa_role_config, int):
+                                role = guild.get_role(loa_role_config)
+                                roles = [role] if role else [None]
+                            elif isinstance(loa_role_config, list):
+                                roles = [
+                                    guild.get_role(role_id) for role_id in loa_role_config
+                                ]
+                                roles = [r for r in roles if r is not None]
+                        except KeyError:
+                            pass
+
+                    batch_size = 5
+                    for i in range(0, len(loas), batch_size):
+                        batch = loas[i : i + batch_size]
+                        await asyncio.gather(
+                            *[
+                                process_loa(bot, guild, loa, settings, roles, bulk)
+                                for loa in batch
+                            ],
+                            return_exceptions=True,
+                        )
+
+                        if i + batch_size < len(loas):
+                            await asyncio.sleep(1)
+
+                except Exception as e:
+                    print(f"Error processing guild {guild_id}: {e}")
 
     except ValueError:
         pass
 
 
-async def process_loa(bot, guild, loaObject, settings, roles):
+async def process_loa(bot, guild, loaObject, settings, roles, bulk):
     """Process individual LOA expiration"""
     try:
         if not loaObject["accepted"]:
             return
 
         loaObject["expired"] = True
-        await bot.loas.update_by_id(loaObject)
+        await bulk.update_by_id({"_id": loaObject["_id"], "expired": True})
 
         member = await get_cached_member(guild, loaObject["user_id"])
         if not member:
             return
 
-        docs = bot.loas.db.find(
+        # LOAs expiring in this sweep may not be flushed yet, so only
+        # notices that are still running count as another active LOA.
+        other_active = await bot.loas.db.find_one(
             {
+                "_id": {"$ne": loaObject["_id"]},
                 "user_id": loaObject["user_id"],
                 "guild_id": loaObject["guild_id"],
                 "accepted": True,
                 "expired": False,
                 "denied": False,
                 "type": loaObject["type"],
-            }
+                "expiry": {"$gte": datetime.datetime.now().timestamp()},
+            },
+            {"_id": 1},
         )
 
-        should_remove_roles = True
-        async for doc in docs:
-            if doc != loaObject:
-                should_remove_roles = False
-                break
+        should_remove_roles = other_active is None
 
         role_removed = None
         if should_remove_roles:
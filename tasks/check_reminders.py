@@ -72,17 +72,10 @@ async def iterate_reminder(bot, guildObj): # TODO: do a refactor of this.. this
                 )
                 content = item["integration"]["content"]
                 total = ":" + command + " " + content
-                if (
-                        await bot.server_keys.db.count_documents(
-                            {"_id": channel.guild.id}
-                        )
-                        != 0
-                ):
+                if channel.guild.id in bot.server_keys:
                     do_not_complete = False
                     try:
-                        status = await bot.prc_api.get_server_status(
-                            channel.guild.id
-                        )
+                        await bot.snapshots.get(channel.guild.id, "status")
                     except prc_api.ResponseFailure:
                         do_not_complete = True
 
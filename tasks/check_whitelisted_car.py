@@ -7,9 +7,9 @@ from decouple import config
 from discord.ext import commands, tasks
 import logging
 import asyncio
-import roblox
 from collections import defaultdict
 
+from datamodels.Settings import VEHICLE_RESTRICTIONS_PROJECTION
 from utils.constants import RED_COLOR, BLANK_COLOR
 from utils.prc_api import Player
 from utils import prc_api
@@ -28,15 +28,7 @@ async def check_whitelisted_car(bot):
     base = {"ERLC.vehicle_restrictions.enabled": True}
     pipeline = [
         {"$match": base},
-        {
-            "$lookup": {
-                "from": "server_keys",
-                "localField": "_id",
-                "foreignField": "_id",
-                "as": "server_key",
-            }
-        },
-        {"$match": {"server_key": {"$ne": []}}},
+        {"$project": VEHICLE_RESTRICTIONS_PROJECTION},
     ]
 
     semaphore = asyncio.Semaphore(3)
@@ -77,16 +69,8 @@ async def check_whitelisted_car(bot):
                     return
 
                 try:
-                    players, vehicles = await asyncio.gather(
-                        bot.prc_api.get_server_players(guild_id),
-                        bot.prc_api.get_server_vehicles(guild_id),
-                        return_exceptions=True,
-                    )
-
-                    if isinstance(players, Exception) or isinstance(vehicles, Exception):
-                        logging.error(f"Failed to fetch server data for guild {guild_id}")
-                        return
-
+                    snapshot = await bot.snapshots.get(guild_id, "players", "vehicles")
+                    players, vehicles = snapshot.players, snapshot.vehicles
                 except Exception as e:
                     logging.error(f"Failed to fetch server data for guild {guild_id}: {e}")
                     return
@@ -125,7 +109,8 @@ async def check_whitelisted_car(bot):
 
     guild_tasks = []
     async for items in bot.settings.db.aggregate(pipeline):
-        guild_tasks.append(process_guild(items))
+        if items["_id"] in bot.server_keys:
+            guild_tasks.append(process_guild(items))
 
         if len(guild_tasks) >= 5:
             await asyncio.gather(*guild_tasks, return_exceptions=True)
@@ -278,11 +263,7 @@ async def handle_non_member(bot, player, guild, alert_channel, alert_message):
 
 async def send_warning_embed(bot, player, guild, alert_channel):
     try:
-        user = await bot.roblox.get_user(int(player.id))
-        avatar = await bot.roblox.thumbnails.get_user_avatar_thumbnails(
-            [user], type=roblox.thumbnails.AvatarThumbnailType.headshot
-        )
-        avatar_url = avatar[0].image_url if avatar else None
+        avatar_url = await bot.identity.get_avatar_url(int(player.id))
 
         embed = discord.Embed(
             title="Whitelisted Vehicle Warning",
@@ -44,7 +44,10 @@ async def handle_erlc_condition(bot, guild_id, condition) -> bool:
     if await bot.mc_api.get_server_key(guild_id) is not None:
         api_client = bot.mc_api
     try:
-        players = await api_client.get_server_players(guild_id)
+        if api_client is bot.prc_api:
+            players = (await bot.snapshots.get(guild_id, "players")).players
+        else:
+            players = await api_client.get_server_players(guild_id)
     except prc_api.ResponseFailure:
         return False
 
@@ -110,6 +113,8 @@ async def handle_erm_condition(bot, guild_id, condition) -> bool:
 @tasks.loop(minutes=1)
 async def iterate_conditions(bot):
     semaphore = asyncio.Semaphore(5)
+    # LastExecuted timestamps are buffered and written in bulk.
+    bulk = bot.actions.bulk(ordered=False)
     async def process_action(action):
         async with semaphore:
             try:
@@ -162,7 +167,7 @@ async def iterate_conditions(bot):
                         ):
                             return
 
-                    await bot.actions.db.update_one(
+                    await bulk.update_one(
                         {"_id": action["_id"]}, {"$set": {"LastExecuted": now_ts}}
                     )
 
@@ -211,12 +216,13 @@ async def iterate_conditions(bot):
     ]
     
     batch_size = 10
-    for i in range(0, len(actions), batch_size):
-        batch = actions[i:i + batch_size]
-        await asyncio.gather(*[process_action(action) for action in batch], return_exceptions=True)
-        
-        # Add delay between batches
-        if i + batch_size < len(actions):
-            await asyncio.sleep(2)
+    async with bulk:
+        for i in range(0, len(actions), batch_size):
+            batch = actions[i:i + batch_size]
+            await asyncio.gather(*[process_action(action) for action in batch], return_exceptions=True)
+
+            # Add delay between batches
+            if i + batch_size < len(actions):
+                await asyncio.sleep(2)
 
     logging.info("[CONDITIONS] Iterated through all conditions.")
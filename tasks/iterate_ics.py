@@ -31,7 +31,7 @@ async def iterate_ics(bot):
             continue
 
         try:
-            status: ServerStatus = await bot.prc_api.get_server_status(guild.id)
+            status: ServerStatus = (await bot.snapshots.get(guild.id, "status")).status
         except prc_api.ResponseFailure:
             status = None
 
@@ -39,8 +39,9 @@ async def iterate_ics(bot):
             continue  # Invalid key
 
         try:
-            queue: int = await bot.prc_api.get_server_queue(guild.id, minimal=True)
-            players: list[Player] = await bot.prc_api.get_server_players(guild.id)
+            snapshot = await bot.snapshots.get(guild.id, "queue", "players")
+            queue: int = snapshot.queue
+            players: list[Player] = snapshot.players
         except prc_api.ResponseFailure:
             continue  # fuck knows why
 
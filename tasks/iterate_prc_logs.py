@@ -7,13 +7,12 @@ import logging
 import asyncio
 import aiohttp
 import pytz
-import roblox
 import datetime
 from decouple import config
 
+from datamodels.Settings import ID_PROJECTION
 from utils.prc_api import JoinLeaveLog, Player
 from utils.utils import fetch_get_channel, has_whitelabel, staff_check
-from utils import prc_api
 from utils.constants import BLANK_COLOR, GREEN_COLOR, RED_COLOR
 from menus import AvatarCheckView
 from utils.username_check import UsernameChecker
@@ -32,36 +31,28 @@ global_aggregate = [
             ],
         }
     },
-    {
-        "$lookup": {
-            "from": "server_keys",
-            "localField": "_id",
-            "foreignField": "_id",
-            "as": "server_key",
-        }
-    },
-    {"$match": {"server_key": {"$ne": []}}},
+    {"$project": ID_PROJECTION},
 ]
 
-count_aggregate = global_aggregate + [{"$count": "total"}]
-
-
 async def iterate_prc_logs_global(bot):
     try:
-        server_count = await bot.settings.db.aggregate(count_aggregate).to_list(1)
-        server_count = server_count[0]["total"] if server_count else 0
+        # Only guilds with a linked server, checked against the in-memory key directory
+        linked = [
+            items
+            async for items in bot.settings.db.aggregate(global_aggregate)
+            if items["_id"] in bot.server_keys
+        ]
+        server_count = len(linked)
 
         logging.warning(f"[ITERATE] Starting iteration for {server_count} servers")
         processed = 0
         start_time = time.time()
 
-        pipeline = global_aggregate
-
         semaphore = asyncio.Semaphore(10)
         tasks = []
 
 
-        async for items in bot.settings.db.aggregate(pipeline):
+        for items in linked:
             tasks.append(process_guild(bot, items, semaphore))
             processed += 1
             if processed % 10 == 0:
@@ -126,9 +117,7 @@ async def unprimitive_guild_process(items, bot):
     ):
         return
 
-    kill_logs, player_logs, command_logs = await fetch_logs_with_retry(
-        guild.id, bot
-    )
+    kill_logs, player_logs, command_logs = await fetch_logs(guild.id, bot)
     current_time = int(time.time())
 
     if command_logs:
@@ -137,7 +126,7 @@ async def unprimitive_guild_process(items, bot):
     subtasks = []
 
     if has_welcome_message:
-        last_timestamp = bot.log_tracker.get_last_timestamp(
+        last_timestamp = await bot.log_tracker.get_last_timestamp(
             guild.id, "welcome_message"
         )
         latest_timestamp = await send_welcome_message(
@@ -152,11 +141,11 @@ async def unprimitive_guild_process(items, bot):
             bot,
             settings,
             guild.id,
-            await bot.prc_api.get_server_players(guild.id),
+            (await bot.snapshots.get(guild.id, "players")).players,
         )
 
     if has_automatic_shifts:
-        last_timestamp = bot.log_tracker.get_last_timestamp(
+        last_timestamp = await bot.log_tracker.get_last_timestamp(
             guild.id, "automatic_shifts"
         )
         latest_timestamp = await check_automatic_shifts(
@@ -167,7 +156,7 @@ async def unprimitive_guild_process(items, bot):
         )
 
     if "kill_logs" in channels and kill_logs:
-        last_timestamp = bot.log_tracker.get_last_timestamp(
+        last_timestamp = await bot.log_tracker.get_last_timestamp(
             guild.id, "kill_logs"
         )
         embeds, latest_timestamp = process_kill_logs(
@@ -182,7 +171,7 @@ async def unprimitive_guild_process(items, bot):
             )
 
     if "player_logs" in channels and player_logs:
-        last_timestamp = bot.log_tracker.get_last_timestamp(
+        last_timestamp = await bot.log_tracker.get_last_timestamp(
             guild.id, "player_logs"
         )
         embeds, latest_timestamp = await process_player_logs(
@@ -225,61 +214,20 @@ async def iterate_prc_logs(bot):
         )
 
 
-async def fetch_logs_with_retry(guild_id, bot, retries=3):
-    """Helper function to fetch logs with retry logic"""
-    for attempt in range(retries):
-        try:
-            kill_logs = await bot.prc_api.fetch_kill_logs(guild_id)
-            player_logs = await bot.prc_api.fetch_player_logs(guild_id)
-            command_logs = await bot.prc_api.fetch_server_logs(guild_id)
-            return kill_logs, player_logs, command_logs
-        except prc_api.ResponseFailure as e:
-            if e.status_code == 429 and attempt < retries - 1:
-                retry_after = float(e.json_data.get("retry_after", 5))
-                await asyncio.sleep(retry_after)
-                continue
-            raise
-    return None, None, None
+async def fetch_logs(guild_id, bot):
+    """Gets the kill, join and command logs from the shared server snapshot"""
+    snapshot = await bot.snapshots.get(
+        guild_id, "kill_logs", "join_logs", "command_logs"
+    )
+    return snapshot.kill_logs, snapshot.join_logs, snapshot.command_logs
 
 
 async def save_new_logs(bot, guild_id, command_logs, current_time):
-    """Save new command logs to the database by updating existing documents"""
-    last_saved = await bot.saved_logs.find_by_id(guild_id)
-
-    last_timestamp = last_saved["timestamp"] if last_saved else 0
+    """Append new command logs to the saved logs; the server expires old entries"""
     cutoff_time = current_time - 10800
-
-    new_logs = [
-        {
-            "username": log.username,
-            "user_id": log.user_id,
-            "timestamp": log.timestamp,
-            "is_automated": log.is_automated,
-            "command": log.command,
-        }
-        for log in command_logs
-        if log.timestamp > last_timestamp and log.timestamp > cutoff_time
-    ]
-
-    if new_logs:
-        if last_saved:
-            # Filter both existing and new logs to remove old ones
-            existing_logs = [
-                log
-                for log in last_saved.get("logs", [])
-                if log["timestamp"] > cutoff_time
-            ]
-            await bot.saved_logs.update(
-                {
-                    "_id": guild_id,
-                    "timestamp": current_time,
-                    "logs": existing_logs + new_logs,
-                }
-            )
-        else:
-            await bot.saved_logs.insert(
-                {"_id": guild_id, "timestamp": current_time, "logs": new_logs}
-            )
+    await bot.saved_logs.insert_logs(
+        guild_id, [log for log in command_logs if log.timestamp > cutoff_time]
+    )
 
 
 async def send_log_batch(channel, embeds):
@@ -340,11 +288,7 @@ async def process_player_logs(bot, settings, guild_id, player_logs, last_timesta
                     if not channel:
                         continue
 
-                    user = await bot.roblox.get_user(int(log.user_id))
-                    avatar = await bot.roblox.thumbnails.get_user_avatar_thumbnails(
-                        [user], type=roblox.thumbnails.AvatarThumbnailType.headshot
-                    )
-                    avatar_url = avatar[0].image_url if avatar else None
+                    avatar_url = await bot.identity.get_avatar_url(int(log.user_id))
 
                     embed = discord.Embed(
                         title="Suspicious Username Detected",
@@ -463,14 +407,12 @@ async def process_player_logs(bot, settings, guild_id, player_logs, last_timesta
                                     channel = await fetch_get_channel(guild, channel_id)
                                     if channel:
                                         try:
-                                            user = await bot.roblox.get_user(
-                                                int(user_id)
-                                            )
-                                            avatar = await bot.roblox.thumbnails.get_user_avatar_thumbnails(
-                                                [user],
-                                                type=roblox.thumbnails.AvatarThumbnailType.headshot,
+                                            user, avatar_url = await asyncio.gather(
+                                                bot.identity.get_partial_user(int(user_id)),
+                                                bot.identity.get_avatar_url(int(user_id)),
                                             )
-                                            avatar_url = avatar[0].image_url
+                                            if user is None:
+                                                raise ValueError(f"Unknown Roblox user {user_id}")
                                         except Exception as e:
                                             logging.error(
                                                 f"Error fetching user data: {e}"
@@ -510,14 +452,9 @@ async def process_player_logs(bot, settings, guild_id, player_logs, last_timesta
                                         if settings["ERLC"]["avatar_check"].get(
                                                 "message"
                                         ):
-                                            await bot.scheduled_pm_queue.put(
-                                                (
-                                                    guild_id,
-                                                    user.name,
-                                                    settings["ERLC"]["avatar_check"][
-                                                        "message"
-                                                    ],
-                                                )
+                                            bot.prc_api.queue_command(
+                                                guild_id,
+                                                f":pm {user.name} {settings['ERLC']['avatar_check']['message']}",
                                             )
             except Exception as e:
                 logging.error(f"Error in avatar check: {e}")
@@ -564,12 +501,7 @@ async def send_welcome_message(
     players = player_names.keys()
     if len(players) == 0:
         return sorted(player_logs, key=lambda x: x.timestamp, reverse=True)[0].timestamp
-    try:
-        await bot.prc_api.run_command(
-            guild_id, f":pm {','.join(players)} {welcome_message}"
-        )
-    except prc_api.ResponseFailure:
-        pass
+    bot.prc_api.queue_command(guild_id, f":pm {','.join(players)} {welcome_message}")
     return sorted(player_logs, key=lambda x: x.timestamp, reverse=True)[0].timestamp
 
 
@@ -588,7 +520,7 @@ async def check_automatic_shifts(bot, settings, guild_id, join_logs, ts: int) ->
         return sorted(join_logs, key=lambda x: x.timestamp, reverse=True)[0].timestamp
 
     try:
-        players = await bot.prc_api.get_server_players(guild_id)
+        players = (await bot.snapshots.get(guild_id, "players")).players
     except Exception as e:
         logging.info(f"Skipping {guild_id} (automatic shifts) because of exc: {e}")
         return sorted(join_logs, key=lambda x: x.timestamp, reverse=True)[0].timestamp
@@ -599,13 +531,14 @@ async def check_automatic_shifts(bot, settings, guild_id, join_logs, ts: int) ->
     joins: list[JoinLeaveLog] = list(filter(lambda x: x.type == "join", join_logs))
     leaves: list[JoinLeaveLog] = list(filter(lambda x: x.type == "leave", join_logs))
     # quick check
-    temp_linked = []
-    for item in leaves:
-        oauth2_user = await bot.oauth2_users.db.find_one(
-            {"roblox_id": int(item.user_id)}
-        )
-        if oauth2_user:
-            temp_linked.append(oauth2_user["discord_id"])
+    leave_links = await bot.oauth2_users.get_discord_ids(
+        [item.user_id for item in leaves]
+    )
+    temp_linked = [
+        leave_links[int(item.user_id)][0]
+        for item in leaves
+        if leave_links[int(item.user_id)]
+    ]
     discordid_to_shift = {
         x["UserID"]: x
         async for x in bot.shift_management.shifts.db.find(
@@ -616,17 +549,14 @@ async def check_automatic_shifts(bot, settings, guild_id, join_logs, ts: int) ->
             }
         )
     }
-    for item in temp_linked:
+    ending = [item for item in temp_linked if item in discordid_to_shift]
+    ending_members = await bot.accounts.get_members(guild, ending) if ending else {}
+    for item in ending:
         if item in discordid_to_shift:
-            shift = discordid_to_shift[item]
+            shift = discordid_to_shift.pop(item)
             await bot.shift_management.end_shift(shift["_id"], guild.id)
             bot.dispatch("shift_end", shift["_id"])
-            member = guild.get_member(int(item))
-            if not member:
-                try:
-                    member = await guild.fetch_member(int(item))
-                except discord.HTTPException:
-                    pass
+            member = ending_members.get(int(item))
             if not member:
                 continue
 
@@ -657,25 +587,29 @@ async def check_automatic_shifts(bot, settings, guild_id, join_logs, ts: int) ->
                 }
             )
 
-    linked_users = []
-    for item in new_data:
-        uid = item["UserID"]
-        doc = await bot.oauth2_users.db.find_one({"roblox_id": int(uid)})
-        if doc is not None:
-            discord_uid = doc["discord_id"]
-            consent_doc = await bot.consent.db.find_one({"_id": discord_uid}) or {
-                "automatic_shifts": True
-            }
-            if consent_doc.get("automatic_shifts", True) is True:
-                member = guild.get_member(discord_uid)
-                if not member:
-                    try:
-                        member = await guild.fetch_member(discord_uid)
-                    except:
-                        pass
-                if not member:
-                    continue
-                linked_users.append(member)
+    # One query per collection for the whole sweep, however many players joined
+    join_links = await bot.oauth2_users.get_discord_ids(
+        [item["UserID"] for item in new_data]
+    )
+    linked_ids = [
+        join_links[int(item["UserID"])][0]
+        for item in new_data
+        if join_links[int(item["UserID"])]
+    ]
+    consents = await bot.consent.get_consents(linked_ids) if linked_ids else {}
+    consenting = [
+        discord_uid
+        for discord_uid in linked_ids
+        if consents[int(discord_uid)].get("automatic_shifts", True) is True
+    ]
+    joined_members = (
+        await bot.accounts.get_members(guild, consenting) if consenting else {}
+    )
+    linked_users = [
+        joined_members[int(discord_uid)]
+        for discord_uid in consenting
+        if int(discord_uid) in joined_members
+    ]
 
     staff_members = []
     for item in linked_users:
@@ -800,28 +734,16 @@ async def check_team_restrictions(bot, settings, guild_id, players):
         ]
         if filtered_load:
             cmd = f":load {','.join(filtered_load)}"
-            try:
-                await bot.prc_api.run_command(guild_id, cmd)
-            except:
-                logging.warning("PRC API Rate limit reached when loading.")
+            bot.prc_api.queue_command(guild_id, cmd)
         else:
             logging.warning(
                 "Skipped sending load command - usernames too short or empty"
             )
 
     for message, plrs_to_send in pm_against.items():
-        try:
-            await bot.scheduled_pm_queue.put(
-                (guild_id, ",".join(plrs_to_send), message)
-            )
-            logging.warning("Added to scheduled PM queue.")
-        except Exception as e:
-            logging.warning("PRC API Rate limit reached when PMing.")
+        bot.prc_api.queue_command(guild_id, f":pm {','.join(plrs_to_send)} {message}")
     if len(kick_against) > 0:
-        try:
-            await bot.prc_api.run_command(guild_id, f":kick {','.join(kick_against)}")
-        except:
-            logging.warning("PRC API Rate limit reached when kicking.")
+        bot.prc_api.queue_command(guild_id, f":kick {','.join(kick_against)}")
     send_by_teams = {}
     team_to_channel = {}
     for channel, players_team_unions in send_to.items():
@@ -937,12 +859,12 @@ async def handle_kick_timer(bot, settings, guild_id, player_logs, command_logs):
 
         if punishment == "ban":
             try:
-                await bot.prc_api.run_command(guild_id, f":ban {usernames_str}")
+                await bot.prc_api.queue_command(guild_id, f":ban {usernames_str}")
             except Exception as e:
                 logging.error(f"Failed to ban users: {e}")
         else:
             try:
-                await bot.prc_api.run_command(guild_id, f":kick {usernames_str}")
+                await bot.prc_api.queue_command(guild_id, f":kick {usernames_str}")
             except Exception as e:
                 logging.error(f"Failed to kick users: {e}")
 
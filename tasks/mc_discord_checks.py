@@ -8,6 +8,7 @@ from collections import defaultdict
 import datetime
 import pytz
 
+from datamodels.Settings import MC_DISCORD_CHECKS_PROJECTION
 from utils.constants import BLANK_COLOR
 
 
@@ -82,15 +83,7 @@ async def mc_discord_checks(bot):
     base = {"MC.discord_checks.enabled": True}
     pipeline = [
         {"$match": base},
-        {
-            "$lookup": {
-                "from": "mc_keys",
-                "localField": "_id",
-                "foreignField": "_id",
-                "as": "server_key",
-            }
-        },
-        {"$match": {"server_key": {"$ne": []}}},
+        {"$project": MC_DISCORD_CHECKS_PROJECTION},
     ]
     
     semaphore = asyncio.Semaphore(3)
@@ -144,7 +137,8 @@ async def mc_discord_checks(bot):
 
     guild_tasks = []
     async for items in bot.settings.db.aggregate(pipeline):
-        guild_tasks.append(process_guild(items))
+        if items["_id"] in bot.mc_keys:
+            guild_tasks.append(process_guild(items))
 
         if len(guild_tasks) >= 5:
             await asyncio.gather(*guild_tasks, return_exceptions=True)
@@ -4,34 +4,20 @@ import discord
 from discord.ext import tasks
 import logging
 import asyncio
-from collections import defaultdict
 import datetime
 import pytz
 
+from datamodels.Settings import DISCORD_CHECKS_PROJECTION
 from utils.constants import BLANK_COLOR
 
 
 _guild_cache = {}
-_member_search_cache = defaultdict(dict)
 _cache_timeout = 300
 
-async def get_cached_member_by_username(guild, username):
-    """Get member by username with caching"""
-    now = time.time()
-    cache_key = f"{guild.id}_{username.lower()}"
-
-    if cache_key in _member_search_cache[guild.id]:
-        member_obj, cached_time = _member_search_cache[guild.id][cache_key]
-        if now - cached_time < _cache_timeout:
-            return member_obj
-
-    member = None
-    members = await guild.query_members(query=username, limit=1)
-    if members:
-        member = members[0] if members else None
-
-    _member_search_cache[guild.id][cache_key] = (member, now)
-    return member
+async def get_cached_member_by_username(bot, guild, username):
+    """Get member by username from the member index"""
+    members = await bot.member_index.find(guild, username, limit=1)
+    return members[0] if members else None
 
 async def get_cached_guild(bot, guild_id):
     """Get guild with caching"""
@@ -147,7 +133,7 @@ async def process_discord_checks(bot, items, guild_id):
             return
 
         try:
-            players = await bot.prc_api.get_server_players(guild_id)
+            players = (await bot.snapshots.get(guild_id, "players")).players
             if not players:
                 logging.info(f"No players found in guild {guild_id}")
                 return
@@ -160,7 +146,7 @@ async def process_discord_checks(bot, items, guild_id):
         callsign_violations = []
         
         for player in players:
-            member = await get_cached_member_by_username(guild, player.username)
+            member = await get_cached_member_by_username(bot, guild, player.username)
             if not member:
                 not_in_discord.append(player)
             #======WILL BE IMPLEMENTED IN NEXT UPDATE======
@@ -204,15 +190,7 @@ async def prc_automations(bot):
     base = {"ERLC": {"$exists": True, "$ne": None}}
     pipeline = [
         {"$match": base},
-        {
-            "$lookup": {
-                "from": "server_keys",
-                "localField": "_id",
-                "foreignField": "_id",
-                "as": "server_key",
-            }
-        },
-        {"$match": {"server_key": {"$ne": []}}},
+        {"$project": DISCORD_CHECKS_PROJECTION},
     ]
 
     semaphore = asyncio.Semaphore(3)
@@ -224,7 +202,8 @@ async def prc_automations(bot):
 
     guild_tasks = []
     async for items in bot.settings.db.aggregate(pipeline):
-        guild_tasks.append(process_guild(items))
+        if items["_id"] in bot.server_keys:
+            guild_tasks.append(process_guild(items))
 
         if len(guild_tasks) >= 5:
             await asyncio.gather(*guild_tasks, return_exceptions=True)
@@ -247,7 +226,7 @@ async def handle_discord_check_batch(bot, guild, players_not_in_discord, alert_c
         usernames = [player.username for player in players_not_in_discord]
         command = f":pm {','.join(usernames)} {alert_message}"
 
-        await bot.prc_api.run_command(guild.id, command)
+        bot.prc_api.queue_command(guild.id, command)
 
         if not hasattr(bot, 'discord_check_counter'):
             bot.discord_check_counter = {}
@@ -306,7 +285,7 @@ async def handle_callsign_violations_batch(bot, guild, players_with_violations,
         violation_message = "Your callsign does not match your assigned role. Please update your callsign or contact staff."
         command = f":pm {','.join(usernames)} {violation_message}"
 
-        await bot.prc_api.run_command(guild.id, command)
+        bot.prc_api.queue_command(guild.id, command)
     
         if alert_channel is not None:
             await send_callsign_violation_embed(players_with_violations, alert_channel)
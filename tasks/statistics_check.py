@@ -6,6 +6,7 @@ import discord
 from decouple import config
 from discord.ext import tasks
 
+from datamodels.Settings import STATISTICS_PROJECTION
 from utils import prc_api
 from utils.prc_api import Player, ServerStatus
 from utils.utils import fetch_get_channel
@@ -99,7 +100,7 @@ async def statistics_check(bot):
                     logging.error(f"Guild {guild_id} not found")
                     return
 
-                settings = await bot.settings.find_by_id(guild_id)
+                settings = guild_data
                 if (
                     not settings
                     or "ERLC" not in settings
@@ -111,9 +112,12 @@ async def statistics_check(bot):
                 statistics = settings["ERLC"]["statistics"]
                 
                 try:
-                    players: list[Player] = await bot.prc_api.get_server_players(guild_id)
-                    status: ServerStatus = await bot.prc_api.get_server_status(guild_id)
-                    queue: int = await bot.prc_api.get_server_queue(guild_id, minimal=True)
+                    snapshot = await bot.snapshots.get(
+                        guild_id, "players", "status", "queue"
+                    )
+                    players: list[Player] = snapshot.players
+                    status: ServerStatus = snapshot.status
+                    queue: int = snapshot.queue
                 except prc_api.ResponseFailure as e:
                     logging.error(f"PRC ResponseFailure for guild {guild_id}: {e}")
                     return
@@ -156,7 +160,7 @@ async def statistics_check(bot):
     # Process guilds in batches
     guild_tasks = []
     async for guild_data in bot.settings.db.find(
-        {"ERLC.statistics": {"$exists": True}}
+        {"ERLC.statistics": {"$exists": True}}, STATISTICS_PROJECTION
     ):
         guild_tasks.append(process_guild(guild_data))
         
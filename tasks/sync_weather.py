@@ -36,15 +36,6 @@ async def sync_weather(bot):
                     **chosen_filter,
                 }
             },
-            {
-                "$lookup": {
-                    "from": "server_keys",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "server_key",
-                }
-            },
-            {"$match": {"server_key": {"$ne": []}}},
         ]
 
         weather_service_url = config("WEATHER_SERVICE_URL")
@@ -65,8 +56,10 @@ async def sync_weather(bot):
         processed = 0
         async with aiohttp.ClientSession() as session:
             async for guild_data in bot.settings.db.aggregate(pipeline):
-                processed += 1
                 guild_id = guild_data["_id"]
+                if guild_id not in bot.server_keys:
+                    continue
+                processed += 1
 
                 if config("ENVIRONMENT") == "CUSTOM":
                     if guild_id != config("CUSTOM_GUILD_ID", default=0):
@@ -31,62 +31,66 @@ async def tempban_checks(bot):
 
     cached_servers = {}
     initial_time = time.time()
-    async for punishment_item in bot.punishments.db.find(
-        {
-            "Epoch": {"$gt": 1709164800},
-            "CheckExecuted": {"$exists": False},
-            "UntilEpoch": {"$lt": int(datetime.datetime.now(tz=pytz.UTC).timestamp())},
-            "Type": "Temporary Ban",
-        }
-    ):
-        try:
-            guild = bot.get_guild(punishment_item["Guild"])
-            if guild is None:
-                guild = await bot.fetch_guild(punishment_item["Guild"])
-        except discord.HTTPException:
-            continue
-
-        if not cached_servers.get(punishment_item["Guild"]):
+    # CheckExecuted flags are buffered and written in bulk.
+    async with bot.punishments.bulk(ordered=False) as bulk:
+        async for punishment_item in bot.punishments.db.find(
+            {
+                "Epoch": {"$gt": 1709164800},
+                "CheckExecuted": {"$exists": False},
+                "UntilEpoch": {"$lt": int(datetime.datetime.now(tz=pytz.UTC).timestamp())},
+                "Type": "Temporary Ban",
+            }
+        ):
             try:
-                cached_servers[punishment_item["Guild"]] = await bot.prc_api.fetch_bans(
-                    punishment_item["Guild"]
-                )
-            except:
+                guild = bot.get_guild(punishment_item["Guild"])
+                if guild is None:
+                    guild = await bot.fetch_guild(punishment_item["Guild"])
+            except discord.HTTPException:
                 continue
 
-        punishment_item["CheckExecuted"] = True
-        await bot.punishments.update_by_id(punishment_item)
+            if not cached_servers.get(punishment_item["Guild"]):
+                try:
+                    cached_servers[punishment_item["Guild"]] = await bot.prc_api.fetch_bans(
+                        punishment_item["Guild"]
+                    )
+                except:
+                    continue
+
+            punishment_item["CheckExecuted"] = True
+            await bulk.update_by_id(
+                {"_id": punishment_item["_id"], "CheckExecuted": True}
+            )
 
-        if punishment_item["UserID"] not in [
-            i.user_id for i in cached_servers[punishment_item["Guild"]]
-        ]:
-            continue
+            if punishment_item["UserID"] not in [
+                i.user_id for i in cached_servers[punishment_item["Guild"]]
+            ]:
+                continue
 
-        sorted_punishments = sorted(
-            [
-                i
-                async for i in bot.punishments.db.find(
-                    {
-                        "UserID": punishment_item["UserID"],
-                        "Guild": punishment_item["Guild"],
-                    }
-                )
-            ],
-            key=lambda x: x["Epoch"],
-            reverse=True,
-        )
-        new_sorted_punishments = []
-        for item in sorted_punishments:
-            if item == punishment_item:
-                break
-            new_sorted_punishments.append(item)
+            sorted_punishments = sorted(
+                [
+                    i
+                    async for i in bot.punishments.db.find(
+                        {
+                            "UserID": punishment_item["UserID"],
+                            "Guild": punishment_item["Guild"],
+                        }
+                    )
+                ],
+                key=lambda x: x["Epoch"],
+                reverse=True,
+            )
+            new_sorted_punishments = []
+            for item in sorted_punishments:
+                if item["_id"] == punishment_item["_id"]:
+                    break
+                new_sorted_punishments.append(item)
 
-        if any([i["Type"] in ["Ban", "Temporary Ban"] for i in new_sorted_punishments]):
-            continue
+            if any([i["Type"] in ["Ban", "Temporary Ban"] for i in new_sorted_punishments]):
+                continue
 
-        await bot.prc_api.unban_user(
-            punishment_item["Guild"], punishment_item["user_id"]
-        )
+            await bot.prc_api.unban_user(
+                punishment_item["Guild"], punishment_item["user_id"]
+            )
     del cached_servers
     end_time = time.time()
     logging.warning(
@@ -1,11 +1,30 @@
+import asyncio
+import itertools
+import os
+import time
 import unittest
+from types import SimpleNamespace
 from typing import Union
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from discord import DMChannel
 from discord.ext.commands import CheckFailure, Context, NoPrivateMessage, has_any_role
 
+from datamodels.MapleKeys import MapleKeys
+from datamodels.ServerKeys import ServerKeys
+from datamodels.SyncOutbox import SyncOutbox
+from datamodels.Warnings import Warnings
 from helpers import MockContext, MockRole
+from utils.basedataclass import Record, field, split
+from utils.cache import MISSING, TTLCache
+from utils.circuit_breaker import BREAKER_OFFLINE_MAX_BACKOFF, BREAKER_THRESHOLD, CircuitBreakers, user_request
+from utils.command_queue import CommandDispatcher
+from utils.member_index import GuildIndex, MemberIndex
+from utils.mongo import Document, ensure_registered_indexes, registered_documents
+from utils.paginators import CustomPage, KeysetCursor, LazyPageSource
+from utils.permissions import Permission, StaffRoles, permission_level, resolve_permissions
+from utils.prc_api import CommandLog, JoinLeaveLog
+from utils.rate_limiter import TokenBucket
 
 
 async def has_any_role_check(ctx: Context, *roles: Union[str, int]) -> bool:
@@ -60,3 +79,863 @@ class ChecksTests(unittest.IsolatedAsyncioTestCase):
         self.ctx.channel = MagicMock(DMChannel)
         self.ctx.guild = None
         self.assertFalse(await has_no_roles_check(self.ctx))
+
+
+class TokenBucketTests(unittest.IsolatedAsyncioTestCase):
+    """Tests `utils.rate_limiter.TokenBucket`."""
+
+    async def test_acquire_without_limits(self):
+        """Requests aren't held back before the API has reported any limits."""
+        bucket = TokenBucket("test")
+        await asyncio.wait_for(bucket.acquire(), timeout=0.1)
+        self.assertIsNone(bucket.remaining)
+
+    async def test_acquire_takes_a_token(self):
+        """`acquire` takes one of the remaining tokens."""
+        bucket = TokenBucket("test")
+        bucket.update(limit=5, remaining=2, reset_at=time.time() + 60)
+        await bucket.acquire()
+        self.assertEqual(bucket.remaining, 1)
+
+    async def test_acquire_waits_for_refill(self):
+        """An empty bucket is refilled to its limit once its window resets."""
+        bucket = TokenBucket("test")
+        bucket.update(limit=3, remaining=0, reset_at=time.time() + 0.1)
+        started = time.monotonic()
+        await asyncio.wait_for(bucket.acquire(), timeout=1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(bucket.remaining, 2)
+
+    async def test_exhaust_blocks_until_retry_after(self):
+        """A 429 blocks the bucket for its retry after, even when it has tokens left."""
+        bucket = TokenBucket("test")
+        bucket.update(limit=5, remaining=5, reset_at=time.time() + 0.05)
+        bucket.exhaust(0.2)
+        started = time.monotonic()
+        await asyncio.wait_for(bucket.acquire(), timeout=1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    async def test_exhaust_before_limits_are_known(self):
+        """A 429 before any rate limit headers only blocks the bucket for its retry after."""
+        bucket = TokenBucket("test")
+        bucket.exhaust(0.2)
+        started = time.monotonic()
+        await asyncio.wait_for(bucket.acquire(), timeout=1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertIsNone(bucket.remaining)
+        await asyncio.wait_for(bucket.acquire(), timeout=0.1)
+
+
+class SyncOutboxTests(unittest.IsolatedAsyncioTestCase):
+    """Tests `datamodels.SyncOutbox.SyncOutbox` against a mocked collection."""
+
+    def setUp(self):
+        self.outbox = SyncOutbox(MagicMock(), "sync_outbox")
+        self.outbox.db = MagicMock()
+        self.outbox.db.update_one = AsyncMock()
+        self.outbox.db.bulk_write = AsyncMock()
+
+    @patch.dict(os.environ, {"BASE_API_URL": "http://internal"})
+    async def test_append_replaces_waiting_call_with_same_key(self):
+        """Calls with the same key upsert the one waiting call and bump its version."""
+        await self.outbox.append("internal", "GET", "/a", key="shift:1")
+        await self.outbox.append("internal", "GET", "/b", key="shift:1")
+        filters = [c.args[0] for c in self.outbox.db.update_one.await_args_list]
+        self.assertEqual(filters, [{"key": "shift:1", "dead": False}] * 2)
+        update = self.outbox.db.update_one.await_args.args[1]
+        self.assertEqual(update["$set"]["path"], "/b")
+        self.assertEqual(update["$inc"], {"version": 1})
+        self.assertTrue(self.outbox.db.update_one.await_args.kwargs["upsert"])
+        self.assertTrue(self.outbox.appended.is_set())
+
+    @patch.dict(os.environ, {"BASE_API_URL": "http://internal"})
+    async def test_append_defaults_key_to_call(self):
+        """Without a key, identical calls are deduplicated by method, target and path."""
+        await self.outbox.append("internal", "POST", "/Internal/Sync/1")
+        self.assertEqual(
+            self.outbox.db.update_one.await_args.args[0]["key"],
+            "POST internal/Internal/Sync/1",
+        )
+
+    @patch.dict(os.environ, {"BASE_API_URL": ""})
+    async def test_append_skips_unconfigured_target(self):
+        """Nothing is queued for an API without a base URL."""
+        await self.outbox.append("internal", "GET", "/a")
+        self.outbox.db.update_one.assert_not_awaited()
+
+    async def test_complete_checks_version(self):
+        """Results only apply to the version that was sent, a newer one is left waiting."""
+        sent = {"_id": 1, "version": 2, "attempts": 0}
+        retried = {"_id": 2, "version": 1, "attempts": 0}
+        rejected = {"_id": 3, "version": 5, "attempts": 0}
+        await self.outbox.complete(
+            [(sent, None, False), (retried, "HTTP 503", True), (rejected, "HTTP 404", False)],
+            lambda attempts: 60,
+        )
+        operations = self.outbox.db.bulk_write.await_args.args[0]
+        self.assertEqual(
+            [operation._filter for operation in operations],
+            [{"_id": 1, "version": 2}, {"_id": 2, "version": 1}, {"_id": 3, "version": 5}],
+        )
+        self.assertEqual(type(operations[0]).__name__, "DeleteOne")
+        self.assertFalse(operations[1]._doc["$set"]["dead"])
+        self.assertEqual(operations[1]._doc["$set"]["attempts"], 1)
+        self.assertTrue(operations[2]._doc["$set"]["dead"])
+        # Dead calls expire from when they died, not from a retry that never comes
+        self.assertLess(operations[2]._doc["$set"]["due_at"], operations[1]._doc["$set"]["due_at"])
+
+    async def test_claim_sends_ordered_calls_one_at_a_time(self):
+        """Of the calls sharing an ordering key only the oldest waiting one is claimed."""
+        due = [
+            {"_id": 1, "due_at": 1},
+            {"_id": 2, "due_at": 2, "order": "shift:1"},
+            {"_id": 3, "due_at": 3, "order": "shift:1"},
+            {"_id": 5, "due_at": 5, "order": "shift:2"},
+        ]
+        # The start of shift 2 is backing off after a failure, its end has to wait
+        waiting = [
+            {"_id": 2, "created_at": 1, "order": "shift:1"},
+            {"_id": 3, "created_at": 2, "order": "shift:1"},
+            {"_id": 4, "created_at": 0, "order": "shift:2"},
+            {"_id": 5, "created_at": 3, "order": "shift:2"},
+        ]
+        self.outbox.db.find.side_effect = [FakeCursor(due), FakeCursor(waiting), FakeCursor([])]
+        self.outbox.db.update_many = AsyncMock()
+        await self.outbox.claim(10)
+        claimed = self.outbox.db.update_many.await_args.args[0]["_id"]["$in"]
+        self.assertEqual(claimed, [1, 2])
+
+    async def test_sent_ordered_call_wakes_dispatcher(self):
+        """The next call of an ordering key doesn't wait for the poll interval."""
+        await self.outbox.complete([({"_id": 1, "version": 1, "attempts": 0}, None, False)], lambda attempts: 60)
+        self.assertFalse(self.outbox.appended.is_set())
+        await self.outbox.complete(
+            [({"_id": 2, "version": 1, "attempts": 0, "order": "shift:1"}, None, False)], lambda attempts: 60
+        )
+        self.assertTrue(self.outbox.appended.is_set())
+
+    @patch.dict(os.environ, {"BASE_API_URL": "http://internal", "PANEL_API_URL": "http://panel"})
+    async def test_delete_drops_unsent_create(self):
+        """Deleting a punishment whose creation wasn't sent sends neither."""
+        # The internal create went out already, the panel one didn't
+        self.outbox.db.delete_one = AsyncMock(
+            side_effect=[SimpleNamespace(deleted_count=0), SimpleNamespace(deleted_count=1)]
+        )
+        punishments = SimpleNamespace(bot=SimpleNamespace(outbox=self.outbox), logger=MagicMock())
+        await Warnings.sync_punishment(punishments, "Delete", "abc", 1, 2)
+        self.assertEqual(
+            [c.args[0]["key"] for c in self.outbox.db.delete_one.await_args_list],
+            ["punishment:abc:internal", "punishment:abc:panel"],
+        )
+        self.assertEqual(
+            [c.args[1]["$set"]["path"] for c in self.outbox.db.update_one.await_args_list],
+            ["/Internal/SyncDeletePunishment/abc"],
+        )
+        punishments.logger.error.assert_not_called()
+
+
+def matches(document: dict, query: dict) -> bool:
+    """Evaluates the subset of Mongo filters KeysetCursor builds: equality, $gt, $and and $or."""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(document, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, q) for q in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not document[key] > condition["$gt"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+
+    def sort(self, keys: list | str, direction: int = 1):
+        if isinstance(keys, str):
+            keys = [(keys, direction)]
+        self.documents = sorted(self.documents, key=lambda d: [d[k] for k, _ in keys])
+        return self
+
+    def limit(self, amount: int):
+        self.documents = self.documents[:amount]
+        return self
+
+    async def to_list(self, length: int):
+        return self.documents[:length]
+
+
+class FakeCollection:
+    """In-memory stand-in for the parts of a Motor collection KeysetCursor uses."""
+
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+        self.finds = 0
+
+    def find(self, query: dict, projection: dict | None = None):
+        self.finds += 1
+        return FakeCursor([d for d in self.documents if matches(d, query)])
+
+    async def count_documents(self, query: dict) -> int:
+        return len([d for d in self.documents if matches(d, query)])
+
+
+class KeysetCursorTests(unittest.IsolatedAsyncioTestCase):
+    """Tests `utils.paginators.KeysetCursor` and `LazyPageSource` page boundaries."""
+
+    def setUp(self):
+        # Epochs repeat so pages have to break ties on _id
+        self.documents = [
+            {"_id": i, "Guild": 1, "Epoch": i // 3} for i in range(10)
+        ] + [{"_id": 100, "Guild": 2, "Epoch": 0}]
+        self.collection = FakeCollection(self.documents)
+        self.cursor = KeysetCursor(self.collection, {"Guild": 1}, 4, sort_field="Epoch")
+
+    async def read_all(self, cursor: KeysetCursor) -> list[list[int]]:
+        pages, boundary = [], None
+        while documents := await cursor.fetch_after(boundary):
+            pages.append([d["_id"] for d in documents])
+            boundary = cursor.boundary(documents[-1])
+        return pages
+
+    async def test_pages_cover_every_document_once(self):
+        """Pages split on ties of the sort field without skipping or repeating documents."""
+        self.assertEqual(
+            await self.read_all(self.cursor), [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+        )
+
+    async def test_pages_by_id(self):
+        """Sorting on _id seeks on _id alone."""
+        cursor = KeysetCursor(self.collection, {"Guild": 1}, 5)
+        self.assertEqual(await self.read_all(cursor), [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9]])
+
+    async def test_skip_page(self):
+        """`skip_page` ends where the page it skips ends, and stays put past the last page."""
+        first = await self.cursor.skip_page(None)
+        self.assertEqual(first, (1, 3))
+        documents = await self.cursor.fetch_after(first)
+        self.assertEqual([d["_id"] for d in documents], [4, 5, 6, 7])
+        last = await self.cursor.skip_page(await self.cursor.skip_page(first))
+        self.assertEqual(last, (3, 9))
+        self.assertEqual(await self.cursor.skip_page(last), last)
+
+    async def test_lazy_source_pages(self):
+        """Pages are counted from the total and can be read out of order."""
+        source = LazyPageSource(
+            self.cursor,
+            lambda documents, index: CustomPage(embeds=[], ids=[d["_id"] for d in documents]),
+            await self.cursor.count(),
+        )
+        self.assertEqual(len(source), 3)
+        self.assertEqual((await source.get_page(2)).ids, [8, 9])
+        self.assertEqual((await source.get_page(0)).ids, [0, 1, 2, 3])
+        self.assertEqual((await source.get_page(-2)).ids, [4, 5, 6, 7])
+
+    async def test_lazy_source_without_results(self):
+        """With nothing matching, one page is rendered from no documents without a query."""
+        cursor = KeysetCursor(self.collection, {"Guild": 3}, 4)
+        source = LazyPageSource(
+            cursor,
+            lambda documents, index: CustomPage(embeds=[], ids=documents),
+            await cursor.count(),
+        )
+        self.assertEqual(len(source), 1)
+        page = await source.get_page(0)
+        self.assertEqual(page.ids, [])
+        self.assertEqual(page.identifier, "1")
+        self.assertEqual(self.collection.finds, 0)
+
+    async def test_lazy_source_without_results_after_leading_pages(self):
+        """Leading pages alone make up the source when nothing matches."""
+        leading = CustomPage(embeds=[], identifier="Player Information")
+        source = LazyPageSource(self.cursor, lambda documents, index: None, 0, [leading])
+        self.assertEqual(len(source), 1)
+        self.assertIs(await source.get_page(0), leading)
+
+
+class TTLCacheTests(unittest.TestCase):
+    """Tests `utils.cache.TTLCache`."""
+
+    def setUp(self):
+        patcher = patch("utils.cache.time")
+        self.time = patcher.start()
+        self.time.monotonic.return_value = 1000.0
+        self.addCleanup(patcher.stop)
+
+    def test_entries_expire_after_ttl(self):
+        """Entries are served until their TTL passes, then reported missing."""
+        cache = TTLCache(ttl=10)
+        cache.set("a", 1)
+        self.time.monotonic.return_value = 1010.0
+        self.assertEqual(cache.get("a"), 1)
+        self.time.monotonic.return_value = 1010.5
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertNotIn("a", cache)
+        self.assertEqual(len(cache), 0)
+
+    def test_per_entry_ttl(self):
+        """A TTL passed to `set` overrides the cache default."""
+        cache = TTLCache(ttl=10)
+        cache.set("short", 1, ttl=1)
+        cache.set("long", 2)
+        self.time.monotonic.return_value = 1005.0
+        self.assertIs(cache.get("short"), MISSING)
+        self.assertEqual(cache.get("long"), 2)
+
+    def test_cached_none_is_not_missing(self):
+        """A cached None is a hit, unlike a key that isn't cached."""
+        cache = TTLCache(ttl=10)
+        cache.set("a", None)
+        self.assertIsNone(cache.get("a"))
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("b", "default"), "default")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_least_recently_used_is_evicted(self):
+        """Once full, the entry that was used least recently is evicted first."""
+        cache = TTLCache(ttl=10, max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_overwriting_refreshes_recency(self):
+        """Setting an existing key counts as using it."""
+        cache = TTLCache(ttl=10, max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 3)
+        cache.set("c", 4)
+        self.assertEqual(cache.get("a"), 3)
+        self.assertIs(cache.get("b"), MISSING)
+
+    def test_invalidate(self):
+        """Invalidated and cleared entries are gone."""
+        cache = TTLCache(ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.invalidate("a")
+        self.assertIs(cache.get("a"), MISSING)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class Sample(Record):
+    name: str
+    count: int
+    note: str | None = None
+
+    document_fields = {
+        "name": "Name",
+        "count": field("Count", int, default="0"),
+        "note": field("Note", default=None),
+    }
+    api_fields = {
+        ("name", "note"): split("Player", missing=None),
+        "count": field("Count", int),
+    }
+
+
+class RecordTests(unittest.TestCase):
+    """Tests the decoders `utils.basedataclass.Record` generates."""
+
+    def test_record_is_slotted(self):
+        """Records have no __dict__, only their annotated fields."""
+        record = Sample(name="a", count=1)
+        self.assertEqual(Sample.__slots__, ("name", "count", "note"))
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertIsNone(record.note)
+        with self.assertRaises(TypeError):
+            Sample(name="a")
+
+    def test_from_document(self):
+        """Mapped keys are read, converted, and defaulted when missing."""
+        record = Sample.from_document({"Name": "a", "Count": "3", "Note": "n"})
+        self.assertEqual((record.name, record.count, record.note), ("a", 3, "n"))
+        record = Sample.from_document({"Name": "b"})
+        self.assertEqual((record.name, record.count, record.note), ("b", 0, None))
+        with self.assertRaises(KeyError):
+            Sample.from_document({"Count": 1})
+
+    def test_from_document_list(self):
+        """Lists decode to one record per document, in order."""
+        records = Sample.from_document_list([{"Name": "a"}, {"Name": "b", "Count": 2}])
+        self.assertEqual([(r.name, r.count) for r in records], [("a", 0), ("b", 2)])
+
+    def test_split(self):
+        """`split` fills two attributes from one value, splitting on the first separator."""
+        record = Sample.from_api({"Player": "Name:123:456", "Count": 1})
+        self.assertEqual((record.name, record.note), ("Name", "123:456"))
+        record = Sample.from_api({"Player": "Name", "Count": 1})
+        self.assertEqual((record.name, record.note), ("Name", None))
+
+    def test_split_without_missing(self):
+        """Without a separator the second attribute is empty, unless `missing` is given."""
+        log = JoinLeaveLog.from_api({"Player": "Name", "Join": True, "Timestamp": 1})
+        self.assertEqual((log.username, log.user_id, log.type), ("Name", "", "join"))
+        log = CommandLog.from_api({"Player": "Remote Server", "Timestamp": 1, "Command": ":h hi"})
+        self.assertEqual((log.username, log.user_id, log.is_automated), ("Remote Server", 0, True))
+
+    def test_prc_logs(self):
+        """PRC log entries decode the way the API sends them."""
+        logs = JoinLeaveLog.from_api_list(
+            [
+                {"Player": "Roblox:1", "Join": True, "Timestamp": 5},
+                {"Player": "Builderman:156", "Join": False, "Timestamp": 2},
+            ]
+        )
+        self.assertEqual(
+            [(log.username, log.user_id, log.type) for log in sorted(logs)],
+            [("Builderman", "156", "leave"), ("Roblox", "1", "join")],
+        )
+
+
+class CommandDispatcherTests(unittest.IsolatedAsyncioTestCase):
+    """Tests `utils.command_queue.CommandDispatcher` with a mocked PRC client."""
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.client._send_api_request = AsyncMock(return_value=(200, {}))
+        self.dispatcher = CommandDispatcher(self.client)
+
+    def sent(self) -> list[str]:
+        return [c.kwargs["data"]["command"] for c in self.client._send_api_request.await_args_list]
+
+    async def test_pms_with_same_message_are_merged(self):
+        """Queued PMs with the same message become one PM, each recipient once."""
+        futures = [
+            self.dispatcher.enqueue(1, ":pm Alice Hello!"),
+            self.dispatcher.enqueue(1, ":pm Bob,alice Hello!"),
+            self.dispatcher.enqueue(1, ":pm Carol Bye!"),
+        ]
+        results = await asyncio.gather(*futures)
+        self.assertEqual(self.sent(), [":pm Alice,Bob Hello!", ":pm Carol Bye!"])
+        self.assertEqual(results, [(200, {})] * 3)
+        self.assertEqual(self.dispatcher.merged, 1)
+
+    async def test_merged_pms_are_split_at_max_length(self):
+        """A merged PM that would grow past the longest allowed command starts a new one."""
+        with patch("utils.command_queue.MAX_COMMAND_LENGTH", 20):
+            await asyncio.gather(
+                *[self.dispatcher.enqueue(1, f":pm User{i} Hi") for i in range(4)]
+            )
+        self.assertEqual(self.sent(), [":pm User0,User1 Hi", ":pm User2,User3 Hi"])
+
+    async def test_identical_commands_are_collapsed(self):
+        """Identical queued commands are sent once, and not again within the dedupe window."""
+        first = self.dispatcher.enqueue(1, ":h Restart soon")
+        second = self.dispatcher.enqueue(1, ":h Restart soon")
+        await asyncio.gather(first, second)
+        await self.dispatcher.enqueue(1, ":h Restart soon")
+        await self.dispatcher.enqueue(2, ":h Restart soon")
+        self.assertEqual(self.sent(), [":h Restart soon", ":h Restart soon"])
+        self.assertEqual(self.dispatcher.deduplicated, 2)
+
+    async def test_recent_pm_recipients_are_dropped(self):
+        """Recipients who just got a PM aren't sent it again."""
+        await self.dispatcher.enqueue(1, ":pm Alice Hello!")
+        await self.dispatcher.enqueue(1, ":pm alice,Bob Hello!")
+        self.assertEqual(self.sent(), [":pm Alice Hello!", ":pm Bob Hello!"])
+
+    async def test_moderation_commands_go_first(self):
+        """Moderation commands are sent before notices queued ahead of them."""
+        await asyncio.gather(
+            self.dispatcher.enqueue(1, ":h Notice"),
+            self.dispatcher.enqueue(1, ":weather rain"),
+            self.dispatcher.enqueue(1, ":kick Alice"),
+        )
+        self.assertEqual(self.sent(), [":kick Alice", ":weather rain", ":h Notice"])
+
+    async def test_failures_reach_every_waiter(self):
+        """A failed request fails every command it carried and the queue moves on."""
+        self.client._send_api_request.side_effect = [Exception("down"), (200, {})]
+        first = self.dispatcher.enqueue(1, ":pm Alice Hi")
+        second = self.dispatcher.enqueue(1, ":pm Bob Hi")
+        third = self.dispatcher.enqueue(1, ":h Later")
+        for future in (first, second):
+            with self.assertRaises(Exception):
+                await future
+        self.assertEqual(await third, (200, {}))
+        self.assertEqual(self.dispatcher.stats()["guilds"], 0)
+
+
+class FakeChangeStream:
+    def __init__(self, changes: list[dict]):
+        self.changes = changes
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def __aiter__(self):
+        for change in self.changes:
+            yield change
+
+
+class KeyDirectoryTests(unittest.IsolatedAsyncioTestCase):
+    """Tests the in-memory server key directory in `datamodels.ServerKeys`."""
+
+    def directory(self, cls, documents: list[dict]):
+        directory = cls(MagicMock(), "keys")
+        directory.db = MagicMock()
+
+        async def find(*args):
+            for document in documents:
+                yield document
+
+        directory.db.find = find
+        directory.db.find_one = AsyncMock()
+        directory.db.update_one = AsyncMock()
+        directory.db.delete_many = AsyncMock()
+        return directory
+
+    async def test_load_serves_keys_from_memory(self):
+        """Loaded keys are served without a query, documents without a key are skipped."""
+        directory = self.directory(
+            ServerKeys, [{"_id": 1, "key": "a"}, {"_id": 2, "key": ""}]
+        )
+        await directory.load()
+        self.assertEqual((await directory.get_server_key(1)).key, "a")
+        self.assertIsNone(await directory.get_server_key(2))
+        self.assertNotIn(2, directory)
+        directory.db.find_one.assert_not_awaited()
+
+    async def test_maple_keys_are_mapped_by_guild_field(self):
+        """Maple County keys are looked up by their guildId, not their _id."""
+        directory = self.directory(
+            MapleKeys, [{"_id": "x", "guildId": 1, "uniqueToken": "token"}]
+        )
+        await directory.load()
+        self.assertEqual((await directory.get_server_key(1)).key, "token")
+
+    async def test_writes_update_directory(self):
+        """Linking and unlinking through this process apply immediately."""
+        directory = self.directory(ServerKeys, [])
+        await directory.load()
+        await directory.upsert({"_id": 1, "key": "a"})
+        self.assertEqual((await directory.get_server_key(1)).key, "a")
+        await directory.delete_by_id(1)
+        self.assertIsNone(await directory.get_server_key(1))
+
+    async def test_change_stream_is_applied(self):
+        """Links, key changes and unlinks from other processes reach the directory."""
+        directory = self.directory(MapleKeys, [{"_id": "x", "guildId": 1, "uniqueToken": "old"}])
+        directory.db.watch = MagicMock(
+            side_effect=[
+                FakeChangeStream(
+                    [
+                        {"operationType": "insert", "fullDocument": {"_id": "y", "guildId": 2, "uniqueToken": "b"}},
+                        {"operationType": "update", "fullDocument": {"_id": "x", "guildId": 1, "uniqueToken": "new"}},
+                        {"operationType": "delete", "documentKey": {"_id": "y"}},
+                    ]
+                ),
+                asyncio.CancelledError(),
+            ]
+        )
+        with self.assertRaises(asyncio.CancelledError):
+            await directory.watch()
+        self.assertEqual((await directory.get_server_key(1)).key, "new")
+        self.assertNotIn(2, directory)
+
+
+def index_member(id: int, name: str, global_name: str | None = None, nick: str | None = None):
+    return SimpleNamespace(id=id, name=name, global_name=global_name, nick=nick)
+
+
+class GuildIndexTests(unittest.TestCase):
+    """Tests `utils.member_index.GuildIndex`."""
+
+    def setUp(self):
+        self.index = GuildIndex()
+        for member in (
+            index_member(1, "roblox", "Roblox", "Builderman"),
+            index_member(2, "roblox_fan"),
+            index_member(3, "robloxian", nick="ROBLOX"),
+            index_member(4, "someone"),
+        ):
+            self.index.add(member)
+
+    def test_exact_matches_come_first(self):
+        """Names are matched ignoring case, exact matches before prefix matches."""
+        found = self.index.find("RoBlOx", 5)
+        self.assertEqual(sorted(found[:2]), [1, 3])
+        self.assertEqual(sorted(found[2:]), [2])
+
+    def test_prefix_matches(self):
+        """A prefix matches every name starting with it, and nothing else."""
+        self.assertEqual(sorted(self.index.find("robloxi", 5)), [3])
+        self.assertEqual(self.index.find("build", 5), [1])
+        self.assertEqual(self.index.find("nobody", 5), [])
+
+    def test_limit(self):
+        """No more than `limit` members are returned."""
+        self.assertEqual(len(self.index.find("r", 2)), 2)
+
+    def test_rename_replaces_names(self):
+        """Re-adding a member drops the names it no longer has."""
+        self.index.add(index_member(4, "renamed"))
+        self.assertEqual(self.index.find("someone", 5), [])
+        self.assertEqual(self.index.find("renamed", 5), [4])
+
+    def test_remove(self):
+        """Removed members and names no one else has are gone from the index."""
+        self.index.remove(2)
+        self.index.remove(4)
+        self.assertEqual(sorted(self.index.find("roblox", 5)), [1, 3])
+        self.assertNotIn("someone", self.index.sorted_names)
+        self.assertEqual(self.index.sorted_names, sorted(self.index.members))
+
+    def test_bulk_load_matches_incremental(self):
+        """Indexing a guild at once gives the same index as adding members one by one."""
+        members = [index_member(i, f"user{i % 50}", nick=f"Nick{i}") for i in range(200)]
+        incremental = GuildIndex()
+        for member in members:
+            incremental.add(member)
+        bulk = GuildIndex.from_members(members)
+        self.assertEqual(bulk.members, incremental.members)
+        self.assertEqual(bulk.names, incremental.names)
+        self.assertEqual(bulk.sorted_names, incremental.sorted_names)
+
+
+class MemberIndexTests(unittest.IsolatedAsyncioTestCase):
+    """Tests `utils.member_index.MemberIndex`."""
+
+    def guild(self, chunked: bool):
+        members = {1: index_member(1, "roblox"), 2: index_member(2, "builderman")}
+        return SimpleNamespace(
+            id=10,
+            chunked=chunked,
+            members=list(members.values()),
+            get_member=members.get,
+            query_members=AsyncMock(return_value=[]),
+        )
+
+    async def test_find_in_chunked_guild(self):
+        """Chunked guilds are indexed on their first lookup, without a gateway search."""
+        index = MemberIndex(MagicMock())
+        guild = self.guild(chunked=True)
+        self.assertEqual([m.id for m in await index.find(guild, "Roblox")], [1])
+        guild.query_members.assert_not_awaited()
+        self.assertIn(10, index.guilds)
+
+    async def test_falls_back_to_gateway_search(self):
+        """Guilds whose members aren't cached are searched through the gateway."""
+        index = MemberIndex(MagicMock())
+        guild = self.guild(chunked=False)
+        await index.find(guild, "roblox", limit=3)
+        guild.query_members.assert_awaited_once_with(query="roblox", limit=3)
+        self.assertEqual(index.stats()["fallbacks"], 1)
+
+
+def legacy_has_role(settings: dict | None, field: str, member) -> bool:
+    # How the role checks read staff_management before the resolver
+    if not settings or settings["staff_management"].get(field, "") == "":
+        return False
+    roles = settings["staff_management"][field]
+    member_roles = [role.id for role in member.roles]
+    if isinstance(roles, list):
+        return any(role in member_roles for role in roles)
+    if isinstance(roles, int):
+        return roles in member_roles
+    return False
+
+
+def legacy_admin_check(settings, member) -> bool:
+    return (
+        legacy_has_role(settings, "admin_role", member)
+        or legacy_has_role(settings, "management_role", member)
+        or member.guild_permissions.administrator
+    )
+
+
+def legacy_staff_check(settings, member) -> bool:
+    return (
+        legacy_has_role(settings, "role", member)
+        or legacy_admin_check(settings, member)
+        or member.guild_permissions.manage_messages
+    )
+
+
+def legacy_management_check(settings, member) -> bool:
+    return (
+        legacy_has_role(settings, "management_role", member)
+        or member.guild_permissions.manage_guild
+    )
+
+
+class PermissionTests(unittest.IsolatedAsyncioTestCase):
+    """Tests `utils.permissions` against the role checks it replaced."""
+
+    SETTINGS = [
+        None,
+        {"staff_management": {}},
+        {"staff_management": {"role": "", "admin_role": "", "management_role": ""}},
+        {"staff_management": {"role": [1, 2], "admin_role": [3], "management_role": [4]}},
+        {"staff_management": {"role": 1, "admin_role": 3, "management_role": 4}},
+        # One role configured at several levels
+        {"staff_management": {"role": [1, 3], "admin_role": [3, 4], "management_role": 4}},
+    ]
+
+    def bot(self, settings):
+        async def get_staff_roles(guild_id):
+            return StaffRoles.compile(settings)
+
+        return SimpleNamespace(settings=SimpleNamespace(get_staff_roles=get_staff_roles))
+
+    def member(self, role_ids, administrator=False, manage_guild=False, manage_messages=False):
+        return SimpleNamespace(
+            roles=[SimpleNamespace(id=role_id) for role_id in role_ids],
+            guild_permissions=SimpleNamespace(
+                administrator=administrator,
+                manage_guild=manage_guild,
+                manage_messages=manage_messages,
+            ),
+        )
+
+    def test_compile(self):
+        """Admin roles count as staff, and management roles as both."""
+        roles = StaffRoles.compile(self.SETTINGS[3])
+        self.assertEqual(roles.role_ids, frozenset({1, 2, 3, 4}))
+        self.assertEqual(roles.grants[1], Permission.STAFF)
+        self.assertEqual(roles.grants[3], Permission.STAFF | Permission.ADMIN)
+        self.assertEqual(
+            roles.grants[4], Permission.STAFF | Permission.ADMIN | Permission.MANAGEMENT
+        )
+        self.assertEqual(StaffRoles.compile(None).role_ids, frozenset())
+        self.assertEqual(StaffRoles.compile(self.SETTINGS[2]).grants, {})
+
+    async def test_matches_legacy_checks(self):
+        """Every combination of roles and Discord permissions resolves like the old checks did."""
+        guild = SimpleNamespace(id=1)
+        role_sets = [[], [1], [2], [3], [4], [5], [1, 4], [2, 3]]
+        for settings, role_ids, flags in itertools.product(
+            self.SETTINGS, role_sets, itertools.product([False, True], repeat=3)
+        ):
+            member = self.member(role_ids, *flags)
+            permissions = await resolve_permissions(self.bot(settings), guild, member)
+            with self.subTest(settings=settings, roles=role_ids, flags=flags):
+                self.assertEqual(Permission.STAFF in permissions, legacy_staff_check(settings, member))
+                self.assertEqual(Permission.ADMIN in permissions, legacy_admin_check(settings, member))
+                self.assertEqual(
+                    Permission.MANAGEMENT in permissions, legacy_management_check(settings, member)
+                )
+
+    def test_permission_level(self):
+        """Management outranks staff in the synced permission level."""
+        self.assertEqual(permission_level(Permission.NONE), 0)
+        self.assertEqual(permission_level(Permission.STAFF | Permission.ADMIN), 1)
+        self.assertEqual(permission_level(Permission.MANAGEMENT), 2)
+
+    def test_dashboard_permission_level(self):
+        """The dashboard also sees admins, management still outranks them."""
+        self.assertEqual(permission_level(Permission.STAFF | Permission.ADMIN, include_admin=True), 3)
+        self.assertEqual(permission_level(Permission.STAFF, include_admin=True), 1)
+        self.assertEqual(permission_level(Permission.ADMIN | Permission.MANAGEMENT, include_admin=True), 2)
+
+
+class IndexReportTests(unittest.IsolatedAsyncioTestCase):
+    """Tests the index and query shape checks in `utils.mongo`."""
+
+    def document(self, explain: dict):
+        document = Document(MagicMock(), "test")
+        document.indexes = [MagicMock()]
+        document.query_shapes = [{"guild_id": 0}]
+        document.db = MagicMock()
+        document.db.name = "test"
+        document.db.create_indexes = AsyncMock()
+        document.db.find.return_value.explain = AsyncMock(return_value=explain)
+        return document
+
+    async def test_explain_time_series(self):
+        """Time series finds explain as an aggregation, their plan is under $cursor."""
+        document = self.document(
+            {
+                "stages": [
+                    {
+                        "$cursor": {
+                            "queryPlanner": {
+                                "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+                            }
+                        }
+                    },
+                    {"$_internalUnpackBucket": {}},
+                ]
+            }
+        )
+        report = await document.explain_query_shapes()
+        self.assertEqual(report[0]["stages"], ["FETCH", "IXSCAN"])
+        self.assertFalse(report[0]["collscan"])
+
+    async def test_failed_explain_does_not_stop_indexing(self):
+        """Collections after one whose explain fails still get their indexes."""
+        broken = self.document({"unexpected": True})
+        working = self.document({"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}})
+        with patch.dict(registered_documents, {("db", "a"): broken, ("db", "b"): working}, clear=True):
+            report = await ensure_registered_indexes()
+        broken.db.create_indexes.assert_awaited_once()
+        working.db.create_indexes.assert_awaited_once()
+        self.assertEqual([item["collscan"] for item in report], [True])
+
+
+class CircuitBreakerTests(unittest.IsolatedAsyncioTestCase):
+    """Tests the server key breakers in `utils.circuit_breaker`."""
+
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.upsert = AsyncMock()
+        self.collection.delete_by_id = AsyncMock()
+        self.breakers = CircuitBreakers(self.collection)
+
+    async def open(self, status: int, times: int = BREAKER_THRESHOLD):
+        for _ in range(times):
+            await self.breakers.record("key", status)
+
+    async def test_rejected_key_is_persisted(self):
+        """A revoked key opens a persisted breaker and gets no more requests."""
+        await self.open(403)
+        self.assertFalse(self.breakers.allow("key"))
+        self.assertEqual(self.breakers.rejection("key")[0], 403)
+        self.collection.upsert.assert_awaited_once()
+
+    async def test_offline_server_backoff_is_short(self):
+        """An offline server backs off for minutes at most and isn't persisted."""
+        await self.open(422, times=BREAKER_THRESHOLD + 10)
+        breaker = self.breakers.breakers["key"]
+        self.assertLessEqual(breaker.open_until - time.time(), BREAKER_OFFLINE_MAX_BACKOFF)
+        self.collection.upsert.assert_not_awaited()
+
+        await self.breakers.record("key", 200)
+        self.assertNotIn("key", self.breakers.breakers)
+        self.collection.delete_by_id.assert_not_awaited()
+
+    async def test_offline_after_rejection_starts_over(self):
+        """A rejected key that reaches its offline server drops the long backoff."""
+        await self.open(403)
+        await self.breakers.record("key", 422)
+        self.collection.delete_by_id.assert_awaited_once_with("key")
+        self.assertTrue(self.breakers.allow("key"))
+
+    async def test_user_request_probes_open_breaker(self):
+        """Commands still try a key whose breaker is open, without escalating it."""
+        await self.open(403)
+        open_until = self.breakers.breakers["key"].open_until
+
+        async def command():
+            user_request.set(True)
+            self.assertTrue(self.breakers.allow("key"))
+            await self.breakers.record("key", 403)
+
+        await asyncio.create_task(command())
+        self.assertEqual(self.breakers.breakers["key"].open_until, open_until)
+        self.assertFalse(self.breakers.allow("key"))
@@ -1,3 +1,5 @@
+import asyncio
+
 import discord
 
 
@@ -9,6 +11,29 @@ class Accounts:
         roblox_users = await self.bot.roblox.get_users_by_usernames(usernames, expand=False)
         return [user.id for user in roblox_users if user]
 
+    async def get_members(self, guild: discord.Guild, user_ids) -> dict[int, discord.Member]:
+        """
+        Members of `guild` by ID, fetching the ones that aren't cached in one
+        gateway request per 100. Users who aren't members are left out.
+        """
+        members, missing = {}, []
+        for user_id in {int(i) for i in user_ids}:
+            member = guild.get_member(user_id)
+            if member is not None:
+                members[user_id] = member
+            else:
+                missing.append(user_id)
+        for start in range(0, len(missing), 100):
+            try:
+                fetched = await guild.query_members(
+                    user_ids=missing[start : start + 100], limit=100
+                )
+            except (discord.HTTPException, asyncio.TimeoutError):
+                continue
+            for member in fetched:
+                members[member.id] = member
+        return members
+
     async def roblox_to_discord(self, guild: discord.Guild, username: str, roles: list[int] = None, roblox_user_id=None):
         bot = self.bot
 
@@ -19,18 +44,18 @@ class Accounts:
         else:
             roblox_id = roblox_user_id
         
-        linked_accounts = [i async for i in bot.oauth2_users.db.find({"roblox_id": roblox_id})]
-        for linked_account in linked_accounts: 
-            if guild.get_member(int(linked_account["discord_id"] or 0)):
-                return guild.get_member(int(linked_account["discord_id"] or 0))
+        linked_ids = (await bot.oauth2_users.get_discord_ids([roblox_id]))[int(roblox_id)]
+        for discord_id in linked_ids:
+            if guild.get_member(int(discord_id)):
+                return guild.get_member(int(discord_id))
             else:
                 try:
-                    return await guild.fetch_member(int(linked_account["discord_id"] or 0))
+                    return await guild.fetch_member(int(discord_id))
                 except discord.NotFound:
                     pass
 
-        # query members
-        members = await guild.query_members(username)
+        # match cached members by name
+        members = await bot.member_index.find(guild, username)
         if not members:
             return None
         
@@ -46,9 +71,8 @@ class Accounts:
         bot = self.bot
 
         # oauth2_users
-        linked_account = await bot.oauth2_users.db.find_one({"discord_id": user_id})
-        if linked_account:
-            roblox_id = linked_account["roblox_id"]
+        roblox_id = await bot.oauth2_users.get_roblox_id(user_id)
+        if roblox_id:
             roblox_user = await bot.roblox.get_user(roblox_id)
             return roblox_user.name
 
@@ -19,9 +19,6 @@ from erm import (
     management_predicate,
     is_staff,
     staff_predicate,
-    staff_check,
-    management_check,
-    admin_check,
 )
 from typing import Annotated
 from decouple import config
@@ -32,6 +29,8 @@ from utils.utils import get_elapsed_time, secure_logging
 from pydantic import BaseModel
 
 from utils.timestamp import td_format
+from utils.mongo_metrics import query_metrics
+from utils.permissions import permission_level, resolve_permissions
 from utils.utils import tokenGenerator, system_code_gen
 import logging
 
@@ -121,6 +120,54 @@ class APIRoutes:
 
         return {"guilds": guilds}
 
+    async def GET_mongo_metrics(self, authorization: Annotated[str | None, Header()]):
+        if not authorization:
+            raise HTTPException(status_code=401, detail="Invalid authorization")
+
+        if not await validate_authorization(self.bot, authorization):
+            raise HTTPException(
+                status_code=401, detail="Invalid or expired authorization."
+            )
+
+        return query_metrics.snapshot()
+
+    async def POST_reset_mongo_metrics(
+        self, authorization: Annotated[str | None, Header()]
+    ):
+        if not authorization:
+            raise HTTPException(status_code=401, detail="Invalid authorization")
+
+        if not await validate_authorization(self.bot, authorization):
+            raise HTTPException(
+                status_code=401, detail="Invalid or expired authorization."
+            )
+
+        query_metrics.reset()
+        return {"status": "ok"}
+
+    async def GET_prc_rate_limits(
+        self, authorization: Annotated[str | None, Header()]
+    ):
+        if not authorization:
+            raise HTTPException(status_code=401, detail="Invalid authorization")
+
+        if not await validate_authorization(self.bot, authorization):
+            raise HTTPException(
+                status_code=401, detail="Invalid or expired authorization."
+            )
+
+        return {
+            "buckets": self.bot.prc_api.rate_limit_state(),
+            "cache": self.bot.prc_api.cache_stats(),
+            "snapshots": self.bot.snapshots.stats(),
+            "commands": self.bot.prc_api.commands.stats(),
+            "breakers": self.bot.breakers.stats(),
+            "sync_outbox": await self.bot.sync_dispatcher.stats(),
+            "roblox_identity": self.bot.identity.stats(),
+            "member_index": self.bot.member_index.stats(),
+            "bloxlink": self.bot.bloxlink.stats(),
+        }
+
     async def GET_shard_pings(self, authorization: Annotated[str | None, Header()]):
         if not authorization:
             raise HTTPException(status_code=401, detail="Invalid authorization")
@@ -863,21 +910,18 @@ class APIRoutes:
                     if user is None:
                         return None
 
-                    permission_level = 0
-                    if await management_check(self.bot, guild, user):
-                        permission_level = 2
-                    elif await admin_check(self.bot, guild, user):
-                        permission_level = 3
-                    elif await staff_check(self.bot, guild, user):
-                        permission_level = 1
-                        
-                    if permission_level > 0:
+                    level = permission_level(
+                        await resolve_permissions(self.bot, guild, user),
+                        include_admin=True,
+                    )
+
+                    if level > 0:
                         return {
                             "id": str(guild.id),
                             "name": str(guild.name),
                             "member_count": str(guild.member_count),
                             "icon_url": icon,
-                            "permission_level": permission_level,
+                            "permission_level": level,
                         }
                     return None
                 except Exception as e:
@@ -927,15 +971,10 @@ class APIRoutes:
             except (discord.Forbidden, discord.HTTPException):
                 return {"permission_level": 0}
 
-        permission_level = 0
-        if await management_check(self.bot, guild, user):
-            permission_level = 2
-        elif await admin_check(self.bot, guild, user):
-            permission_level = 3
-        elif await staff_check(self.bot, guild, user):
-            permission_level = 1
-
-        return {"permission_level": permission_level}
+        level = permission_level(
+            await resolve_permissions(self.bot, guild, user), include_admin=True
+        )
+        return {"permission_level": level}
 
     async def POST_get_guild_settings(self, request: Request):
         json_data = await request.json()
@@ -1804,7 +1843,7 @@ class APIRoutes:
             active_loas = set()
             if omit_loas:
                 current_time = datetime.datetime.now(tz=pytz.UTC).timestamp()
-                async for loa in self.bot.loas.db.find(
+                async for loa in self.bot.loas.analytics.find(
                     {
                         "guild_id": guild_id,
                         "accepted": True,
@@ -1853,7 +1892,7 @@ class APIRoutes:
                                 "skipped_loa": False,
                             }
 
-            async for shift_doc in self.bot.shift_management.shifts.db.find(
+            async for shift_doc in self.bot.shift_management.shifts.analytics.find(
                 {"Guild": guild_id, "EndEpoch": {"$gt": start_time, "$lt": end_time}}
             ):
                 member_id = shift_doc["UserID"]
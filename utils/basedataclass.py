@@ -1,4 +1,166 @@
+MISSING = object()
+
+
 class BaseDataClass:
     def __init__(self, *args, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
+
+
+class field:
+    """
+    Describes where a record attribute comes from in a source mapping.
+
+    Params:
+     - key (str) : key in the source mapping
+     - convert (callable) : applied to the raw value
+     - default : used when the key is missing, makes the key optional
+    """
+
+    __slots__ = ("key", "convert", "default")
+
+    def __init__(self, key: str, convert=None, default=MISSING):
+        self.key = key
+        self.convert = convert
+        self.default = default
+
+
+class split:
+    """
+    Fills two record attributes from one source value split once on
+    `separator`, e.g. "Username:123" -> username="Username", user_id="123".
+    Map it to a tuple of attribute names: {("username", "user_id"): split("Player")}
+
+    Params:
+     - key (str) : key in the source mapping
+     - separator (str) : split on the first occurrence only
+     - missing : value of the second attribute when the separator is absent;
+       by default it is an empty string
+    """
+
+    __slots__ = ("key", "separator", "missing")
+
+    def __init__(self, key: str, separator: str = ":", missing=MISSING):
+        self.key = key
+        self.separator = separator
+        self.missing = missing
+
+
+def _compile(namespace: dict, source: str, name: str):
+    exec(compile(source, f"<record {name}>", "exec"), namespace)
+    return namespace[name]
+
+
+def _build_constructor(cls, mapping: dict, name: str):
+    """
+    Generates `cls.<name>(source)` that reads every mapped key with direct
+    subscripts, so decoding a record is a single call without any loops, and
+    `cls.<name>_list(sources)` that decodes a whole list in one comprehension.
+    """
+    namespace = {"MISSING": MISSING}
+    arguments = []
+    for index, (attribute, spec) in enumerate(mapping.items()):
+        if isinstance(spec, split):
+            # Split once, the first attribute binds the parts for the second
+            parts = f"_parts_{index}"
+            namespace[f"_separator_{index}"] = spec.separator
+            first, second = attribute
+            arguments.append(
+                f"{first}=({parts} := source[{spec.key!r}].partition(_separator_{index}))[0]"
+            )
+            value = f"{parts}[2]"
+            if spec.missing is not MISSING:
+                namespace[f"_missing_{index}"] = spec.missing
+                value = f"({value} if {parts}[1] else _missing_{index})"
+            arguments.append(f"{second}={value}")
+            continue
+        if isinstance(spec, str):
+            spec = field(spec)
+        if spec.default is MISSING:
+            value = f"source[{spec.key!r}]"
+        else:
+            namespace[f"_default_{index}"] = spec.default
+            value = f"source.get({spec.key!r}, _default_{index})"
+        if spec.convert is not None:
+            namespace[f"_convert_{index}"] = spec.convert
+            value = f"_convert_{index}({value})"
+        arguments.append(f"{attribute}={value}")
+
+    namespace["cls"] = cls
+    call = f"cls({', '.join(arguments)})"
+    source = (
+        f"def {name}(source):\n    return {call}\n"
+        f"def {name}_list(sources):\n    return [{call} for source in sources]\n"
+    )
+    _compile(namespace, source, name)
+    return staticmethod(namespace[name]), staticmethod(namespace[f"{name}_list"])
+
+
+class RecordMeta(type):
+    """
+    Turns annotated class attributes into `__slots__` and generates the
+    `__init__`, `__repr__` and decoder methods for them.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        annotations = namespace.get("__annotations__", {})
+        inherited = tuple(
+            f for base in bases for f in getattr(base, "__fields__", ())
+        )
+        own = tuple(f for f in annotations if f not in inherited)
+        defaults = {}
+        for base in bases:
+            defaults.update(getattr(base, "__field_defaults__", {}))
+        for f in own:
+            if f in namespace:
+                defaults[f] = namespace.pop(f)
+
+        namespace["__slots__"] = own
+        namespace["__fields__"] = inherited + own
+        namespace["__field_defaults__"] = defaults
+        cls = super().__new__(mcs, name, bases, namespace)
+
+        fields = cls.__fields__
+        if fields:
+            env = {}
+            parameters = []
+            for f in fields:
+                if f in defaults:
+                    env[f"_default_{f}"] = defaults[f]
+                    parameters.append(f"{f}=_default_{f}")
+                else:
+                    parameters.append(f)
+            body = "".join(f"    self.{f} = {f}\n" for f in fields)
+            cls.__init__ = _compile(
+                env,
+                f"def __init__(self, *, {', '.join(parameters)}):\n{body}",
+                "__init__",
+            )
+
+        if "document_fields" in namespace:
+            cls.from_document, cls.from_document_list = _build_constructor(
+                cls, namespace["document_fields"], "from_document"
+            )
+        if "api_fields" in namespace:
+            cls.from_api, cls.from_api_list = _build_constructor(
+                cls, namespace["api_fields"], "from_api"
+            )
+        return cls
+
+
+class Record(metaclass=RecordMeta):
+    """
+    Slotted replacement for BaseDataClass. Annotated attributes become slots,
+    so instances carry no `__dict__`.
+
+    Subclasses may declare `document_fields` and/or `api_fields`, mapping each
+    attribute to a source key (or a `field`, or a tuple of attributes to a `split`),
+    to get `from_document(document)` and `from_api(item)` constructors generated
+    for them, plus `from_document_list` / `from_api_list` for whole lists.
+    """
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{f}={getattr(self, f, None)!r}" for f in self.__fields__
+        )
+        return f"{type(self).__name__}({values})"
@@ -1,41 +1,142 @@
+import asyncio
+import time
+
 import discord
 from discord.ext import commands
 import aiohttp
+from decouple import config
+
+from utils.cache import MISSING, TTLCache
+from utils.fast_json import read_json
+from utils.rate_limiter import TokenBucket
+
+# Seconds a found Discord -> Roblox link, or a Roblox profile, is reused
+BLOXLINK_CACHE_TTL = int(config("BLOXLINK_CACHE_TTL", default=600))
+# Seconds a user without a Bloxlink link is remembered as unlinked
+BLOXLINK_NEGATIVE_TTL = int(config("BLOXLINK_NEGATIVE_TTL", default=120))
+# Seconds a failed lookup (rate limited, server or connection error) is not retried
+BLOXLINK_FAILURE_TTL = int(config("BLOXLINK_FAILURE_TTL", default=15))
+BLOXLINK_CACHE_SIZE = int(config("BLOXLINK_CACHE_SIZE", default=50000))
+# Requests to Bloxlink in flight at once
+BLOXLINK_MAX_IN_FLIGHT = int(config("BLOXLINK_MAX_IN_FLIGHT", default=10))
+
+BLOXLINK_TIMEOUT = aiohttp.ClientTimeout(total=10)
 
 
 class Bloxlink:
     def __init__(self, bot: commands.Bot, key: str):
         self.api_key = key
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(timeout=BLOXLINK_TIMEOUT)
         bot.external_http_sessions.append(self.session)
         self.bot = bot
+        # discord id -> {"robloxID": ...} or {} when unlinked
+        self.links = TTLCache(ttl=BLOXLINK_CACHE_TTL, max_size=BLOXLINK_CACHE_SIZE)
+        # roblox id -> users.roblox.com profile
+        self.profiles = TTLCache(ttl=BLOXLINK_CACHE_TTL, max_size=BLOXLINK_CACHE_SIZE)
+        self.bucket = TokenBucket("bloxlink")
+        self.semaphore = asyncio.Semaphore(BLOXLINK_MAX_IN_FLIGHT)
+        self._in_flight: dict[tuple[str, int], asyncio.Future] = {}
+        self.requests = 0
+        self.failures = 0
+
+    def _update_bucket(self, headers):
+        """
+        Syncs the bucket with Bloxlink's rate limit headers. The reset is sent
+        either as seconds until the window resets or as a unix timestamp.
+        """
+        limit = headers.get("X-RateLimit-Limit") or headers.get("RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining") or headers.get(
+            "RateLimit-Remaining"
+        )
+        reset = headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+        if limit is None or remaining is None or reset is None:
+            return
+        try:
+            reset = float(reset)
+            self.bucket.update(
+                int(limit),
+                int(remaining),
+                reset if reset > 1e9 else time.time() + reset,
+            )
+        except ValueError:
+            pass
 
     async def _send_request(self, method, url, params=None, body=None):
-        async with self.session.request(
-            method, url, params=params, headers={"Authorization": self.api_key}
-        ) as resp:
-            return (resp, await resp.json())
+        # Waiting for the rate limit doesn't take an in-flight slot
+        await self.bucket.acquire()
+        async with self.semaphore:
+            self.requests += 1
+            async with self.session.request(
+                method, url, params=params, headers={"Authorization": self.api_key}
+            ) as resp:
+                self._update_bucket(resp.headers)
+                if resp.status == 429:
+                    self.bucket.exhaust(float(resp.headers.get("Retry-After", 1)))
+                return (resp, await read_json(resp))
+
+    async def _coalesced(self, kind: str, id: int, fetch):
+        # Concurrent lookups of the same user share one request
+        future = self._in_flight.get((kind, id))
+        if future is None:
+            future = self._in_flight[(kind, id)] = asyncio.ensure_future(fetch(id))
+            future.add_done_callback(lambda _: self._in_flight.pop((kind, id), None))
+        return await asyncio.shield(future)
 
     async def find_roblox(self, user_id: int):
-        doc = await self.bot.oauth2_users.db.find_one({"discord_id": user_id})
-        if doc:
-            return {"robloxID": doc["roblox_id"]}
+        roblox_id = await self.bot.oauth2_users.get_roblox_id(user_id)
+        if roblox_id:
+            return {"robloxID": roblox_id}
 
-        response, resp_json = await self._send_request(
-            "GET", f"https://api.blox.link/v4/public/discord-to-roblox/{user_id}"
-        )
+        link = self.links.get(int(user_id))
+        if link is MISSING:
+            link = await self._coalesced("link", int(user_id), self._fetch_link)
+        return link
+
+    async def _fetch_link(self, user_id: int) -> dict:
+        try:
+            response, resp_json = await self._send_request(
+                "GET", f"https://api.blox.link/v4/public/discord-to-roblox/{user_id}"
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.failures += 1
+            self.links.set(user_id, {}, BLOXLINK_FAILURE_TTL)
+            return {}
 
-        if resp_json.get("error"):
+        if response.status == 429 or response.status >= 500:
+            self.failures += 1
+            self.links.set(user_id, {}, BLOXLINK_FAILURE_TTL)
+            return {}
+        if not isinstance(resp_json, dict) or resp_json.get("error"):
+            self.links.set(user_id, {}, BLOXLINK_NEGATIVE_TTL)
             return {}
-        else:
-            return resp_json
+        self.links.set(user_id, resp_json)
+        return resp_json
 
     async def get_roblox_info(self, user_id: int):
         if not user_id:
             return {}
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://users.roblox.com/v1/users/{}".format(user_id)
-            ) as resp:
-                return await resp.json()
+        profile = self.profiles.get(int(user_id))
+        if profile is MISSING:
+            profile = await self._coalesced("profile", int(user_id), self._fetch_profile)
+        return profile
+
+    async def _fetch_profile(self, user_id: int):
+        async with self.session.get(
+            "https://users.roblox.com/v1/users/{}".format(user_id)
+        ) as resp:
+            profile = await read_json(resp)
+        if resp.status == 200:
+            self.profiles.set(user_id, profile)
+        elif resp.status == 404:
+            self.profiles.set(user_id, profile, BLOXLINK_NEGATIVE_TTL)
+        return profile
+
+    def stats(self) -> dict:
+        return {
+            "links": self.links.stats(),
+            "profiles": self.profiles.stats(),
+            "requests": self.requests,
+            "failures": self.failures,
+            "bucket": self.bucket.state(),
+        }
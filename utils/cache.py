@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+
+"""
+Small in-process caches used to keep hot lookups away from
+Mongo and the external APIs. Entries expire after a TTL and
+the least recently used entries are evicted once the cache is full.
+"""
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl: float, max_size: int = 10000):
+        """
+        Params:
+         - ttl (float) : Default lifetime of an entry, in seconds
+         - max_size (int) : Maximum amount of entries kept before evicting
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key, default=MISSING):
+        """
+        Returns the value stored under `key`, or `default` if it
+        is not cached or has expired. Cached `None` values are
+        returned as-is, so compare against `MISSING` to tell them apart.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        """
+        Stores `value` under `key` for `ttl` seconds (or the cache default).
+        """
+        self._entries[key] = (
+            value,
+            time.monotonic() + (ttl if ttl is not None else self.ttl),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] >= time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
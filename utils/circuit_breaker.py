@@ -0,0 +1,197 @@
+import contextvars
+import logging
+import time
+
+from decouple import config
+
+from utils.basedataclass import Record, field
+
+"""
+Circuit breakers for server keys. A key that keeps getting rejected (revoked,
+invalid or prohibited) is not sent any more requests; every task skips its guild
+until a probe request gets through again. Probes are spaced out with an
+exponential backoff, and the state is persisted so a restart doesn't start
+hammering dead keys again.
+
+A server that is offline or has no players (422) is not a dead key: its breaker
+backs off for a few minutes at most and is kept in memory only. Requests made for
+a user's command always go through, so a key fixed or a server started since is
+picked up right away.
+"""
+
+# Consecutive rejections that open the breaker of a key
+BREAKER_THRESHOLD = int(config("BREAKER_THRESHOLD", default=3))
+# Seconds until the first probe after opening, doubled every time a probe fails
+BREAKER_BASE_BACKOFF = int(config("BREAKER_BASE_BACKOFF", default=300))
+BREAKER_MAX_BACKOFF = int(config("BREAKER_MAX_BACKOFF", default=86400))
+# A probe that never reports back frees the slot after this many seconds
+PROBE_TIMEOUT = 60
+
+# Seconds until the first probe of an offline server, doubled up to OFFLINE_MAX_BACKOFF
+BREAKER_OFFLINE_BACKOFF = int(config("BREAKER_OFFLINE_BACKOFF", default=30))
+BREAKER_OFFLINE_MAX_BACKOFF = int(config("BREAKER_OFFLINE_MAX_BACKOFF", default=300))
+
+REJECTED_STATUSES = {401, 403}
+OFFLINE_STATUSES = {422}
+
+# Set while a user's command is being handled, see erm.py
+user_request: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "user_request", default=False
+)
+
+
+class Breaker(Record):
+    key: str
+    failures: int = 0
+    # Times the breaker opened in a row, drives the backoff
+    opened: int = 0
+    open_until: float = 0.0
+    last_status: int = 0
+    probe_until: float = 0.0
+    # Whether a document of this breaker is stored
+    persisted: bool = False
+
+    document_fields = {
+        "key": "_id",
+        "failures": field("Failures", default=0),
+        "opened": field("Opened", default=0),
+        "open_until": field("ProhibitedUntil", default=0.0),
+        "last_status": field("LastStatus", default=0),
+    }
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= BREAKER_THRESHOLD
+
+    @property
+    def is_offline(self) -> bool:
+        return self.last_status in OFFLINE_STATUSES
+
+
+class CircuitBreakers:
+    def __init__(self, collection):
+        """
+        Params:
+         - collection (ProhibitedUseKeys) : Where breaker state is persisted, keyed by server key
+        """
+        self.collection = collection
+        self.breakers: dict[str, Breaker] = {}
+        self.rejected = 0
+        self.logger = logging.getLogger(__name__)
+
+    async def load(self):
+        """
+        Loads the persisted breakers, called once on startup.
+        """
+        # Offline servers used to be persisted with the long backoff
+        await self.collection.db.delete_many(
+            {"LastStatus": {"$in": list(OFFLINE_STATUSES)}}
+        )
+        async for document in self.collection.db.find({}):
+            breaker = Breaker.from_document(document)
+            breaker.persisted = True
+            self.breakers[breaker.key] = breaker
+        self.logger.info(f"Loaded {len(self.breakers)} server key breakers.")
+
+    def allow(self, key: str) -> bool:
+        """
+        Whether a request may be sent with `key`. While a breaker is open only one
+        probe is let through once its backoff has passed, besides requests made for
+        a user's command.
+        """
+        breaker = self.breakers.get(key)
+        if breaker is None or not breaker.is_open or user_request.get():
+            return True
+        now = time.time()
+        if breaker.open_until <= now and breaker.probe_until <= now:
+            breaker.probe_until = now + PROBE_TIMEOUT
+            return True
+        self.rejected += 1
+        return False
+
+    def rejection(self, key: str) -> tuple[int, dict]:
+        """
+        The response given for requests that were not sent because the breaker is open.
+        """
+        breaker = self.breakers[key]
+        return breaker.last_status, {
+            "error": "Server key rejected, retrying later",
+            "retry_at": breaker.open_until,
+        }
+
+    async def record(self, key: str, status: int):
+        """
+        Records the status of a response to a request sent with `key`.
+        """
+        if status in REJECTED_STATUSES or status in OFFLINE_STATUSES:
+            await self._failure(key, status)
+        elif 200 <= status < 300 and key in self.breakers:
+            await self._success(key)
+
+    async def _failure(self, key: str, status: int):
+        offline = status in OFFLINE_STATUSES
+        breaker = self.breakers.get(key)
+        if breaker is not None and breaker.is_offline != offline:
+            # An offline server's key got rejected, or a rejected key now reaches
+            # its server: start counting again
+            await self._success(key)
+            breaker = None
+        if breaker is None:
+            breaker = self.breakers[key] = Breaker(key=key)
+        now = time.time()
+        if user_request.get() and breaker.is_open and breaker.open_until > now:
+            # Commands don't wait for the backoff, so they don't escalate it either
+            breaker.last_status = status
+            return
+        breaker.failures += 1
+        breaker.last_status = status
+        breaker.probe_until = 0.0
+        if not breaker.is_open:
+            return
+
+        breaker.opened += 1
+        if offline:
+            backoff = min(
+                BREAKER_OFFLINE_BACKOFF * 2 ** (breaker.opened - 1),
+                BREAKER_OFFLINE_MAX_BACKOFF,
+            )
+        else:
+            backoff = min(
+                BREAKER_BASE_BACKOFF * 2 ** (breaker.opened - 1), BREAKER_MAX_BACKOFF
+            )
+        breaker.open_until = now + backoff
+        self.logger.info(
+            f"Breaker for a server key opened after {status}, probing again in {backoff}s"
+        )
+        if offline:
+            return
+        try:
+            await self.collection.upsert(
+                {
+                    "_id": key,
+                    "Failures": breaker.failures,
+                    "Opened": breaker.opened,
+                    "ProhibitedUntil": breaker.open_until,
+                    "LastStatus": status,
+                }
+            )
+            breaker.persisted = True
+        except Exception as e:
+            self.logger.warning(f"Failed to persist breaker state: {e}")
+
+    async def _success(self, key: str):
+        breaker = self.breakers.pop(key)
+        if breaker.opened:
+            self.logger.info("Breaker for a server key closed, its probe succeeded")
+        if breaker.persisted:
+            try:
+                await self.collection.delete_by_id(key)
+            except Exception as e:
+                self.logger.warning(f"Failed to persist breaker state: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self.breakers),
+            "open": sum(breaker.is_open for breaker in self.breakers.values()),
+            "rejected": self.rejected,
+        }
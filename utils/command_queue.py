@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+from decouple import config
+
+from utils.cache import TTLCache
+
+"""
+Outbound in-game commands of every guild go through one queue per guild, drained
+by a single worker that sends as fast as the PRC command bucket allows. While
+waiting, PMs with the same message are merged into one command, identical
+commands are collapsed, and moderation commands jump ahead of notices.
+"""
+
+# Seconds a sent command (or a PM to a player) is remembered; repeats in that window are dropped
+COMMAND_DEDUPE_WINDOW = int(config("PRC_COMMAND_DEDUPE_WINDOW", default=30))
+# Longest command a merged PM may grow to before a new one is started
+MAX_COMMAND_LENGTH = int(config("PRC_MAX_COMMAND_LENGTH", default=1000))
+
+# Lower is sent first
+PRIORITY_MODERATION = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_NOTICE = 2
+
+MODERATION_COMMANDS = {
+    "ban", "unban", "kick", "pban", "tban",
+    "mod", "unmod", "admin", "unadmin", "helper", "unhelper",
+    "jail", "unjail", "kill", "load", "respawn", "wanted", "unwanted",
+}
+NOTICE_COMMANDS = {"pm", "m", "h", "message", "hint"}
+
+
+def command_priority(command: str) -> int:
+    verb = command.lstrip(":").split(" ", 1)[0].lower()
+    if verb in MODERATION_COMMANDS:
+        return PRIORITY_MODERATION
+    if verb in NOTICE_COMMANDS:
+        return PRIORITY_NOTICE
+    return PRIORITY_DEFAULT
+
+
+def parse_pm(command: str) -> tuple[list[str], str] | None:
+    """
+    Splits ":pm user1,user2 message" into (["user1", "user2"], "message").
+    Returns None for anything that isn't a PM.
+    """
+    parts = command.split(" ", 2)
+    if len(parts) != 3 or parts[0].lower() != ":pm":
+        return None
+    return [name for name in parts[1].split(",") if name], parts[2]
+
+
+def _retrieve_exception(future: asyncio.Future):
+    # Fire-and-forget callers never await their future; failures are logged by the worker
+    if not future.cancelled():
+        future.exception()
+
+
+class QueuedCommand:
+    __slots__ = ("priority", "sequence", "command", "message", "targets", "futures")
+
+    def __init__(self, priority: int, sequence: int, command: str | None = None, message: str | None = None):
+        self.priority = priority
+        self.sequence = sequence
+        self.command = command
+        # Only set for PMs, whose targets can still grow while queued
+        self.message = message
+        self.targets: dict[str, str] = {}
+        self.futures: list[asyncio.Future] = []
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    def render(self) -> str:
+        if self.message is None:
+            return self.command
+        return f":pm {','.join(self.targets.values())} {self.message}"
+
+
+class GuildCommandQueue:
+    def __init__(self):
+        self.heap: list[QueuedCommand] = []
+        # Commands still waiting to be sent, by dedupe key
+        self.pending: dict[tuple, QueuedCommand] = {}
+        self.worker: asyncio.Task | None = None
+
+
+class CommandDispatcher:
+    def __init__(self, client):
+        """
+        Params:
+         - client (PRCApiClient) : The client commands are sent with
+        """
+        self.client = client
+        self.queues: dict[int, GuildCommandQueue] = {}
+        # (guild id, command) or (guild id, pm message, lowercase username) -> True
+        self.recent = TTLCache(ttl=COMMAND_DEDUPE_WINDOW, max_size=50000)
+        self._sequence = itertools.count()
+        self.sent = 0
+        self.merged = 0
+        self.deduplicated = 0
+        self.logger = logging.getLogger(__name__)
+
+    def enqueue(self, guild_id: int, command: str, priority: int | None = None) -> asyncio.Future:
+        """
+        Queues a command for a guild's server and returns a future resolving to
+        the (status code, json) of the request that carried it. Awaiting it is optional.
+        Params:
+         - guild_id (int) : The guild whose server runs the command
+         - command (str) : e.g. ":pm user1,user2 Hello!"
+         - priority (int) : PRIORITY_*; inferred from the command by default
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve_exception)
+        priority = command_priority(command) if priority is None else priority
+        queue = self.queues.setdefault(guild_id, GuildCommandQueue())
+
+        pm = parse_pm(command)
+        if pm is not None:
+            self._enqueue_pm(guild_id, queue, priority, *pm, future)
+        else:
+            self._enqueue_command(guild_id, queue, priority, command, future)
+
+        if not future.done() and (queue.worker is None or queue.worker.done()):
+            queue.worker = asyncio.create_task(self._drain(guild_id, queue))
+        return future
+
+    def _enqueue_command(self, guild_id: int, queue: GuildCommandQueue, priority: int, command: str, future: asyncio.Future):
+        if (guild_id, command) in self.recent:
+            self.deduplicated += 1
+            future.set_result((200, {}))
+            return
+        entry = queue.pending.get((command,))
+        if entry is None:
+            entry = queue.pending[(command,)] = QueuedCommand(
+                priority, next(self._sequence), command=command
+            )
+            heapq.heappush(queue.heap, entry)
+        else:
+            self.deduplicated += 1
+        entry.futures.append(future)
+
+    def _enqueue_pm(self, guild_id: int, queue: GuildCommandQueue, priority: int, usernames: list[str], message: str, future: asyncio.Future):
+        usernames = [
+            name for name in usernames
+            if (guild_id, message, name.lower()) not in self.recent
+        ]
+        if not usernames:
+            self.deduplicated += 1
+            future.set_result((200, {}))
+            return
+
+        entry = queue.pending.get(("pm", message))
+        if entry is not None:
+            self.merged += 1
+            # Merging can only raise the priority of the queued PM
+            if priority < entry.priority:
+                entry.priority = priority
+                heapq.heapify(queue.heap)
+        for name in usernames:
+            if entry is not None and name.lower() in entry.targets:
+                continue
+            if entry is None or len(entry.render()) + len(name) + 1 > MAX_COMMAND_LENGTH:
+                entry = queue.pending[("pm", message)] = QueuedCommand(
+                    priority, next(self._sequence), message=message
+                )
+                heapq.heappush(queue.heap, entry)
+            entry.targets[name.lower()] = name
+            if future not in entry.futures:
+                entry.futures.append(future)
+        # Every target was already queued
+        if future not in entry.futures:
+            entry.futures.append(future)
+
+    async def _drain(self, guild_id: int, queue: GuildCommandQueue):
+        while queue.heap:
+            entry = heapq.heappop(queue.heap)
+            key = ("pm", entry.message) if entry.message is not None else (entry.command,)
+            if queue.pending.get(key) is entry:
+                del queue.pending[key]
+
+            command = entry.render()
+            try:
+                # Waits on the server key's command bucket, so this is the rate PRC allows
+                result = await self.client._send_api_request(
+                    "POST", "/server/command", guild_id, data={"command": command}
+                )
+            except Exception as e:
+                self.logger.warning(f"Failed to run {command!r} in {guild_id}: {e}")
+                for future in entry.futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.sent += 1
+            if result[0] == 200:
+                if entry.message is None:
+                    self.recent.set((guild_id, command), True)
+                else:
+                    for name in entry.targets:
+                        self.recent.set((guild_id, entry.message, name), True)
+            else:
+                self.logger.info(f"{command!r} in {guild_id} returned {result[0]}")
+            for future in entry.futures:
+                if not future.done():
+                    future.set_result(result)
+
+        self.queues.pop(guild_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self.queues),
+            "queued": sum(len(queue.heap) for queue in self.queues.values()),
+            "sent": self.sent,
+            "merged": self.merged,
+            "deduplicated": self.deduplicated,
+        }
@@ -0,0 +1,46 @@
+import json
+import logging
+
+from decouple import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+JSON decoding for the external API clients. Responses are read as raw bytes
+and decoded by the fastest available decoder, chosen with JSON_DECODER
+("orjson" or "json"); orjson is optional and the standard library is the
+fallback when it isn't installed.
+"""
+
+DECODERS = {"json": json.loads}
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+
+JSON_DECODER = config("JSON_DECODER", default="orjson")
+if JSON_DECODER not in DECODERS:
+    logging.getLogger(__name__).warning(
+        f"JSON decoder {JSON_DECODER!r} is not available, falling back to json"
+    )
+    JSON_DECODER = "json"
+
+# Accepts bytes or str
+loads = DECODERS[JSON_DECODER]
+
+
+async def read_json(response, default=None):
+    """
+    Decodes an aiohttp response body with `loads`. HTML error pages and empty
+    bodies decode to `default` ({} unless given).
+    Params:
+     - response (aiohttp.ClientResponse) : The response to read
+     - default : Returned when there is no JSON to decode
+    """
+    if response.content_type == "text/html":
+        return {} if default is None else default
+    body = await response.read()
+    if not body:
+        return {} if default is None else default
+    return loads(body)
@@ -1,21 +1,84 @@
-from collections import defaultdict
+import asyncio
+import logging
+
+from decouple import config
 from discord.ext import commands
 
+# Seconds cursor updates are gathered before they are written in one batch
+LOG_CURSOR_FLUSH_DELAY = int(config("LOG_CURSOR_FLUSH_DELAY", default=10))
+
 
 class LogTracker:
+    """
+    Tracks the last processed timestamp of every log type per guild. The cursors
+    are persisted in bot.log_cursors, so a restart (or another process) resumes
+    where processing stopped instead of skipping everything before its start.
+    Guilds are loaded on first use, and updates are written in debounced batches.
+    """
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # Initialize last_timestamps with a starting time
-        self.last_timestamps = defaultdict(
-            lambda: defaultdict(lambda: int(self.bot.start_time))
-        )
+        # guild id -> {log type: timestamp}, only for guilds that have been loaded
+        self.last_timestamps: dict[int, dict[str, int]] = {}
+        # guild id -> {log type: timestamp} not yet written
+        self._dirty: dict[int, dict[str, int]] = {}
+        self._loading: dict[int, asyncio.Task] = {}
+        self._flush_task: asyncio.Task | None = None
+        self.logger = logging.getLogger(__name__)
+
+    async def _load(self, guild_id: int) -> dict[str, int]:
+        cursors = await self.bot.log_cursors.load(guild_id)
+        # Updates not written yet are newer than what was persisted
+        for log_type, timestamp in self._dirty.get(guild_id, {}).items():
+            cursors[log_type] = max(timestamp, cursors.get(log_type, 0))
+        self.last_timestamps[guild_id] = cursors
+        return cursors
 
-    def get_last_timestamp(self, guild_id: int, log_type: str) -> int:
+    async def get_last_timestamp(self, guild_id: int, log_type: str) -> int:
         # Get the last timestamp for the given guild and log type
-        return self.last_timestamps[guild_id][log_type]
+        if guild_id not in self.last_timestamps:
+            task = self._loading.get(guild_id)
+            if task is None:
+                task = self._loading[guild_id] = asyncio.create_task(
+                    self._load(guild_id)
+                )
+            try:
+                await task
+            finally:
+                self._loading.pop(guild_id, None)
+        # Log types never processed before start at the bot's start
+        return self.last_timestamps[guild_id].get(log_type, int(self.bot.start_time))
 
     def update_timestamp(self, guild_id: int, log_type: str, timestamp: int):
         # Update the timestamp if the provided one is more recent
-        self.last_timestamps[guild_id][log_type] = max(
-            timestamp, self.last_timestamps[guild_id][log_type]
-        )
+        cursors = self.last_timestamps.get(guild_id)
+        if cursors is not None:
+            if timestamp <= cursors.get(log_type, 0):
+                return
+            cursors[log_type] = timestamp
+        pending = self._dirty.setdefault(guild_id, {})
+        pending[log_type] = max(timestamp, pending.get(log_type, 0))
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(LOG_CURSOR_FLUSH_DELAY)
+        await self.flush()
+
+    async def flush(self):
+        """
+        Writes every pending cursor update in one batch. Failed writes are
+        kept and retried with the next batch.
+        """
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        try:
+            await self.bot.log_cursors.save(dirty)
+        except Exception as e:
+            self.logger.warning(f"Failed to persist log cursors: {e}")
+            for guild_id, timestamps in dirty.items():
+                pending = self._dirty.setdefault(guild_id, {})
+                for log_type, timestamp in timestamps.items():
+                    pending[log_type] = max(timestamp, pending.get(log_type, 0))
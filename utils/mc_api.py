@@ -2,6 +2,7 @@ import asyncio
 import typing
 import aiohttp
 from datamodels.ServerKeys import ServerKey
+from utils.fast_json import read_json
 from utils.prc_api import ResponseFailure, ServerStatus, Player, CommandLog, BanItem
 
 
@@ -34,6 +35,8 @@ class MCApiClient:
                 return 401, {}
             else:
                 internal_server_key = internal_server_key.key
+            if not self.bot.breakers.allow(internal_server_key):
+                return self.bot.breakers.rejection(internal_server_key)
         else:
             internal_server_key = key
 
@@ -48,7 +51,7 @@ class MCApiClient:
             json=data or {},
         ) as response:
             if response.status == 429:
-                retry_after = int((await response.json()).get("retry_after", 5))
+                retry_after = int((await read_json(response)).get("retry_after", 5))
                 await asyncio.sleep(retry_after)
                 return await self._send_api_request(
                     method=method,
@@ -65,9 +68,9 @@ class MCApiClient:
                     data=data,
                     key=key,
                 )
-            return response.status, (
-                await response.json() if response.content_type != "text/html" else {}
-            )
+            if not key or response.status < 300:
+                await self.bot.breakers.record(internal_server_key, response.status)
+            return response.status, await read_json(response)
 
     async def get_server_status(self, guild_id: int):
         status_code, response_json = await self._send_api_request(
@@ -111,19 +114,7 @@ class MCApiClient:
             "GET", "/Server/Players", guild_id
         )
         if status_code == 200:
-            new_list = []
-            for item in response_json:
-                # print(item)
-                new_list.append(
-                    Player(
-                        username=item["Player"].split(":")[0],
-                        id=item["Player"].split(":")[1],
-                        permission=item["Permission"],
-                        callsign=item.get("Callsign"),
-                        team=item["Team"],
-                    )
-                )
-            return new_list
+            return Player.from_api_list(response_json)
         else:
             raise ResponseFailure(status_code=status_code, json_data=response_json)
 
@@ -146,24 +137,7 @@ class MCApiClient:
             "GET", "/Server/Commands", guild_id
         )
         if status_code == 200:
-            return [
-                CommandLog(
-                    username=(
-                        log_item["Player"].split(":")[0]
-                        if ":" in log_item["Player"]
-                        else log_item["Player"]
-                    ),
-                    user_id=(
-                        log_item["Player"].split(":")[1]
-                        if ":" in log_item["Player"]
-                        else 0
-                    ),
-                    timestamp=log_item["Timestamp"],
-                    is_automated=log_item["Player"] == "Remote Server",
-                    command=log_item["Command"],
-                )
-                for log_item in response_json
-            ]
+            return CommandLog.from_api_list(response_json)
         else:
             raise ResponseFailure(status_code=status_code, json_data=response_json)
 
@@ -0,0 +1,143 @@
+import bisect
+
+import discord
+from discord.ext import commands
+
+
+def _names_of(member: discord.Member) -> set[str]:
+    return {
+        name.lower()
+        for name in (member.name, member.global_name, member.nick)
+        if name
+    }
+
+
+class GuildIndex:
+    def __init__(self):
+        # lowercased username, global name or nickname -> member ids
+        self.members: dict[str, set[int]] = {}
+        # member id -> the names it is indexed under
+        self.names: dict[int, set[str]] = {}
+        # Every indexed name in order, for prefix matches
+        self.sorted_names: list[str] = []
+
+    @classmethod
+    def from_members(cls, members) -> "GuildIndex":
+        """
+        Indexes all members of a guild at once, sorting the names a single time
+        instead of inserting them one by one.
+        """
+        index = cls()
+        for member in members:
+            names = _names_of(member)
+            index.names[member.id] = names
+            for name in names:
+                index.members.setdefault(name, set()).add(member.id)
+        index.sorted_names = sorted(index.members)
+        return index
+
+    def add(self, member: discord.Member):
+        """
+        Indexes a member that joined or changed names.
+        """
+        self.remove(member.id)
+        names = _names_of(member)
+        self.names[member.id] = names
+        for name in names:
+            ids = self.members.get(name)
+            if ids is None:
+                ids = self.members[name] = set()
+                bisect.insort(self.sorted_names, name)
+            ids.add(member.id)
+
+    def remove(self, member_id: int):
+        for name in self.names.pop(member_id, ()):
+            ids = self.members[name]
+            ids.discard(member_id)
+            if not ids:
+                del self.members[name]
+                index = bisect.bisect_left(self.sorted_names, name)
+                del self.sorted_names[index]
+
+    def find(self, name: str, limit: int) -> list[int]:
+        """
+        Member ids indexed under `name`, followed by those indexed under a name
+        starting with it (the way the gateway's member search matches).
+        """
+        name = name.lower()
+        found = list(self.members.get(name, ()))
+        index = bisect.bisect_left(self.sorted_names, name)
+        while len(found) < limit and index < len(self.sorted_names):
+            candidate = self.sorted_names[index]
+            if not candidate.startswith(name):
+                break
+            if candidate != name:
+                found.extend(i for i in self.members[candidate] if i not in found)
+            index += 1
+        return found[:limit]
+
+
+class MemberIndex:
+    """
+    Per-guild index of cached members by lowercased username, global name and
+    nickname, used to match Roblox usernames to Discord members without a
+    gateway member search per player. A guild is indexed on its first lookup
+    and then kept current by the member join, update and remove events.
+    Guilds whose members aren't fully cached still fall back to the gateway search.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.guilds: dict[int, GuildIndex] = {}
+        self.fallbacks = 0
+
+    def _index(self, guild: discord.Guild) -> GuildIndex | None:
+        index = self.guilds.get(guild.id)
+        if index is None and guild.chunked:
+            index = self.guilds[guild.id] = GuildIndex.from_members(guild.members)
+        return index
+
+    # <-- Event hooks, only guilds that were looked up are kept -->
+    def add(self, member: discord.Member):
+        index = self.guilds.get(member.guild.id)
+        if index is not None:
+            index.add(member)
+
+    def remove(self, guild_id: int, member_id: int):
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            index.remove(member_id)
+
+    def update_user(self, user: discord.User):
+        # Username and global name changes are dispatched once per user, not per guild
+        for guild in user.mutual_guilds:
+            index = self.guilds.get(guild.id)
+            member = guild.get_member(user.id)
+            if index is not None and member is not None:
+                index.add(member)
+
+    # <-- Lookups -->
+    async def find(
+        self, guild: discord.Guild, name: str, limit: int = 5
+    ) -> list[discord.Member]:
+        """
+        Members whose username, global name or nickname is `name` (ignoring case),
+        then members with one of them starting with `name`.
+        """
+        index = self._index(guild)
+        if index is None:
+            self.fallbacks += 1
+            return await guild.query_members(query=name, limit=limit)
+        members = []
+        for member_id in index.find(name, limit):
+            member = guild.get_member(member_id)
+            if member is not None:
+                members.append(member)
+        return members
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self.guilds),
+            "names": sum(len(index.members) for index in self.guilds.values()),
+            "fallbacks": self.fallbacks,
+        }
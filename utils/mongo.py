@@ -1,6 +1,14 @@
+import asyncio
 import collections
 import logging
 
+import pymongo.errors
+from decouple import config
+from pymongo import DeleteOne, IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+from utils.mongo_metrics import query_metrics
+
 """
 A helper file for using mongo db
 Class document aims to make using mongo calls easy, saves
@@ -8,8 +16,44 @@ needing to know the syntax for it. Just pass in the db instance
 on init and the document to create an instance on and boom
 """
 
+# (database name, collection name) -> Document, filled in by Documents declaring indexes
+registered_documents: dict = {}
+
+
+def analytics_read_preference():
+    """
+    Read preference for analytical queries (leaderboards, activity reports...).
+    They go to secondaries no more than ANALYTICS_MAX_STALENESS seconds behind
+    the primary (90 is the lowest MongoDB accepts, -1 disables the bound), optionally
+    restricted to members tagged with ANALYTICS_READ_TAGS (e.g. "nodeType:analytics").
+    On a standalone server every read ends up on the primary anyway.
+    """
+    mode = read_pref_mode_from_name(
+        config("ANALYTICS_READ_PREFERENCE", default="secondaryPreferred")
+    )
+    tags = config("ANALYTICS_READ_TAGS", default="")
+    tag_sets = None
+    if tags and mode != 0:
+        # Fall back to any eligible member when no tagged member is available
+        tag_sets = [dict(tag.split(":", 1) for tag in tags.split(",")), {}]
+    return make_read_preference(
+        mode,
+        tag_sets=tag_sets,
+        max_staleness=int(config("ANALYTICS_MAX_STALENESS", default=90))
+        if mode != 0
+        else -1,
+    )
+
+
+ANALYTICS_READ_PREFERENCE = analytics_read_preference()
+
 
 class Document:
+    # Subclasses declare the indexes their hot queries rely on,
+    # and sample filters for those queries so we can check their plans.
+    indexes: list[IndexModel] = []
+    query_shapes: list[dict] = []
+
     def __init__(self, connection, document_name):
         """
         Our init function, sets up the conenction to the specified document
@@ -18,8 +62,21 @@ class Document:
          - documentName (str) : The document this instance should be
         """
         self.db = connection[document_name]
+        # Same collection, read from secondaries. Only for queries that tolerate
+        # slightly stale data, reads feeding a write stay on self.db.
+        self.analytics = self.db.with_options(read_preference=ANALYTICS_READ_PREFERENCE)
         self.logger = logging.getLogger(__name__)
 
+        if self.indexes or self.query_shapes:
+            registered_documents[(self.db.database.name, self.db.name)] = self
+
+    def query_stats(self) -> dict:
+        """
+        Latency, document and byte counts of the queries run against this collection,
+        keyed by operation. See utils.mongo_metrics.
+        """
+        return query_metrics.collection_stats(f"{self.db.database.name}.{self.db.name}")
+
     # <-- Pointer Methods -->
     async def update(self, dict):
         """
@@ -27,17 +84,17 @@ class Document:
         """
         await self.update_by_id(dict)
 
-    async def get_by_id(self, id):
+    async def get_by_id(self, id, projection: dict | None = None):
         """
         This is essentially find_by_id so point to that
         """
-        return await self.find_by_id(id)
+        return await self.find_by_id(id, projection)
 
-    async def find(self, id):
+    async def find(self, id, projection: dict | None = None):
         """
         For simpler calls, points to self.find_by_id
         """
-        return await self.find_by_id(id)
+        return await self.find_by_id(id, projection)
 
     async def delete(self, id):
         """
@@ -46,16 +103,17 @@ class Document:
         await self.delete_by_id(id)
 
     # <-- Actual Methods -->
-    async def find_by_id(self, id):
+    async def find_by_id(self, id, projection: dict | None = None):
         """
         Returns the data found under `id`
         Params:
          -  id () : The id to search for
+         -  projection (dict) : Only return these fields, e.g. {"customisation.prefix": 1}
         Returns:
          - None if nothing is found
          - If somethings found, return that
         """
-        return await self.db.find_one({"_id": id})
+        return await self.db.find_one({"_id": id}, projection)
 
     async def delete_by_id(self, id):
         """
@@ -63,9 +121,6 @@ class Document:
         Params:
          -  id () : The id to search for and delete
         """
-        if not await self.find_by_id(id):
-            return
-
         await self.db.delete_many({"_id": id})
 
     async def insert(self, dict):
@@ -84,7 +139,7 @@ class Document:
 
         await self.db.insert_one(dict)
 
-    async def upsert(self, dict):
+    async def upsert(self, dict, return_document: bool = False):
         """
         Makes a new item in the document, if it already exists
         it will update that item instead
@@ -93,13 +148,17 @@ class Document:
         Supports inserting when the document already exists
         Params:
          - dict (Dictionary) : The dict to insert
+         - return_document (bool) : Return the document as it is after the write
         """
-        if await self.__get_raw(dict["_id"]) != None:
-            await self.update_by_id(dict)
-        else:
-            await self.db.insert_one(dict)
+        id, fields = self.__split_id(dict)
+        return await self.__write(
+            id,
+            {"$set": fields} if fields else {"$setOnInsert": {"_id": id}},
+            upsert=True,
+            return_document=return_document,
+        )
 
-    async def update_by_id(self, dict):
+    async def update_by_id(self, dict, return_document: bool = False):
         """
         For when a document already exists in the data
         and you want to update something in it
@@ -107,23 +166,16 @@ class Document:
         the relevant information needed to update.
         Params:
          - dict (Dictionary) : The dict to insert
+         - return_document (bool) : Return the document as it is after the write
         """
-        # Check if its actually a Dictionary
-        if not isinstance(dict, collections.abc.Mapping):
-            raise TypeError("Expected Dictionary.")
-
-        # Always use your own _id
-        if not dict["_id"]:
-            raise KeyError("_id not found in supplied dict.")
-
-        if not await self.find_by_id(dict["_id"]):
-            return
-
-        id = dict["_id"]
-        dict.pop("_id")
-        await self.db.update_one({"_id": id}, {"$set": dict})
+        id, fields = self.__split_id(dict)
+        if not fields:
+            return await self.find_by_id(id) if return_document else None
+        return await self.__write(
+            id, {"$set": fields}, return_document=return_document
+        )
 
-    async def unset(self, dict):
+    async def unset(self, dict, return_document: bool = False):
         """
         For when you want to remove a field from
         a pre-existing document in the collection
@@ -131,34 +183,69 @@ class Document:
         the relevant information needed to unset.
         Params:
          - dict (Dictionary) : Dictionary to parse for info
+         - return_document (bool) : Return the document as it is after the write
         """
-        # Check if its actually a Dictionary
-        if not isinstance(dict, collections.abc.Mapping):
-            raise TypeError("Expected Dictionary.")
-
-        # Always use your own _id
-        if not dict["_id"]:
-            raise KeyError("_id not found in supplied dict.")
-
-        if not await self.find_by_id(dict["_id"]):
-            return
-
-        id = dict["_id"]
-        dict.pop("_id")
-        await self.db.update_one({"_id": id}, {"$unset": dict})
+        id, fields = self.__split_id(dict)
+        if not fields:
+            return await self.find_by_id(id) if return_document else None
+        return await self.__write(
+            id, {"$unset": fields}, return_document=return_document
+        )
 
-    async def increment(self, id, amount, field):
+    async def increment(self, id, amount, field, return_document: bool = False):
         """
         Increment a given `field` by `amount`
         Params:
         - id () : The id to search for
         - amount (int) : Amount to increment by
         - field () : field to increment
+        - return_document (bool) : Return the document as it is after the write
+        """
+        return await self.__write(
+            id, {"$inc": {field: amount}}, return_document=return_document
+        )
+
+    def bulk(self, ordered: bool = True, batch_size: int = 500):
         """
-        if not await self.find_by_id(id):
-            return
+        Returns a BulkWriter that buffers writes to this collection
+        and sends them as bulk_write batches. Use it as an async context
+        manager so the remaining operations are flushed on exit:
 
-        await self.db.update_one({"_id": id}, {"$inc": {field: amount}})
+            async with bot.loas.bulk(ordered=False) as bulk:
+                await bulk.update_by_id({"_id": ..., "expired": True})
+        """
+        return BulkWriter(self.db, ordered=ordered, batch_size=batch_size)
+
+    async def ensure_indexes(self):
+        """
+        Creates the declared indexes. Indexes that already exist are left as they are.
+        """
+        if self.indexes:
+            await self.db.create_indexes(self.indexes)
+
+    async def explain_query_shapes(self) -> list[dict]:
+        """
+        Explains every declared query shape and reports the stages of its winning plan
+        """
+        report = []
+        for shape in self.query_shapes:
+            plan = await self.db.find(shape).explain()
+            query_planner = plan.get("queryPlanner")
+            if query_planner is None:
+                # Time series finds explain as an aggregation over the buckets
+                query_planner = plan["stages"][0]["$cursor"]["queryPlanner"]
+            winning_plan = query_planner["winningPlan"]
+            # Slot based execution nests the classic plan under queryPlan
+            stages = _plan_stages(winning_plan.get("queryPlan", winning_plan))
+            report.append(
+                {
+                    "collection": self.db.name,
+                    "filter": sorted(shape.keys()),
+                    "stages": stages,
+                    "collscan": "COLLSCAN" in stages,
+                }
+            )
+        return report
 
     async def get_all(self):
         """
@@ -170,9 +257,164 @@ class Document:
         return data
 
     # <-- Private methods -->
+    @staticmethod
+    def __split_id(dict):
+        """
+        Validates a write payload and splits it into its _id
+        and the remaining fields, without mutating the caller's dict
+        """
+        # Check if its actually a Dictionary
+        if not isinstance(dict, collections.abc.Mapping):
+            raise TypeError("Expected Dictionary.")
+
+        # Always use your own _id
+        if not dict["_id"]:
+            raise KeyError("_id not found in supplied dict.")
+
+        return dict["_id"], {k: v for k, v in dict.items() if k != "_id"}
+
+    async def __write(self, id, update, upsert=False, return_document=False):
+        """
+        Applies `update` to the document under `id` in a single
+        server operation. Matching nothing is a no-op unless `upsert` is set.
+        """
+        if return_document:
+            return await self.db.find_one_and_update(
+                {"_id": id},
+                update,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER,
+            )
+        await self.db.update_one({"_id": id}, update, upsert=upsert)
+
     async def __get_raw(self, id):
         """
         An internal private method used to eval certain checks
         within other methods which require the actual data
         """
         return await self.db.find_one({"_id": id})
+
+
+def _plan_stages(plan: dict) -> list[str]:
+    stages = [plan["stage"]] if "stage" in plan else []
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for stage in plan.get("inputStages", []):
+        stages += _plan_stages(stage)
+    return stages
+
+
+async def ensure_registered_indexes() -> list[dict]:
+    """
+    Ensures the indexes of every registered Document, then returns a
+    report of the declared query shapes, logging any that still COLLSCAN.
+    Safe to run on every startup; existing indexes are not rebuilt.
+    """
+    logger = logging.getLogger(__name__)
+    report = []
+    for (database, collection), document in list(registered_documents.items()):
+        try:
+            await document.ensure_indexes()
+        except pymongo.errors.PyMongoError as e:
+            logger.error(f"Failed to ensure indexes for {database}.{collection}: {e}")
+            continue
+        try:
+            report += await document.explain_query_shapes()
+        except Exception as e:
+            # Only the report is affected, the remaining collections still get their indexes
+            logger.warning(f"Failed to explain queries on {database}.{collection}: {e}")
+
+    for item in report:
+        if item["collscan"]:
+            logger.warning(
+                f"Query on {item['collection']} by {item['filter']} falls back to a COLLSCAN"
+            )
+    logger.info(f"Ensured indexes for {len(registered_documents)} collections.")
+    return report
+
+
+def log_index_task(task: asyncio.Task):
+    """
+    Done callback of the background ensure_registered_indexes task, so a failure isn't silent.
+    """
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logging.getLogger(__name__).error(
+            f"Ensuring indexes failed: {type(error).__name__}: {error}"
+        )
+    else:
+        collscans = sum(item["collscan"] for item in task.result())
+        logging.getLogger(__name__).info(
+            f"Index check finished, {collscans} query shapes fall back to a COLLSCAN."
+        )
+
+
+class BulkWriter:
+    def __init__(self, collection, ordered: bool = True, batch_size: int = 500):
+        """
+        Buffers insert, update and delete operations and flushes
+        them with bulk_write once `batch_size` is reached, or on exit.
+        Params:
+         - collection (Motor Collection) : The collection to write to
+         - ordered (bool) : Stop at the first failing operation of a batch
+         - batch_size (int) : Amount of operations buffered before a flush
+        """
+        self.db = collection
+        self.ordered = ordered
+        self.batch_size = batch_size
+        self.operations = []
+        self.logger = logging.getLogger(__name__)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Whatever was queued before an error still reflects work that was done.
+        await self.flush()
+
+    async def insert(self, dict):
+        await self.add(InsertOne(dict))
+
+    async def update_by_id(self, dict, upsert: bool = False):
+        id = dict["_id"]
+        fields = {k: v for k, v in dict.items() if k != "_id"}
+        if fields:
+            await self.add(UpdateOne({"_id": id}, {"$set": fields}, upsert=upsert))
+
+    async def update_one(self, filter, update, upsert: bool = False):
+        await self.add(UpdateOne(filter, update, upsert=upsert))
+
+    async def unset(self, dict):
+        id = dict["_id"]
+        fields = {k: v for k, v in dict.items() if k != "_id"}
+        if fields:
+            await self.add(UpdateOne({"_id": id}, {"$unset": fields}))
+
+    async def increment(self, id, amount, field):
+        await self.add(UpdateOne({"_id": id}, {"$inc": {field: amount}}))
+
+    async def delete_by_id(self, id):
+        await self.add(DeleteOne({"_id": id}))
+
+    async def delete_one(self, filter):
+        await self.add(DeleteOne(filter))
+
+    async def add(self, operation):
+        self.operations.append(operation)
+        if len(self.operations) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """
+        Sends all buffered operations in one bulk_write call.
+        """
+        if not self.operations:
+            return None
+        operations, self.operations = self.operations, []
+        result = await self.db.bulk_write(operations, ordered=self.ordered)
+        self.logger.debug(
+            f"Flushed {len(operations)} operations to {self.db.name}"
+        )
+        return result
@@ -0,0 +1,207 @@
+import bisect
+import collections
+import threading
+import time
+
+import bson
+from decouple import config
+from pymongo import monitoring
+
+"""
+Per-collection query instrumentation. Registered as a command listener on the
+motor client, so it sees every command - from Document helpers and from raw
+`.db` collection calls alike - without wrapping either.
+"""
+
+# Upper bounds (ms) of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Commands that name their collection under a different key than the command name
+_COLLECTION_KEYS = {"getMore": "collection"}
+
+# Where each command keeps its filter
+_FILTER_KEYS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def query_shape(value):
+    """
+    Replaces every literal in a filter with "?", keeping field names and operators,
+    e.g. {"Guild": 1, "expiry": {"$gte": 5}} -> {"Guild": "?", "expiry": {"$gte": "?"}}
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(i, dict) for i in value):
+        # $and / $or / $nor clauses
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+def command_shape(command_name: str, command: dict):
+    if command_name in _FILTER_KEYS:
+        return query_shape(command.get(_FILTER_KEYS[command_name]) or {})
+    if command_name in ("update", "delete"):
+        statements = command.get(command_name + "s") or [{}]
+        return query_shape(statements[0].get("q") or {})
+    if command_name == "aggregate":
+        return [
+            {stage: query_shape(body)} if stage == "$match" else stage
+            for step in command.get("pipeline", [])
+            for stage, body in step.items()
+        ]
+    return None
+
+
+def reply_documents(command_name: str, reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "findAndModify":
+        return 0 if reply.get("value") is None else 1
+    return reply.get("n", 0)
+
+
+class OperationStats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "buckets", "documents", "bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.documents = 0
+        self.bytes = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max_ms, 3),
+            "histogram": {
+                **{
+                    f"le_{bound}ms": amount
+                    for bound, amount in zip(LATENCY_BUCKETS, self.buckets)
+                },
+                "inf": self.buckets[-1],
+            },
+            "documents": self.documents,
+            "bytes": self.bytes,
+        }
+
+
+class QueryMetrics(monitoring.CommandListener):
+    """
+    Aggregates latency, returned document counts and (with MONGO_METRICS_BYTES)
+    reply sizes per (collection, operation), and samples queries slower than `slow_query_ms`
+    together with their filter shape.
+    """
+
+    def __init__(self):
+        self.slow_query_ms = int(config("MONGO_SLOW_QUERY_MS", default=100))
+        # Sizing replies means re-encoding every one of them on the event loop, so it
+        # is off unless turned on to investigate
+        self.measure_bytes = config("MONGO_METRICS_BYTES", default="false").lower() == "true"
+        self.stats: dict[tuple[str, str], OperationStats] = collections.defaultdict(
+            OperationStats
+        )
+        self.slow_queries = collections.deque(
+            maxlen=int(config("MONGO_SLOW_QUERY_SAMPLES", default=200))
+        )
+        self.started_at = time.time()
+        # request id -> (collection, command name, shape); pymongo calls us from several threads
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+
+    # <-- monitoring.CommandListener -->
+    def started(self, event: monitoring.CommandStartedEvent):
+        command_name = event.command_name
+        collection = event.command.get(_COLLECTION_KEYS.get(command_name, command_name))
+        if not isinstance(collection, str):
+            # admin / server commands like ping, hello or endSessions
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                f"{event.database_name}.{collection}",
+                command_name,
+                command_shape(command_name, event.command),
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, event.reply)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, None)
+
+    def _finish(self, event, reply: dict | None):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        collection, command_name, shape = pending
+        duration = event.duration_micros / 1000
+        size = len(bson.encode(reply)) if reply is not None and self.measure_bytes else 0
+
+        with self._lock:
+            stats = self.stats[(collection, command_name)]
+            stats.count += 1
+            stats.total_ms += duration
+            stats.max_ms = max(stats.max_ms, duration)
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+            if reply is None:
+                stats.errors += 1
+            else:
+                stats.documents += reply_documents(command_name, reply)
+                stats.bytes += size
+
+            if duration >= self.slow_query_ms and command_name != "getMore":
+                self.slow_queries.append(
+                    {
+                        "collection": collection,
+                        "operation": command_name,
+                        "duration_ms": round(duration, 3),
+                        "shape": shape,
+                        "failed": reply is None,
+                        "timestamp": time.time(),
+                    }
+                )
+
+    # <-- Reporting -->
+    def collection_stats(self, collection: str) -> dict:
+        """
+        Stats for one collection, keyed by operation.
+        Params:
+         - collection (str) : full name, e.g. "erm.shift_management"
+        """
+        with self._lock:
+            return {
+                operation: stats.to_dict()
+                for (name, operation), stats in self.stats.items()
+                if name == collection
+            }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            collections_ = collections.defaultdict(dict)
+            for (collection, operation), stats in self.stats.items():
+                collections_[collection][operation] = stats.to_dict()
+            return {
+                "since": self.started_at,
+                "slow_query_ms": self.slow_query_ms,
+                "collections": dict(collections_),
+                "slow_queries": list(self.slow_queries),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.slow_queries.clear()
+            self.started_at = time.time()
+
+
+query_metrics = QueryMetrics()
@@ -2,6 +2,7 @@ from copy import copy
 
 import discord
 from discord.ext import commands
+import pymongo
 import reactionmenu
 import typing
 
@@ -22,15 +23,177 @@ class CustomPage:
             setattr(self, key, value)
 
 
+class KeysetCursor:
+    """
+    Reads a query page by page, seeking past the last document of the previous
+    page on (sort_field, _id) instead of skipping, so every page costs one
+    bounded index scan regardless of how deep it is.
+    """
+
+    def __init__(
+        self,
+        collection,
+        filter: dict,
+        page_size: int,
+        sort_field: str = "_id",
+        projection: dict | None = None,
+    ):
+        self.collection = collection
+        self.filter = filter
+        self.page_size = page_size
+        self.sort_field = sort_field
+        self.projection = projection
+
+    def _sort(self) -> list:
+        if self.sort_field == "_id":
+            return [("_id", pymongo.ASCENDING)]
+        return [(self.sort_field, pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+
+    def boundary(self, document: dict) -> tuple:
+        return (document.get(self.sort_field), document["_id"])
+
+    def _after(self, boundary: tuple | None) -> dict:
+        if boundary is None:
+            return self.filter
+        value, last_id = boundary
+        if self.sort_field == "_id":
+            seek = {"_id": {"$gt": last_id}}
+        else:
+            seek = {
+                "$or": [
+                    {self.sort_field: {"$gt": value}},
+                    {self.sort_field: value, "_id": {"$gt": last_id}},
+                ]
+            }
+        return {"$and": [self.filter, seek]}
+
+    async def count(self) -> int:
+        return await self.collection.count_documents(self.filter)
+
+    async def fetch_after(self, boundary: tuple | None) -> list[dict]:
+        return await self.collection.find(
+            self._after(boundary), self.projection
+        ).sort(self._sort()).limit(self.page_size).to_list(length=self.page_size)
+
+    async def skip_page(self, boundary: tuple | None) -> tuple | None:
+        """
+        Boundary at the end of the page after `boundary`, reading only the sort keys.
+        """
+        documents = await self.collection.find(
+            self._after(boundary), {self.sort_field: 1}
+        ).sort(self._sort()).limit(self.page_size).to_list(length=self.page_size)
+        return self.boundary(documents[-1]) if documents else boundary
+
+
+class LazyPageSource:
+    """
+    Pages for SelectPagination that are read and rendered on demand. Only the page
+    being shown and its neighbours are held in memory, and the next page is fetched
+    in the background as soon as one is shown.
+
+    Params:
+     - cursor (KeysetCursor) : the query to paginate
+     - render (callable) : (documents, index) -> CustomPage, may be a coroutine. With
+       nothing to show it renders one page from an empty list of documents
+     - total (int) : amount of documents matching the query, see KeysetCursor.count
+     - leading_pages (list[CustomPage]) : static pages shown before the query results
+    """
+
+    def __init__(
+        self,
+        cursor: KeysetCursor,
+        render: typing.Callable,
+        total: int,
+        leading_pages: list[CustomPage] | None = None,
+    ):
+        self.cursor = cursor
+        self.render = render
+        self.total = total
+        self.leading_pages = leading_pages or []
+        # boundaries[n] is the position the n-th result page starts after
+        self._boundaries: list[tuple | None] = [None]
+        self._pages: dict[int, CustomPage] = {}
+        self._prefetch: dict[int, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        result_pages = -(-self.total // self.cursor.page_size)
+        # Without leading pages there is always a page, if only to say nothing matched
+        if not result_pages and not self.leading_pages:
+            result_pages = 1
+        return len(self.leading_pages) + result_pages
+
+    def identifier(self, index: int) -> str:
+        if index < len(self.leading_pages):
+            return self.leading_pages[index].identifier
+        return str(index + 1)
+
+    def peek(self, index: int) -> CustomPage | None:
+        if index < len(self.leading_pages):
+            return self.leading_pages[index]
+        return self._pages.get(index)
+
+    async def _load(self, index: int) -> CustomPage:
+        result_index = index - len(self.leading_pages)
+        if self.total == 0:
+            return await self._render([], index)
+        async with self._lock:
+            while len(self._boundaries) <= result_index:
+                # Jumping ahead, walk the pages in between without decoding them
+                self._boundaries.append(
+                    await self.cursor.skip_page(self._boundaries[-1])
+                )
+
+            documents = await self.cursor.fetch_after(self._boundaries[result_index])
+            if documents and len(self._boundaries) == result_index + 1:
+                self._boundaries.append(self.cursor.boundary(documents[-1]))
+        return await self._render(documents, index)
+
+    async def _render(self, documents: list[dict], index: int) -> CustomPage:
+        page = self.render(documents, index)
+        if asyncio.iscoroutine(page):
+            page = await page
+        page.identifier = self.identifier(index)
+        return page
+
+    async def get_page(self, index: int) -> CustomPage:
+        index %= len(self)
+        page = self.peek(index)
+        if page is None:
+            task = self._prefetch.pop(index, None)
+            page = await task if task is not None else await self._load(index)
+
+        # Keep the neighbours of the shown page only
+        self._pages = {
+            i: p for i, p in self._pages.items() if abs(i - index) <= 1
+        }
+        self._pages[index] = page
+
+        following = index + 1
+        if (
+            following < len(self)
+            and self.peek(following) is None
+            and following not in self._prefetch
+        ):
+            for task in self._prefetch.values():
+                task.cancel()
+            self._prefetch = {following: asyncio.create_task(self._load(following))}
+        return page
+
+
 class SelectPagination(discord.ui.View):
     def __init__(
         self,
         bot: Bot,
         user_id: int,
-        pages: list[CustomPage],
+        pages: list[CustomPage] | LazyPageSource,
         start_at=0,
         edit_method=None,
     ):
+        """
+        `pages` may be a LazyPageSource, in which case the page at `start_at`
+        must already have been loaded with `await source.get_page(start_at)`.
+        """
         super().__init__(timeout=None)
         # we don't need this for the pagination, only the emojis :sob:
         self.bot = bot
@@ -44,6 +207,7 @@ class SelectPagination(discord.ui.View):
                     button.label = ""
 
         self.pages = pages
+        self.lazy = isinstance(pages, LazyPageSource)
         self.user_id = user_id
         self.current_index = start_at
         self.view = self
@@ -51,15 +215,21 @@ class SelectPagination(discord.ui.View):
         self.page_children = []
         self.edit_method = edit_method
 
-        starting_page = self.pages[self.current_index]
+        starting_page = self._cached_page(self.current_index)
         if starting_page.identifier:
             for item in self.children:
                 if item.label == "TEMP":
                     item.label = starting_page.identifier
 
+    def _cached_page(self, index: int) -> CustomPage:
+        return self.pages.peek(index) if self.lazy else self.pages[index]
+
+    async def _get_page(self, index: int) -> CustomPage:
+        return await self.pages.get_page(index) if self.lazy else self.pages[index]
+
     def get_current_view(self) -> discord.ui.View:
-        current_page = self.pages[self.current_index]
-        new_page = self.pages[self.current_index]
+        current_page = self._cached_page(self.current_index)
+        new_page = current_page
         new_index = self.current_index
 
         view = self.view
@@ -112,16 +282,17 @@ class SelectPagination(discord.ui.View):
         increment_index: int,
         mode: typing.Literal["set", "increment"],
     ):
-        current_page = self.pages[self.current_index]
+        current_page = self._cached_page(self.current_index)
 
         if mode == "set":
             new_index = increment_index
-            new_page = self.pages[new_index]
         else:
             new_index = self.current_index + increment_index
             if new_index >= len(self.pages):
                 new_index = 0
-            new_page = self.pages[new_index]
+            elif new_index < 0:
+                new_index = len(self.pages) - 1
+        new_page = await self._get_page(new_index)
 
         view = self.view
         self.current_index = new_index
@@ -198,6 +369,13 @@ class SelectPagination(discord.ui.View):
                 view := CustomSelectMenu(
                     self.user_id,
                     [
+                        discord.SelectOption(label=identifier, value=str(index))
+                        for index, identifier in enumerate(
+                            self.pages.identifier(i) for i in range(len(self.pages))
+                        )
+                    ]
+                    if self.lazy
+                    else [
                         discord.SelectOption(label=page.identifier, value=str(index))
                         for index, page in enumerate(self.pages)
                     ],
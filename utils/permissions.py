@@ -0,0 +1,87 @@
+import enum
+
+import discord
+from discord.ext import commands
+
+from utils.basedataclass import Record
+
+"""
+Permission levels of guild members. The staff, admin and management roles of a
+guild are compiled once into a role id -> permissions map (cached alongside the
+guild's settings), so resolving a member is one set intersection with their roles.
+"""
+
+
+class Permission(enum.IntFlag):
+    NONE = 0
+    STAFF = 1
+    ADMIN = 2
+    MANAGEMENT = 4
+
+
+def _role_ids(value) -> frozenset:
+    if isinstance(value, list):
+        return frozenset(value)
+    if isinstance(value, int):
+        return frozenset((value,))
+    return frozenset()
+
+
+class StaffRoles(Record):
+    # role id -> permissions it grants
+    grants: dict
+    role_ids: frozenset
+
+    @classmethod
+    def compile(cls, settings: dict | None) -> "StaffRoles":
+        staff_management = (settings or {}).get("staff_management") or {}
+        grants = {}
+        # Admins count as staff, and management roles count as both
+        for field, permission in (
+            ("role", Permission.STAFF),
+            ("admin_role", Permission.STAFF | Permission.ADMIN),
+            (
+                "management_role",
+                Permission.STAFF | Permission.ADMIN | Permission.MANAGEMENT,
+            ),
+        ):
+            for role_id in _role_ids(staff_management.get(field)):
+                grants[role_id] = grants.get(role_id, Permission.NONE) | permission
+        return cls(grants=grants, role_ids=frozenset(grants))
+
+
+async def resolve_permissions(
+    bot: commands.Bot, guild: discord.Guild, member: discord.Member
+) -> Permission:
+    """
+    The permissions `member` has in `guild` through its configured roles and
+    through Discord permissions (Administrator is admin, Manage Server is
+    management, Manage Messages is staff).
+    """
+    roles: StaffRoles = await bot.settings.get_staff_roles(guild.id)
+    permissions = Permission.NONE
+    for role_id in roles.role_ids.intersection(role.id for role in member.roles):
+        permissions |= roles.grants[role_id]
+
+    guild_permissions = member.guild_permissions
+    if guild_permissions.administrator:
+        permissions |= Permission.STAFF | Permission.ADMIN
+    if guild_permissions.manage_guild:
+        permissions |= Permission.MANAGEMENT
+    if guild_permissions.manage_messages:
+        permissions |= Permission.STAFF
+    return permissions
+
+
+def permission_level(permissions: Permission, include_admin: bool = False) -> int:
+    """
+    The level synced to the internal API and the panel: 2 management, 1 staff, 0 none.
+    The dashboard API also reports admins, as 3 (`include_admin`).
+    """
+    if Permission.MANAGEMENT in permissions:
+        return 2
+    if include_admin and Permission.ADMIN in permissions:
+        return 3
+    if Permission.STAFF in permissions:
+        return 1
+    return 0
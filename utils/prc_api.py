@@ -3,14 +3,35 @@ import datetime
 import typing
 
 import discord
-import roblox
 from discord.ext import commands
 import aiohttp
 from decouple import config
 from bson import ObjectId
-from utils.basedataclass import BaseDataClass
+from utils.basedataclass import BaseDataClass, Record, field, split
+from utils.cache import TTLCache, MISSING
+from utils.command_queue import CommandDispatcher
+from utils.fast_json import read_json
+from utils.rate_limiter import TokenBucket
 from datamodels.ServerKeys import ServerKey
 
+# Seconds a GET response is reused for the same guild. Endpoints missing here are never cached.
+PRC_CACHE_TTL = int(config("PRC_CACHE_TTL", default=5))
+PRC_STAFF_CACHE_TTL = int(config("PRC_STAFF_CACHE_TTL", default=60))
+# Times a request is retried after a 429 or 502 before giving up
+MAX_RETRIES = int(config("PRC_MAX_RETRIES", default=3))
+CACHE_TTLS = {
+    "/server": PRC_CACHE_TTL,
+    "/server/players": PRC_CACHE_TTL,
+    "/server/queue": PRC_CACHE_TTL,
+    "/server/vehicles": PRC_CACHE_TTL,
+    "/server/modcalls": PRC_CACHE_TTL,
+    "/server/commandlogs": PRC_CACHE_TTL,
+    "/server/killlogs": PRC_CACHE_TTL,
+    "/server/joinlogs": PRC_CACHE_TTL,
+    "/server/staff": PRC_STAFF_CACHE_TTL,
+    "/server/bans": PRC_STAFF_CACHE_TTL,
+}
+
 
 class ResponseFailure(Exception):
     detail: str | None
@@ -30,36 +51,56 @@ class BanItem(BaseDataClass):
     user_id: int
 
 
-class CommandLog(BaseDataClass):
+class CommandLog(Record):
     username: str
     user_id: int
     timestamp: int
     is_automated: bool
     command: str
 
+    api_fields = {
+        # "Username:UserId", or just a name for automated commands
+        ("username", "user_id"): split("Player", missing=0),
+        "timestamp": "Timestamp",
+        "is_automated": field("Player", lambda player: player == "Remote Server"),
+        "command": "Command",
+    }
+
 
-class JoinLeaveLog(BaseDataClass):
+class JoinLeaveLog(Record):
     type: typing.Literal["join", "leave"]
     timestamp: int
     username: str
     user_id: int
 
+    api_fields = {
+        ("username", "user_id"): split("Player"),
+        "timestamp": "Timestamp",
+        "type": field("Join", lambda join: "join" if join is True else "leave"),
+    }
+
     def __lt__(self, other):
         return self.timestamp < other.timestamp
 
 
-class KillLog(BaseDataClass):
+class KillLog(Record):
     killer_username: str
     killer_user_id: int
     timestamp: int
     killed_username: str
     killed_user_id: int
 
+    api_fields = {
+        ("killer_username", "killer_user_id"): split("Killer"),
+        "timestamp": "Timestamp",
+        ("killed_username", "killed_user_id"): split("Killed"),
+    }
+
     def __lt__(self, other):
         return self.timestamp < other.timestamp
 
 
-class Player(BaseDataClass):
+class Player(Record):
     username: str
     id: int
     permission: typing.Optional[
@@ -74,6 +115,13 @@ class Player(BaseDataClass):
     callsign: str | None = None
     team: str | None = None
 
+    api_fields = {
+        ("username", "id"): split("Player"),
+        "permission": "Permission",
+        "callsign": field("Callsign", default=None),
+        "team": "Team",
+    }
+
 
 class ModCall(BaseDataClass):
     caller: str
@@ -113,13 +161,20 @@ class PRCApiClient:
         self.session = aiohttp.ClientSession()
         self.api_key = api_key
         self.base_url = base_url
+        # (guild id, endpoint) -> (status code, json) of recent successful GETs
+        self.response_cache = TTLCache(ttl=5, max_size=50000)
+        self._in_flight: dict[tuple[int, str], asyncio.Future] = {}
+        # PRC limits requests per API key (global) and per server key
+        self.global_bucket = TokenBucket("global")
+        self.buckets: dict[tuple[str, str], TokenBucket] = {}
+        # Background in-game commands, queued per guild
+        self.commands = CommandDispatcher(self)
 
         bot.external_http_sessions.append(self.session)
 
     async def get_server_key(self, guild_id: int) -> ServerKey:
-        return await self.bot.server_keys.get_server_key(
-            guild_id
-        ) 
+        # Served from the in-memory key directory
+        return await self.bot.server_keys.get_server_key(guild_id)
 
     async def _send_api_request(
         self,
@@ -128,56 +183,147 @@ class PRCApiClient:
         guild_id: int,
         data: dict | None = None,
         key: str | None = None,
-        max_retries: int = 2,
+        max_retries: int = MAX_RETRIES,
     ):
-
+        """
+        GETs of a guild's own server are answered from a short-lived cache, and
+        concurrent identical GETs share one request to PRC.
+        """
+        ttl = CACHE_TTLS.get(endpoint) if method == "GET" and not key else None
+        if not ttl:
+            return await self._request(method, endpoint, guild_id, data, key, max_retries)
+
+        cache_key = (guild_id, endpoint)
+        cached = self.response_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is None:
+            in_flight = self._in_flight[cache_key] = asyncio.ensure_future(
+                self._cached_request(cache_key, ttl, max_retries)
+            )
+        # A caller giving up must not cancel the request for everyone else waiting on it
+        return await asyncio.shield(in_flight)
+
+    async def _cached_request(self, cache_key: tuple[int, str], ttl: int, max_retries: int):
+        guild_id, endpoint = cache_key
+        try:
+            result = await self._request("GET", endpoint, guild_id, max_retries=max_retries)
+            if result[0] == 200:
+                self.response_cache.set(cache_key, result, ttl=ttl)
+            return result
+        finally:
+            self._in_flight.pop(cache_key, None)
+
+    def invalidate_cache(self, guild_id: int, endpoint: str | None = None):
+        """
+        Drops cached responses of a guild, e.g. after running a command that changes them.
+        """
+        for cached_endpoint in [endpoint] if endpoint else CACHE_TTLS:
+            self.response_cache.invalidate((guild_id, cached_endpoint))
+
+    def cache_stats(self) -> dict:
+        return {**self.response_cache.stats(), "in_flight": len(self._in_flight)}
+
+    def _bucket(self, server_key: str, endpoint: str) -> TokenBucket:
+        # Commands and reads are limited separately for every server key
+        kind = "command" if endpoint == "/server/command" else "read"
+        bucket = self.buckets.get((server_key, kind))
+        if bucket is None:
+            bucket = self.buckets[(server_key, kind)] = TokenBucket(kind)
+        return bucket
+
+    def _update_buckets(self, bucket: TokenBucket, headers) -> TokenBucket:
+        """
+        Syncs the bucket a response counted against with its rate limit headers,
+        returns that bucket.
+        """
+        name = headers.get("X-RateLimit-Bucket")
+        if name == "global":
+            bucket = self.global_bucket
+        elif name:
+            bucket.name = name
+        try:
+            bucket.update(
+                int(headers["X-RateLimit-Limit"]),
+                int(headers["X-RateLimit-Remaining"]),
+                float(headers["X-RateLimit-Reset"]),
+            )
+        except (KeyError, ValueError):
+            pass
+        return bucket
+
+    def rate_limit_state(self) -> dict:
+        return {
+            "global": self.global_bucket.state(),
+            "server_keys": len({server_key for server_key, _ in self.buckets}),
+            "limited": [
+                bucket.state()
+                for bucket in self.buckets.values()
+                if bucket.remaining == 0 or bucket.waiting
+            ],
+        }
+
+    async def _request(
+        self,
+        method: typing.Literal["GET", "POST"],
+        endpoint: str,
+        guild_id: int,
+        data: dict | None = None,
+        key: str | None = None,
+        max_retries: int = MAX_RETRIES,
+    ):
+        """
+        Sends a request once its rate limit buckets allow it. This is the only
+        place requests are retried: on a 429 after the bucket resets, on a 502
+        with a backoff. Keys whose breaker is open (see utils.circuit_breaker)
+        get their last rejection back without a request being sent.
+        """
         if not key:
             internal_server_object = await self.get_server_key(guild_id)
-            internal_server_key = (
-                internal_server_object if internal_server_object is not None else None
-            )
-            if internal_server_key is None:
+            if internal_server_object is None:
                 return 401, {}
-            else:
-                internal_server_key = internal_server_key.key
+            internal_server_key = internal_server_object.key
+            if not self.bot.breakers.allow(internal_server_key):
+                return self.bot.breakers.rejection(internal_server_key)
         else:
             internal_server_key = key
 
-        async with self.session.request(
-            method,
-            url=f"{self.base_url}{endpoint}",
-            headers={
-                "Authorization": self.api_key,
-                "User-Agent": "Application",
-                "Server-Key": internal_server_key,
-            },
-            json=data or {},
-        ) as response:
-            # if response.status == 403:
-            #     await self.bot.prohibited.insert({
-            #         "_id": ObjectId(),
-            #         "ServerKey": internal_server_key,
-            #         "ProhibitedUntil": 9999999999
-            #     })
-            if response.status in {429, 502}:
-                if max_retries <= 0:
-                    raise ResponseFailure(
-                        status_code=response.status,
-                        json_data={"error": "Max retries exceeded"},
-                    )
-                retry_after = int((await response.json()).get("retry_after", 5)) if response.status == 429 else 5
-                await asyncio.sleep(retry_after)
-                return await self._send_api_request(
-                    method=method,
-                    endpoint=endpoint,
-                    guild_id=guild_id,
-                    data=data,
-                    key=key,
-                    max_retries=max_retries - 1,
-                )
-            return response.status, (
-                await response.json() if response.content_type != "text/html" else {}
-            )
+        bucket = self._bucket(internal_server_key, endpoint)
+        for attempt in range(max_retries + 1):
+            # A request held up by its own key mustn't sit on a global token meanwhile
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            async with self.session.request(
+                method,
+                url=f"{self.base_url}{endpoint}",
+                headers={
+                    "Authorization": self.api_key,
+                    "User-Agent": "Application",
+                    "Server-Key": internal_server_key,
+                },
+                json=data or {},
+            ) as response:
+                limited_bucket = self._update_buckets(bucket, response.headers)
+                response_json = await read_json(response)
+
+            if response.status == 429:
+                if response_json.get("bucket") == "global":
+                    limited_bucket = self.global_bucket
+                limited_bucket.exhaust(float(response_json.get("retry_after", 5)))
+            elif response.status == 502:
+                await asyncio.sleep(min(2**attempt, 10))
+            else:
+                # Keys being tested (e.g. while linking) can only close a breaker
+                if not key or response.status < 300:
+                    await self.bot.breakers.record(internal_server_key, response.status)
+                return response.status, response_json
+
+        raise ResponseFailure(
+            status_code=response.status,
+            json_data={"error": "Max retries exceeded"},
+        )
 
     async def get_server_status(self, guild_id: int):
         status_code, response_json = await self._send_api_request(
@@ -221,19 +367,7 @@ class PRCApiClient:
             "GET", "/server/players", guild_id
         )
         if status_code == 200:
-            new_list = []
-            for item in response_json:
-                # print(item)
-                new_list.append(
-                    Player(
-                        username=item["Player"].split(":")[0],
-                        id=item["Player"].split(":")[1],
-                        permission=item["Permission"],
-                        callsign=item.get("Callsign"),
-                        team=item["Team"],
-                    )
-                )
-            return new_list
+            return Player.from_api_list(response_json)
         else:
             raise ResponseFailure(status_code=status_code, json_data=response_json)
 
@@ -261,10 +395,8 @@ class PRCApiClient:
         )
         if status_code == 200:
             co_owners = response_json.get("CoOwners", [])
-            roblox_client = roblox.Client()
-            co_owner_users = await roblox_client.get_users(co_owners, expand=False)
-            co_owner_names = [user.name for user in co_owner_users]
-            co_owners = dict(zip(co_owners, co_owner_names))
+            co_owner_users = await self.bot.identity.get_partial_users(co_owners)
+            co_owners = {user.id: user.name for user in co_owner_users}
             
             players = [Player(username=v, id=k, permission="Server Co-Owner") for k,v in co_owners.items()]
             players += [Player(
@@ -303,7 +435,7 @@ class PRCApiClient:
                 return len(response_json)
             new_list = []
             # print(response_json)
-            for user in await self.bot.roblox.get_users(response_json, expand=False):
+            for user in await self.bot.identity.get_partial_users(response_json):
                 new_list.append(Player(username=user.name, id=user.id))
             return new_list
         else:
@@ -314,24 +446,7 @@ class PRCApiClient:
             "GET", "/server/commandlogs", guild_id
         )
         if status_code == 200:
-            return [
-                CommandLog(
-                    username=(
-                        log_item["Player"].split(":")[0]
-                        if ":" in log_item["Player"]
-                        else log_item["Player"]
-                    ),
-                    user_id=(
-                        log_item["Player"].split(":")[1]
-                        if ":" in log_item["Player"]
-                        else 0
-                    ),
-                    timestamp=log_item["Timestamp"],
-                    is_automated=log_item["Player"] == "Remote Server",
-                    command=log_item["Command"],
-                )
-                for log_item in response_json
-            ]
+            return CommandLog.from_api_list(response_json)
         else:
             raise ResponseFailure(status_code=status_code, json_data=response_json)
 
@@ -340,20 +455,7 @@ class PRCApiClient:
             "GET", "/server/killlogs", guild_id
         )
         if status_code == 200:
-            return [
-                KillLog(
-                    killer_username=log_item["Killer"].split(":")[0],
-                    killer_user_id=log_item["Killer"].split(":")[1],
-                    timestamp=log_item["Timestamp"],
-                    killed_username=log_item["Killed"].split(":")[0],
-                    killed_user_id=log_item["Killed"].split(":")[1],
-                )
-                for log_item in response_json
-            ]
-        elif status_code == 429:
-            retry_after = int(response_json.get("retry_after", 5))
-            await asyncio.sleep(retry_after)
-            return await self.fetch_kill_logs(guild_id)
+            return KillLog.from_api_list(response_json)
         else:
             raise ResponseFailure(status_code=status_code, json_data=response_json)
 
@@ -379,44 +481,33 @@ class PRCApiClient:
             "GET", "/server/joinlogs", guild_id
         )
         if status_code == 200:
-            return [
-                JoinLeaveLog(
-                    username=log_item["Player"].split(":")[0],
-                    user_id=log_item["Player"].split(":")[1],
-                    timestamp=log_item["Timestamp"],
-                    type="join" if log_item["Join"] is True else "leave",
-                )
-                for log_item in response_json
-            ]
-        elif status_code == 429:
-            retry_after = int(response_json.get("retry_after", 5))
-            await asyncio.sleep(retry_after)
-            return await self.fetch_player_logs(guild_id)
+            return JoinLeaveLog.from_api_list(response_json)
         else:
             raise ResponseFailure(status_code=status_code, json_data=response_json)
 
     async def run_command(self, guild_id: int, command: str):
-        status_code, response_json = await self._send_api_request(
+        return await self._send_api_request(
             "POST", "/server/command", guild_id, data={"command": command}
         )
-        if status_code == 429:
-            await asyncio.sleep(response_json["retry_after"] + 0.1)
-            return await self.run_command(guild_id, command)
-        return status_code, response_json
+
+    def queue_command(self, guild_id: int, command: str, priority: int | None = None) -> asyncio.Future:
+        """
+        Queues a command behind the guild's other background commands, see
+        utils.command_queue. PMs with the same message are merged into one command.
+        Returns a future of the (status code, json) response; awaiting it is optional.
+        """
+        return self.commands.enqueue(guild_id, command, priority)
 
     async def unban_user(self, guild_id: int, user_id: int):
-        status_code = 0
-        while status_code != 200:
-            status_code, response_json = await self._send_api_request(
-                "POST",
-                "/server/command",
-                guild_id,
-                data={"command": ":unban {}".format(str(user_id))},
-            )
-            if status_code == 429:
-                await asyncio.sleep(response_json["retry_after"] + 0.1)
-            else:
-                return status_code
+        status_code, _ = await self._send_api_request(
+            "POST",
+            "/server/command",
+            guild_id,
+            data={"command": ":unban {}".format(str(user_id))},
+        )
+        if status_code == 200:
+            self.invalidate_cache(guild_id, "/server/bans")
+        return status_code
 
 
 # TODO: Testing code, remove in production
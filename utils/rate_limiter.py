@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+"""
+Client side model of an API's rate limit buckets. The bucket is kept in sync
+with the limits the API reports in its response headers, and requests wait for
+their bucket to refill instead of being sent only to come back as a 429.
+"""
+
+
+class TokenBucket:
+    def __init__(self, name: str):
+        """
+        Params:
+         - name (str) : Bucket name, as reported by the API once known
+        """
+        self.name = name
+        # None until the API has told us the limits of this bucket
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at: float = 0.0
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Waits until a request may be sent in this bucket and takes a token for it.
+        Waiters are served in arrival order.
+        """
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.time()
+                    if self.reset_at <= now:
+                        if self.limit is not None:
+                            # New window. Until a response tells us when it ends,
+                            # assume it's short so we never run ahead of the API.
+                            self.remaining = self.limit
+                            self.reset_at = now + 1
+                        else:
+                            # A 429 came before the API reported any limits,
+                            # they are unknown again once it has passed
+                            self.remaining = None
+                    if self.remaining is None or self.remaining > 0:
+                        if self.remaining is not None:
+                            self.remaining -= 1
+                        return
+                    await asyncio.sleep(self.reset_at - now)
+        finally:
+            self.waiting -= 1
+
+    def update(self, limit: int, remaining: int, reset_at: float):
+        """
+        Syncs the bucket with the limits reported by the API.
+        """
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+
+    def exhaust(self, retry_after: float):
+        """
+        Blocks the bucket for `retry_after` seconds after a 429.
+        """
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, time.time() + retry_after)
+
+    def state(self) -> dict:
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "resets_in": round(max(self.reset_at - time.time(), 0), 3),
+            "waiting": self.waiting,
+        }
@@ -0,0 +1,259 @@
+import asyncio
+import typing
+
+import roblox
+from decouple import config
+from discord.ext import commands
+from roblox.thumbnails import AvatarThumbnailType
+
+from utils.basedataclass import Record
+from utils.cache import MISSING, TTLCache
+
+"""
+Shared Roblox identity lookups. Usernames, user IDs, display names and avatar
+URLs are cached, concurrent lookups of the same user share one request, and
+lookups made within ROBLOX_BATCH_DELAY of each other are sent together to the
+multi-user endpoints (users by ID, users by username and avatar thumbnails).
+"""
+
+# Seconds a username <-> ID mapping is kept
+ROBLOX_IDENTITY_TTL = int(config("ROBLOX_IDENTITY_TTL", default=3600))
+# Seconds full profiles (creation date, ban state) and avatar URLs are kept
+ROBLOX_PROFILE_TTL = int(config("ROBLOX_PROFILE_TTL", default=600))
+# Seconds an unknown username or ID is remembered as unknown
+ROBLOX_MISSING_TTL = int(config("ROBLOX_MISSING_TTL", default=300))
+ROBLOX_IDENTITY_CACHE_SIZE = int(config("ROBLOX_IDENTITY_CACHE_SIZE", default=50000))
+# Milliseconds lookups are gathered before they are sent as one batch
+ROBLOX_BATCH_DELAY = int(config("ROBLOX_BATCH_DELAY", default=25))
+
+# The multi-user endpoints accept at most 100 users per request
+MAX_BATCH = 100
+
+
+class RobloxUser(Record):
+    id: int
+    name: str
+    display_name: str
+
+
+class Batcher:
+    """
+    Gathers keys requested around the same time and resolves them with one call
+    to `fetch`, which returns a mapping of key -> value (missing keys resolve to
+    None). A key that is already waiting is not requested again.
+    """
+
+    def __init__(self, fetch: typing.Callable[[list], typing.Awaitable[dict]]):
+        self.fetch = fetch
+        self._waiting: dict[typing.Hashable, asyncio.Future] = {}
+        self._queued: list = []
+        self._timer: asyncio.TimerHandle | None = None
+        self.batches = 0
+
+    def load(self, key) -> asyncio.Future:
+        future = self._waiting.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._waiting[key] = loop.create_future()
+            self._queued.append(key)
+            if len(self._queued) >= MAX_BATCH:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(ROBLOX_BATCH_DELAY / 1000, self._flush)
+        # A cancelled caller must not cancel the lookup for everyone else waiting on it
+        return asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        keys, self._queued = self._queued, []
+        if keys:
+            asyncio.create_task(self._run(keys))
+
+    async def _run(self, keys: list):
+        self.batches += 1
+        try:
+            results = await self.fetch(keys)
+        except Exception as e:
+            for key in keys:
+                future = self._waiting.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._waiting.pop(key)
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+class RobloxIdentity:
+    def __init__(self, bot: commands.Bot):
+        self.client: roblox.Client = bot.roblox
+        # user id -> RobloxUser | None
+        self.users = TTLCache(ttl=ROBLOX_IDENTITY_TTL, max_size=ROBLOX_IDENTITY_CACHE_SIZE)
+        # lowercased username -> user id | None
+        self.usernames = TTLCache(ttl=ROBLOX_IDENTITY_TTL, max_size=ROBLOX_IDENTITY_CACHE_SIZE)
+        # user id -> roblox.users.User | None
+        self.profiles = TTLCache(ttl=ROBLOX_PROFILE_TTL, max_size=ROBLOX_IDENTITY_CACHE_SIZE)
+        # (user id, thumbnail type, size) -> image url
+        self.avatars = TTLCache(ttl=ROBLOX_PROFILE_TTL, max_size=ROBLOX_IDENTITY_CACHE_SIZE)
+        self._by_id = Batcher(self._fetch_ids)
+        self._by_username = Batcher(self._fetch_usernames)
+        self._avatars = Batcher(self._fetch_avatars)
+        self._profiles: dict[int, asyncio.Future] = {}
+
+    def _remember(self, user: RobloxUser):
+        self.users.set(user.id, user)
+        self.usernames.set(user.name.lower(), user.id)
+
+    # <-- Batched fetches -->
+    async def _fetch_ids(self, user_ids: list[int]) -> dict[int, RobloxUser]:
+        found = {}
+        for user in await self.client.get_users(user_ids, expand=False):
+            found[user.id] = RobloxUser(id=user.id, name=user.name, display_name=user.display_name)
+            self._remember(found[user.id])
+        for user_id in user_ids:
+            if user_id not in found:
+                self.users.set(user_id, None, ROBLOX_MISSING_TTL)
+        return found
+
+    async def _fetch_usernames(self, usernames: list[str]) -> dict[str, RobloxUser]:
+        found = {}
+        for user in await self.client.get_users_by_usernames(usernames, expand=False):
+            found[user.requested_username.lower()] = RobloxUser(
+                id=user.id, name=user.name, display_name=user.display_name
+            )
+        for username in usernames:
+            if username in found:
+                self._remember(found[username])
+                # Previous usernames resolve to the current account as well
+                self.usernames.set(username, found[username].id)
+            else:
+                self.usernames.set(username, None, ROBLOX_MISSING_TTL)
+        return found
+
+    async def _fetch_avatars(self, keys: list[tuple]) -> dict[tuple, str]:
+        groups: dict[tuple, list[int]] = {}
+        for user_id, thumbnail_type, size in keys:
+            groups.setdefault((thumbnail_type, size), []).append(user_id)
+
+        async def fetch_group(thumbnail_type, size, user_ids):
+            kwargs = {"type": thumbnail_type}
+            if size is not None:
+                kwargs["size"] = size
+            return thumbnail_type, size, await self.client.thumbnails.get_user_avatar_thumbnails(
+                user_ids, **kwargs
+            )
+
+        found = {}
+        for thumbnail_type, size, thumbnails in await asyncio.gather(
+            *[fetch_group(*group, user_ids) for group, user_ids in groups.items()]
+        ):
+            for thumbnail in thumbnails:
+                # Pending or blocked thumbnails have no URL yet, they are not cached
+                if thumbnail.image_url:
+                    key = (thumbnail.target_id, thumbnail_type, size)
+                    found[key] = thumbnail.image_url
+                    self.avatars.set(key, thumbnail.image_url)
+        return found
+
+    # <-- Lookups -->
+    async def _partial_user(self, user_id: int) -> RobloxUser | None:
+        user = self.users.get(user_id)
+        if user is MISSING:
+            user = await self._by_id.load(user_id)
+        return user
+
+    async def _find_username(self, username: str) -> RobloxUser | None:
+        user_id = self.usernames.get(username)
+        if user_id is MISSING:
+            return await self._by_username.load(username)
+        if user_id is None:
+            return None
+        return await self._partial_user(user_id)
+
+    async def get_partial_users(self, user_ids: list[int]) -> list[RobloxUser]:
+        """
+        Resolves user IDs to their usernames and display names, in order. Unknown IDs are left out.
+        """
+        users = await asyncio.gather(*[self._partial_user(int(user_id)) for user_id in user_ids])
+        return [user for user in users if user is not None]
+
+    async def get_partial_user(self, user_id: int) -> RobloxUser | None:
+        return await self._partial_user(int(user_id))
+
+    async def find_usernames(self, usernames: list[str]) -> list[RobloxUser]:
+        """
+        Resolves usernames to their users, in order. Unknown usernames are left out.
+        """
+        users = await asyncio.gather(*[self._find_username(username.lower()) for username in usernames])
+        return [user for user in users if user is not None]
+
+    async def find_username(self, username: str) -> RobloxUser | None:
+        return await self._find_username(username.lower())
+
+    async def get_user(self, user_id: int) -> roblox.users.User | None:
+        """
+        The full profile of a user (creation date, description, ban state), or
+        None if there is no such user. Profiles can't be requested in batches,
+        concurrent lookups of the same user still share one request.
+        """
+        user_id = int(user_id)
+        user = self.profiles.get(user_id)
+        if user is not MISSING:
+            return user
+        future = self._profiles.get(user_id)
+        if future is None:
+            future = self._profiles[user_id] = asyncio.ensure_future(
+                self._fetch_profile(user_id)
+            )
+            future.add_done_callback(lambda _: self._profiles.pop(user_id, None))
+        return await asyncio.shield(future)
+
+    async def _fetch_profile(self, user_id: int) -> roblox.users.User | None:
+        try:
+            user = await self.client.get_user(user_id)
+        except roblox.UserNotFound:
+            self.profiles.set(user_id, None, ROBLOX_MISSING_TTL)
+            return None
+        self.profiles.set(user_id, user)
+        self._remember(RobloxUser(id=user.id, name=user.name, display_name=user.display_name))
+        return user
+
+    async def get_user_by_username(self, username: str) -> roblox.users.User | None:
+        user = await self.find_username(username)
+        if user is None:
+            return None
+        return await self.get_user(user.id)
+
+    async def get_avatar_url(
+        self,
+        user_id: int,
+        type: AvatarThumbnailType = AvatarThumbnailType.headshot,
+        size: tuple[int, int] | str | None = None,
+    ) -> str | None:
+        """
+        Params:
+         - user_id (int) : Roblox user ID
+         - type (AvatarThumbnailType) : headshot, bust or full body
+         - size (tuple | str) : e.g. (420, 420) or "720x720", the API default if None
+        """
+        key = (int(user_id), type, size)
+        url = self.avatars.get(key)
+        if url is not MISSING:
+            return url
+        return await self._avatars.load(key)
+
+    def stats(self) -> dict:
+        return {
+            "users": self.users.stats(),
+            "usernames": self.usernames.stats(),
+            "profiles": self.profiles.stats(),
+            "avatars": self.avatars.stats(),
+            "batches": {
+                "ids": self._by_id.batches,
+                "usernames": self._by_username.batches,
+                "avatars": self._avatars.batches,
+            },
+        }
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+
+from decouple import config
+
+from utils.basedataclass import Record
+from utils.prc_api import ResponseFailure
+
+"""
+One shared view of every linked ER:LC server. Periodic tasks ask the snapshot
+engine for the parts of a server they need instead of calling the PRC API
+themselves; each part is fetched at most once per refresh window per guild, no
+matter how many tasks read it.
+"""
+
+# Seconds a part of a snapshot is served before it is refreshed
+SNAPSHOT_MAX_AGE = int(config("SNAPSHOT_MAX_AGE", default=60))
+# Empty servers change rarely, their snapshots are kept this many times longer
+SNAPSHOT_IDLE_FACTOR = int(config("SNAPSHOT_IDLE_FACTOR", default=3))
+# A failing server is not asked again for this many seconds; the failure is re-raised instead
+SNAPSHOT_FAILURE_BACKOFF = int(config("SNAPSHOT_FAILURE_BACKOFF", default=120))
+
+PARTS = (
+    "status",
+    "players",
+    "vehicles",
+    "queue",
+    "kill_logs",
+    "join_logs",
+    "command_logs",
+)
+
+
+class ServerSnapshot(Record):
+    guild_id: int
+    status: object = None
+    players: list | None = None
+    vehicles: list | None = None
+    # Amount of players in the queue
+    queue: int | None = None
+    kill_logs: list | None = None
+    join_logs: list | None = None
+    command_logs: list | None = None
+    # part -> time.monotonic() it was fetched at
+    fetched_at: dict = None
+    # part -> (ResponseFailure, time.monotonic()) of the last failed fetch
+    failures: dict = None
+
+    def age(self, part: str) -> float:
+        fetched_at = self.fetched_at.get(part)
+        return float("inf") if fetched_at is None else time.monotonic() - fetched_at
+
+    @property
+    def idle(self) -> bool:
+        return self.players is not None and len(self.players) == 0
+
+
+class SnapshotEngine:
+    def __init__(self, bot):
+        self.bot = bot
+        self.snapshots: dict[int, ServerSnapshot] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        self.refreshes = 0
+        self.served = 0
+        self.logger = logging.getLogger(__name__)
+
+    def _fetchers(self, guild_id: int) -> dict:
+        api = self.bot.prc_api
+        return {
+            "status": lambda: api.get_server_status(guild_id),
+            "players": lambda: api.get_server_players(guild_id),
+            "vehicles": lambda: api.get_server_vehicles(guild_id),
+            "queue": lambda: api.get_server_queue(guild_id, minimal=True),
+            "kill_logs": lambda: api.fetch_kill_logs(guild_id),
+            "join_logs": lambda: api.fetch_player_logs(guild_id),
+            "command_logs": lambda: api.fetch_server_logs(guild_id),
+        }
+
+    def max_age(self, snapshot: ServerSnapshot) -> float:
+        """
+        The refresh window adapts to the server: empty servers are refreshed
+        SNAPSHOT_IDLE_FACTOR times less often.
+        """
+        return SNAPSHOT_MAX_AGE * (SNAPSHOT_IDLE_FACTOR if snapshot.idle else 1)
+
+    async def get(self, guild_id: int, *parts: str, max_age: float | None = None) -> ServerSnapshot:
+        """
+        Returns the snapshot of a guild's server with `parts` no older than `max_age`
+        (the adaptive window by default). Stale parts are fetched together, and
+        concurrent callers for the same guild wait for that one refresh.
+        Raises ResponseFailure if a part can't be fetched.
+        """
+        for part in parts:
+            if part not in PARTS:
+                raise ValueError(f"Unknown snapshot part: {part}")
+
+        snapshot = self.snapshots.get(guild_id)
+        if snapshot is None:
+            snapshot = self.snapshots[guild_id] = ServerSnapshot(
+                guild_id=guild_id, fetched_at={}, failures={}
+            )
+
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            window = self.max_age(snapshot) if max_age is None else max_age
+            stale = []
+            for part in parts:
+                failure = snapshot.failures.get(part)
+                if failure and time.monotonic() - failure[1] < SNAPSHOT_FAILURE_BACKOFF:
+                    raise failure[0]
+                if snapshot.age(part) > window:
+                    stale.append(part)
+
+            if stale:
+                await self._refresh(snapshot, stale)
+        self.served += 1
+        return snapshot
+
+    async def _refresh(self, snapshot: ServerSnapshot, parts: list[str]):
+        fetchers = self._fetchers(snapshot.guild_id)
+        results = await asyncio.gather(
+            *[fetchers[part]() for part in parts], return_exceptions=True
+        )
+        self.refreshes += 1
+        now = time.monotonic()
+        error = None
+        for part, result in zip(parts, results):
+            if isinstance(result, ResponseFailure):
+                snapshot.failures[part] = (result, now)
+                error = error or result
+            elif isinstance(result, BaseException):
+                error = error or result
+            else:
+                setattr(snapshot, part, result)
+                snapshot.fetched_at[part] = now
+                snapshot.failures.pop(part, None)
+        if error is not None:
+            raise error
+
+    def forget(self, guild_id: int):
+        """
+        Drops the snapshot of a guild, e.g. when its server is unlinked.
+        """
+        self.snapshots.pop(guild_id, None)
+        self._locks.pop(guild_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self.snapshots),
+            "refreshes": self.refreshes,
+            "served": self.served,
+        }
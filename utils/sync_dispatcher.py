@@ -0,0 +1,138 @@
+import asyncio
+import logging
+
+import aiohttp
+from decouple import config
+from discord.ext import commands
+
+# Seconds between checks for due sync calls when nothing new was appended
+OUTBOX_POLL_INTERVAL = int(config("OUTBOX_POLL_INTERVAL", default=5))
+# Sync calls claimed and sent per round
+OUTBOX_BATCH_SIZE = int(config("OUTBOX_BATCH_SIZE", default=50))
+# Sync calls in flight at once
+OUTBOX_CONCURRENCY = int(config("OUTBOX_CONCURRENCY", default=10))
+# Seconds until the first retry of a failed call, doubled on every further failure
+OUTBOX_BASE_BACKOFF = int(config("OUTBOX_BASE_BACKOFF", default=5))
+OUTBOX_MAX_BACKOFF = int(config("OUTBOX_MAX_BACKOFF", default=1800))
+
+SYNC_TIMEOUT = aiohttp.ClientTimeout(total=15)
+
+
+def backoff(attempts: int) -> float:
+    return min(OUTBOX_BASE_BACKOFF * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF)
+
+
+class SyncDispatcher:
+    """
+    Sends the sync calls queued in bot.outbox to the internal API and the panel
+    over one pooled session. Failed calls are retried with an exponential backoff
+    if the failure may be temporary (connection errors, 429 and 5xx); any other
+    error response is final.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.outbox = bot.outbox
+        self.session = aiohttp.ClientSession(timeout=SYNC_TIMEOUT)
+        bot.external_http_sessions.append(self.session)
+        self.semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+        self.failed = 0
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                self.outbox.appended.clear()
+                sent = await self.dispatch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Failed to dispatch sync calls: {e}")
+                sent = 0
+            # A full batch means more calls are probably due already
+            if sent >= OUTBOX_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self.outbox.appended.wait(), timeout=OUTBOX_POLL_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch(self) -> int:
+        """
+        Sends one batch of due calls and records the results. Returns how many were sent.
+        """
+        calls = await self.outbox.claim(OUTBOX_BATCH_SIZE)
+        if not calls:
+            return 0
+        results = await asyncio.gather(*[self.send(call) for call in calls])
+        await self.outbox.complete(
+            [(call, *result) for call, result in zip(calls, results)], backoff
+        )
+        return len(calls)
+
+    @staticmethod
+    def _headers(auth: str | None) -> dict:
+        # Credentials are read when sending, they are never stored in the outbox
+        if auth == "internal":
+            return {"Authorization": config("INTERNAL_API_AUTH")}
+        if auth == "panel":
+            return {"X-Static-Token": config("PANEL_STATIC_AUTH")}
+        return {}
+
+    async def send(self, call: dict) -> tuple[str | None, bool]:
+        """
+        Returns (error or None, whether the call may be retried).
+        """
+        base_url = config(
+            "BASE_API_URL" if call["target"] == "internal" else "PANEL_API_URL",
+            default="",
+        )
+        if base_url in ["", None]:
+            # Unconfigured since it was queued, nothing to retry
+            return None, False
+        async with self.semaphore:
+            try:
+                async with self.session.request(
+                    call["method"],
+                    f"{base_url}{call['path']}",
+                    headers=self._headers(call.get("auth")),
+                ) as response:
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.failed += 1
+                return f"{type(e).__name__}: {e}", True
+        if status < 400:
+            self.sent += 1
+            return None, False
+        self.failed += 1
+        retryable = status == 429 or status >= 500
+        if not retryable:
+            self.logger.warning(
+                f"Sync call {call['method']} {call['target']}{call['path']} was rejected with {status}"
+            )
+        return f"HTTP {status}", retryable
+
+    async def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            **await self.outbox.stats(),
+        }
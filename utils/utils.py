@@ -10,7 +10,6 @@ import discord
 import pytz
 import requests
 from decouple import config
-import roblox.users
 from discord import Embed, InteractionResponse, Webhook
 from discord.ext import commands
 from fuzzywuzzy import fuzz
@@ -18,7 +17,9 @@ from snowflake import SnowflakeGenerator
 from zuid import ZUID
 
 import utils.prc_api as prc_api
+from datamodels.Settings import PREFIX_PROJECTION
 from utils.constants import BLANK_COLOR, RED_COLOR
+from utils.permissions import Permission, resolve_permissions
 from utils.prc_api import ServerStatus, Player
 
 
@@ -111,8 +112,7 @@ async def get_roblox_by_username(user: str, bot, ctx: commands.Context):
         except KeyError:
             return {"errors": ["Member could not be found in Discord."]}
 
-    client = roblox.Client()
-    roblox_user = await client.get_user_by_username(user)
+    roblox_user = await bot.identity.find_username(user)
     if not roblox_user:
         return {"errors": ["Could not find user"]}
     else:
@@ -120,61 +120,12 @@ async def get_roblox_by_username(user: str, bot, ctx: commands.Context):
 
 
 async def staff_check(bot_obj, guild, member):
-    guild_settings = await bot_obj.settings.find_by_id(guild.id)
-    if guild_settings:
-        if "role" in guild_settings["staff_management"].keys():
-            if guild_settings["staff_management"]["role"] != "":
-                if isinstance(guild_settings["staff_management"]["role"], list):
-                    for role in guild_settings["staff_management"]["role"]:
-                        if role in [role.id for role in member.roles]:
-                            return True
-                elif isinstance(guild_settings["staff_management"]["role"], int):
-                    if guild_settings["staff_management"]["role"] in [
-                        role.id for role in member.roles
-                    ]:
-                        return True
-    if (
-        member.guild_permissions.manage_messages
-        or member.guild_permissions.administrator
-    ):
-        return True
-    return False
+    return Permission.STAFF in await resolve_permissions(bot_obj, guild, member)
 
 
 async def admin_check(bot_obj, guild, member):
-    guild_settings = await bot_obj.settings.find_by_id(guild.id)
-    if guild_settings:
-        if "admin_role" in guild_settings["staff_management"].keys():
-            if guild_settings["staff_management"]["admin_role"] != "":
-                if isinstance(guild_settings["staff_management"]["admin_role"], list):
-                    for role in guild_settings["staff_management"]["admin_role"]:
-                        if role in [role.id for role in member.roles]:
-                            return True
-                elif isinstance(guild_settings["staff_management"]["admin_role"], int):
-                    if guild_settings["staff_management"]["admin_role"] in [
-                        role.id for role in member.roles
-                    ]:
-                        return True
-        if "management_role" in guild_settings["staff_management"].keys():
-            if guild_settings["staff_management"]["management_role"] != "":
-                if isinstance(
-                    guild_settings["staff_management"]["management_role"], list
-                ):
-                    for role in guild_settings["staff_management"]["management_role"]:
-                        if role in [role.id for role in member.roles]:
-                            return True
-                elif isinstance(
-                    guild_settings["staff_management"]["management_role"], int
-                ):
-                    if guild_settings["staff_management"]["management_role"] in [
-                        role.id for role in member.roles
-                    ]:
-                        return True
-    if member.guild_permissions.administrator:
-        return True
-    return False
+    return Permission.ADMIN in await resolve_permissions(bot_obj, guild, member)
 
-    
 
 def time_converter(parameter: str) -> int:
     conversions = {
@@ -307,7 +258,7 @@ async def interpret_embed(bot, ctx, channel, embed: dict, ics_id: int):
             value=await sub_vars(bot, ctx, channel, i.value),
         )
 
-    if await bot.server_keys.db.count_documents({"_id": ctx.guild.id}) == 0:
+    if ctx.guild.id not in bot.server_keys:
         return embed
 
     return await update_ics(bot, ctx, channel, embed, ics_id)
@@ -343,7 +294,7 @@ async def sub_vars(bot, ctx: commands.Context, channel, string, **kwargs):
 
         #### CUSTOM ER:LC VARS
         # Fetch whether they should even be allowed to use ER:LC vars
-        if await bot.server_keys.db.count_documents({"_id": ctx.guild.id}) == 0:
+        if ctx.guild.id not in bot.server_keys:
             return string  # end here no point
 
         status: ServerStatus = await bot.prc_api.get_server_status(ctx.guild.id)
@@ -420,7 +371,9 @@ async def get_prefix(bot, message):
         return commands.when_mentioned_or(">")(bot, message)
 
     try:
-        prefix = await bot.settings.find_by_id(message.guild.id)
+        prefix = await bot.settings.find_by_id(
+            message.guild.id, projection=PREFIX_PROJECTION
+        )
         prefix = (prefix or {})["customisation"]["prefix"]
     except KeyError:
         return discord.ext.commands.when_mentioned_or(">")(bot, message)
@@ -464,19 +417,16 @@ async def get_player_avatar_url(player_id):
 
 
 async def run_command(bot, guild_id, username, message):
-    while True:
-        command = f":pm {username} {message}"
-        command_response = await bot.prc_api.run_command(guild_id, command)
-        if command_response[0] == 200:
+    # Queued, so PMs with the same message to other players go out as one command
+    def log_response(future):
+        if future.exception() is None and future.result()[0] == 200:
             logging.info(f"Sent PM to {username} in guild {guild_id}")
-            break
-        elif command_response[0] == 429:
-            retry_after = int(command_response[1].get("Retry-After", 5))
-            logging.warning(f"Rate limited. Retrying after {retry_after} seconds.")
-            await asyncio.sleep(retry_after)
         else:
             logging.error(f"Failed to send PM to {username} in guild {guild_id}")
-            break
+
+    bot.prc_api.queue_command(guild_id, f":pm {username} {message}").add_done_callback(
+        log_response
+    )
 
 
 def is_whitelisted(vehicle_name, whitelisted_vehicle):